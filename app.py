@@ -1,14 +1,29 @@
 import os
 import sys
+import multiprocessing
 from flask import Flask
 from config import Config
 from flask_cors import CORS
 from models.db import db, migrate
 from routes.detection_routes import detection_bp, detect_ml_bp
 from controller.auth.auth_controller import auth_bp
+from routes.health_routes import health_bp
+from services.model_registry import registry
+from services.job_queue import start_job_workers
+from services.write_behind import start_write_behind
 
 sys.path.append(os.path.dirname(os.path.abspath(__file__)))
 
+def _in_child_process():
+    # parent_process() is only set once a spawned child starts its target; while it
+    # re-imports the main module only the process name tells it apart
+    return (multiprocessing.parent_process() is not None
+            or multiprocessing.current_process().name != "MainProcess")
+
+def _in_reloader_parent():
+    # app.run(debug=True) serves from a child it starts with WERKZEUG_RUN_MAIN set
+    return __name__ == "__main__" and os.environ.get("WERKZEUG_RUN_MAIN") != "true"
+
 def create_app():
     app = Flask(__name__)
     CORS(app)
@@ -20,6 +35,25 @@ def create_app():
     app.register_blueprint(detection_bp, url_prefix="/api/detections")          
     app.register_blueprint(detect_ml_bp, url_prefix="/detection")  
     app.register_blueprint(auth_bp)
+    app.register_blueprint(health_bp)
+
+    # Spawned child processes (the inference pool's workers) re-import this module,
+    # and `python app.py` starts a reloader process that only watches the files;
+    # neither must warm up models, replay the journal or claim jobs
+    if _in_child_process() or _in_reloader_parent():
+        return app
+
+    # Load and warm the models before the load balancer sends traffic (see /readyz)
+    if app.config["WARMUP_ON_STARTUP"]:
+        registry.start_warm_up(background=not app.config["WARMUP_BLOCKING"], app=app)
+
+    # Batched detection inserts (replays rows a crashed process left journaled)
+    if app.config["WRITE_BEHIND_ENABLED"]:
+        start_write_behind(app)
+
+    # Background workers for async detection jobs (or run `python worker.py`)
+    if app.config["JOB_WORKERS"] > 0:
+        start_job_workers(app, app.config["JOB_WORKERS"])
 
     return app
 
@@ -0,0 +1,48 @@
+# calibrate_models.py
+"""
+Builds reduced-precision variants of the waste and pothole models from a folder
+of stored uploads and reports their accuracy drift and latency against fp32.
+
+For every model and mode, the report (mAP50 vs fp32, drift, latency, speedup) is
+written to <weights>.quant.json. ModelLoader only switches to a variant selected
+by INFERENCE_PRECISION while its drift stays within QUANT_MAX_MAP_DRIFT.
+
+Usage: python calibrate_models.py [--images DIR] [--modes int8_dynamic,int8_static,bf16]
+                                  [--limit 100] [--imgsz 640] [--max-drift 0.02]
+"""
+
+import argparse
+
+from config import Config, setup_logging
+from services.quantization import calibrate, load_calibration_frames
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--images", default=Config.CALIBRATION_IMAGE_FOLDER)
+    parser.add_argument("--modes", default="int8_dynamic,int8_static,bf16")
+    parser.add_argument("--limit", type=int, default=100)
+    parser.add_argument("--imgsz", type=int, default=Config.MODEL_IMGSZ)
+    parser.add_argument("--conf", type=float, default=0.25)
+    parser.add_argument("--max-drift", type=float, default=Config.QUANT_MAX_MAP_DRIFT)
+    args = parser.parse_args()
+
+    frames = load_calibration_frames(args.images, args.limit)
+    print(f"Calibrating on {len(frames)} images from {args.images}")
+
+    modes = [m.strip() for m in args.modes.split(",") if m.strip()]
+    for weights_path in (Config.WASTE_MODEL_PATH, Config.POTHOLE_MODEL_PATH):
+        report = calibrate(weights_path, frames, modes, args.imgsz, args.conf, args.max_drift)
+
+        print(f"\n{weights_path}")
+        print(f"{'mode':<14}{'mAP50':>8}{'drift':>8}{'fp32 ms':>10}{'ms':>10}{'speedup':>9}  status")
+        for mode in modes:
+            m = report[mode]
+            status = "enabled" if m["accepted"] else "REJECTED"
+            print(f"{mode:<14}{m['map50']:>8.4f}{m['drift']:>8.4f}{m['fp32_latency_ms']:>10.1f}"
+                  f"{m['latency_ms']:>10.1f}{m['speedup']:>9.2f}  {status}")
+
+
+if __name__ == '__main__':
+    setup_logging()
+    main()
@@ -0,0 +1,46 @@
+# compile_routing_table.py
+"""
+Evaluates the knowledge-graph reasoner for every attribute combination and
+writes the routing lookup table (reasoning/routing_table.py) as JSON. Processes
+started with REASONER_MODE=table route from this file without loading the GNN.
+
+The graph is read from the department and tag tables, as the serving processes
+build it. A table is a snapshot: table-mode processes do not sync the graph, so
+recompile (and restart them) after departments or tags are added or the
+reasoner's weights change.
+
+Usage: python compile_routing_table.py [output.json]
+"""
+
+import sys
+import logging
+
+from config import Config, setup_logging
+from reasoning.kg_gnn import KnowledgeGraphReasoner
+
+logger = logging.getLogger(__name__)
+
+
+def compile_table(path):
+    # Only the database is needed: no job workers or model warm-up in this process
+    Config.JOB_WORKERS = 0
+    Config.WARMUP_ON_STARTUP = False
+    from app import app
+    from services.knowledge_graph import graph_rows
+
+    with app.app_context():
+        departments, tags = graph_rows()
+    if not departments:
+        logger.warning("No departments in the database; compiling the built-in department list")
+    reasoner = KnowledgeGraphReasoner(departments=departments or None)
+    reasoner.load_graph(departments, tags)
+
+    table = reasoner.compile_routing_table()
+    table.save(path)
+    print(f"{len(table.rows)} routes over {len(reasoner.departments)} departments ({table.fingerprint}) -> {path}")
+    return table
+
+
+if __name__ == '__main__':
+    setup_logging()
+    compile_table(sys.argv[1] if len(sys.argv) > 1 else Config.ROUTING_TABLE_PATH)
@@ -1,6 +1,5 @@
 import os
 import logging
-import torch
 import sys
 
 # Add base directory to path if needed, though usually handled in app.py
@@ -52,6 +51,165 @@ class Config:
     os.makedirs(WASTE_DETECTED_FOLDER, exist_ok=True)
     os.makedirs(ANNOTATED_FOLDER, exist_ok=True)
 
+    # --- Inference Batching ---
+    # Concurrent requests are grouped into one forward pass of up to
+    # INFERENCE_MAX_BATCH_SIZE images, waiting at most INFERENCE_MAX_WAIT_MS.
+    INFERENCE_BATCHING = os.environ.get("INFERENCE_BATCHING", "true").lower() == "true"
+    INFERENCE_MAX_BATCH_SIZE = int(os.environ.get("INFERENCE_MAX_BATCH_SIZE", "8"))
+    INFERENCE_MAX_WAIT_MS = float(os.environ.get("INFERENCE_MAX_WAIT_MS", "10"))
+
+    # --- Detection Strategy ---
+    # "cascade" runs pothole then waste; "concurrent" runs both at once and settles
+    # the hits with DETECTION_POLICY: "pothole_first", "highest_confidence" or "both".
+    DETECTION_MODE = os.environ.get("DETECTION_MODE", "cascade")
+    DETECTION_POLICY = os.environ.get("DETECTION_POLICY", "pothole_first")
+    DETECTION_THREADS = int(os.environ.get("DETECTION_THREADS", "8"))
+
+    # --- Inference Worker Pool ---
+    # INFERENCE_WORKERS > 0 moves inference out of the Flask process into that many
+    # worker processes fed through a queue, with frames handed over via shared memory.
+    # INFERENCE_WORKER_THREADS=0 splits the CPU cores evenly between workers.
+    INFERENCE_WORKERS = int(os.environ.get("INFERENCE_WORKERS", "0"))
+    INFERENCE_WORKER_THREADS = int(os.environ.get("INFERENCE_WORKER_THREADS", "0"))
+    INFERENCE_TIMEOUT_S = float(os.environ.get("INFERENCE_TIMEOUT_S", "120"))
+
+    # --- Inference Backend ---
+    # "ultralytics" (PyTorch eager), "onnxruntime" or "openvino". The ONNX runtimes load
+    # <weights>.onnx next to each .pt file, produced by `python export_models.py`.
+    INFERENCE_BACKEND = os.environ.get("INFERENCE_BACKEND", "ultralytics")
+    WASTE_MODEL_PATH = os.environ.get(
+        "WASTE_MODEL_PATH", "runs/detect/waste_yolo_fast/weights/waste.pt"
+    )
+    POTHOLE_MODEL_PATH = os.environ.get(
+        "POTHOLE_MODEL_PATH", "runs/pothole_yolov8/weights/best.pt"
+    )
+    MODEL_IMGSZ = int(os.environ.get("MODEL_IMGSZ", "640"))
+
+    # --- Reduced Precision ---
+    # "fp32", "int8_dynamic", "int8_static" (onnxruntime/openvino backends) or "bf16".
+    # A variant is only used if `python calibrate_models.py` measured its mAP50 drift
+    # against fp32 within QUANT_MAX_MAP_DRIFT; otherwise the models stay fp32.
+    INFERENCE_PRECISION = os.environ.get("INFERENCE_PRECISION", "fp32")
+    QUANT_MAX_MAP_DRIFT = float(os.environ.get("QUANT_MAX_MAP_DRIFT", "0.02"))
+    CALIBRATION_IMAGE_FOLDER = os.path.join(STORAGE_FOLDER, 'uploads')
+
+    # --- Warm-up / Readiness ---
+    # create_app() loads the models and runs dummy inferences at MODEL_IMGSZ;
+    # /readyz answers 503 until that has finished.
+    WARMUP_ON_STARTUP = os.environ.get("WARMUP_ON_STARTUP", "true").lower() == "true"
+    WARMUP_BLOCKING = os.environ.get("WARMUP_BLOCKING", "false").lower() == "true"
+
+    # --- Tiled Inference ---
+    # Images whose longer side reaches TILE_MIN_SIZE are split into TILE_SIZE tiles
+    # overlapping by TILE_OVERLAP, run as one batch and merged ("nms" or "wbf") back
+    # into a single result; TILE_INCLUDE_FULL adds the whole frame for large objects.
+    TILING_ENABLED = os.environ.get("TILING_ENABLED", "false").lower() == "true"
+    TILE_SIZE = int(os.environ.get("TILE_SIZE", "640"))
+    TILE_OVERLAP = float(os.environ.get("TILE_OVERLAP", "0.2"))
+    TILE_MIN_SIZE = int(os.environ.get("TILE_MIN_SIZE", "1600"))
+    TILE_MERGE = os.environ.get("TILE_MERGE", "nms")
+    TILE_MERGE_THRESHOLD = float(os.environ.get("TILE_MERGE_THRESHOLD", "0.5"))
+    TILE_INCLUDE_FULL = os.environ.get("TILE_INCLUDE_FULL", "true").lower() == "true"
+
+    # --- Async Detection Jobs ---
+    # Uploads sent with ?async=1 or `Prefer: respond-async` (every upload when
+    # ASYNC_DETECTIONS is on) are queued in the detection_jobs table and answered
+    # with 202 + a job ID. JOB_WORKERS threads in the web process work the queue;
+    # leave it at 0 and run `python worker.py` to scale inference separately.
+    ASYNC_DETECTIONS = os.environ.get("ASYNC_DETECTIONS", "false").lower() == "true"
+    JOB_WORKERS = int(os.environ.get("JOB_WORKERS", "0"))
+    JOB_POLL_INTERVAL_S = float(os.environ.get("JOB_POLL_INTERVAL_S", "0.5"))
+    JOB_MAX_ATTEMPTS = int(os.environ.get("JOB_MAX_ATTEMPTS", "3"))
+    # A running job's worker refreshes its heartbeat every JOB_HEARTBEAT_S; the job
+    # is re-queued once the heartbeat is JOB_STALE_AFTER_S old (the worker died)
+    JOB_HEARTBEAT_S = float(os.environ.get("JOB_HEARTBEAT_S", "30"))
+    JOB_STALE_AFTER_S = float(os.environ.get("JOB_STALE_AFTER_S", "600"))
+    JOB_EVENTS_TIMEOUT_S = float(os.environ.get("JOB_EVENTS_TIMEOUT_S", "300"))
+    JOB_UPLOAD_FOLDER = os.path.join(STORAGE_FOLDER, 'jobs')
+
+    # --- Bulk Uploads ---
+    # POST /api/detections/bulk runs images through the models BULK_BATCH_SIZE at a time.
+    BULK_BATCH_SIZE = int(os.environ.get("BULK_BATCH_SIZE", "16"))
+    BULK_MAX_ITEMS = int(os.environ.get("BULK_MAX_ITEMS", "1000"))
+    BULK_MAX_IMAGE_BYTES = int(os.environ.get("BULK_MAX_IMAGE_BYTES", str(25 * 1024 * 1024)))
+    BULK_MAX_METADATA_BYTES = int(os.environ.get("BULK_MAX_METADATA_BYTES", str(1024 * 1024)))
+
+    # --- Dashcam Video ---
+    # Frames are sampled every VIDEO_SAMPLE_DISTANCE_M along the GPS track, or on
+    # scene change (mean grayscale difference >= VIDEO_MOTION_THRESHOLD) without one,
+    # bounded by the min/max intervals. The tracker turns each object seen on
+    # VIDEO_TRACK_MIN_HITS samples into a single detection.
+    VIDEO_MIN_INTERVAL_S = float(os.environ.get("VIDEO_MIN_INTERVAL_S", "0.2"))
+    VIDEO_MAX_INTERVAL_S = float(os.environ.get("VIDEO_MAX_INTERVAL_S", "2.0"))
+    VIDEO_PROBE_INTERVAL_S = float(os.environ.get("VIDEO_PROBE_INTERVAL_S", "0.1"))
+    VIDEO_MOTION_THRESHOLD = float(os.environ.get("VIDEO_MOTION_THRESHOLD", "8.0"))
+    VIDEO_SAMPLE_DISTANCE_M = float(os.environ.get("VIDEO_SAMPLE_DISTANCE_M", "4.0"))
+    VIDEO_BATCH_SIZE = int(os.environ.get("VIDEO_BATCH_SIZE", "8"))
+    VIDEO_TRACK_IOU = float(os.environ.get("VIDEO_TRACK_IOU", "0.2"))
+    VIDEO_TRACK_MAX_SHIFT = float(os.environ.get("VIDEO_TRACK_MAX_SHIFT", "0.08"))
+    VIDEO_TRACK_MAX_AGE = int(os.environ.get("VIDEO_TRACK_MAX_AGE", "2"))
+    VIDEO_TRACK_MIN_HITS = int(os.environ.get("VIDEO_TRACK_MIN_HITS", "2"))
+
+    # --- Department Routing ---
+    # compiled: the reasoner evaluates its GNN once per attribute combination and
+    # routes by table lookup; gnn: one GNN pass per batch of detections; table:
+    # load a table written by compile_routing_table.py from ROUTING_TABLE_PATH
+    # (the reasoning GNN and torch are never loaded for routing).
+    REASONER_MODE = os.environ.get("REASONER_MODE", "compiled")  # compiled | gnn | table
+    ROUTING_TABLE_PATH = os.environ.get("ROUTING_TABLE_PATH", os.path.join(STORAGE_FOLDER, 'routing_table.json'))
+    # The reasoner's graph comes from the department and tag tables; rows added by
+    # other processes are picked up this often (0 = only at startup)
+    KG_SYNC_INTERVAL_S = float(os.environ.get("KG_SYNC_INTERVAL_S", "300"))
+    # Department / tag name -> id caches (services/name_cache.py) reload this often
+    NAME_CACHE_REFRESH_S = float(os.environ.get("NAME_CACHE_REFRESH_S", "300"))
+
+    # --- Duplicate Reports ---
+    # A photo taken within GEO_DEDUP_RADIUS_M of an open incident of the same type
+    # seen in the last GEO_DEDUP_WINDOW_DAYS is attached to it (report_count + 1)
+    # instead of creating a new detection. GEO_DEDUP_MODE "verify" first checks the
+    # photo with that incident's model only; "skip" attaches without inference when
+    # the client names the detection_type. The spatial index reloads from the DB
+    # every GEO_INDEX_REFRESH_S. Off by default: it changes what an upload returns.
+    GEO_DEDUP_ENABLED = os.environ.get("GEO_DEDUP_ENABLED", "false").lower() == "true"
+    GEO_DEDUP_RADIUS_M = float(os.environ.get("GEO_DEDUP_RADIUS_M", "15"))
+    GEO_DEDUP_WINDOW_DAYS = float(os.environ.get("GEO_DEDUP_WINDOW_DAYS", "14"))
+    GEO_DEDUP_MODE = os.environ.get("GEO_DEDUP_MODE", "verify")  # verify | skip
+    GEO_INDEX_REFRESH_S = float(os.environ.get("GEO_INDEX_REFRESH_S", "60"))
+
+    # --- Write-Behind Inserts ---
+    # New detections are journaled to WRITE_BEHIND_JOURNAL_DIR and returned to the
+    # client right away; a background thread inserts them in batches of up to
+    # WRITE_BEHIND_MAX_ROWS rows, at least every WRITE_BEHIND_MAX_DELAY_MS. Failed
+    # flushes retry with backoff up to WRITE_BEHIND_RETRY_MAX_S between attempts.
+    # Off by default: a new detection is readable only after its batch is flushed.
+    WRITE_BEHIND_ENABLED = os.environ.get("WRITE_BEHIND_ENABLED", "false").lower() == "true"
+    WRITE_BEHIND_MAX_ROWS = int(os.environ.get("WRITE_BEHIND_MAX_ROWS", "500"))
+    WRITE_BEHIND_MAX_DELAY_MS = float(os.environ.get("WRITE_BEHIND_MAX_DELAY_MS", "50"))
+    WRITE_BEHIND_JOURNAL_DIR = os.environ.get("WRITE_BEHIND_JOURNAL_DIR", os.path.join(STORAGE_FOLDER, 'write_behind'))
+    WRITE_BEHIND_RETRY_MAX_S = float(os.environ.get("WRITE_BEHIND_RETRY_MAX_S", "30"))
+
+    # --- Detection Lists ---
+    # List endpoints return pages of DETECTION_PAGE_SIZE rows (?limit= up to
+    # DETECTION_PAGE_MAX), continued with the ?cursor= from X-Next-Cursor
+    DETECTION_PAGE_SIZE = int(os.environ.get("DETECTION_PAGE_SIZE", "100"))
+    DETECTION_PAGE_MAX = int(os.environ.get("DETECTION_PAGE_MAX", "1000"))
+    # Exports (/export endpoints) stream every row, fetched this many at a time
+    EXPORT_YIELD_PER = int(os.environ.get("EXPORT_YIELD_PER", "1000"))
+
+    # --- Result Cache ---
+    # Re-uploads of the same photo reuse the earlier analysis instead of re-running
+    # the models. RESULT_CACHE_PHASH also matches near-duplicates (re-encoded or
+    # resized copies) within RESULT_CACHE_PHASH_DISTANCE bits; RESULT_CACHE_DIR=""
+    # keeps the cache in memory only. The disk tier keeps at most
+    # RESULT_CACHE_DISK_MAX_ENTRIES files; expired ones are removed.
+    RESULT_CACHE_ENABLED = os.environ.get("RESULT_CACHE_ENABLED", "true").lower() == "true"
+    RESULT_CACHE_MAX_ENTRIES = int(os.environ.get("RESULT_CACHE_MAX_ENTRIES", "1024"))
+    RESULT_CACHE_TTL_S = float(os.environ.get("RESULT_CACHE_TTL_S", "86400"))
+    RESULT_CACHE_DIR = os.environ.get("RESULT_CACHE_DIR", os.path.join(STORAGE_FOLDER, 'cache'))
+    RESULT_CACHE_DISK_MAX_ENTRIES = int(os.environ.get("RESULT_CACHE_DISK_MAX_ENTRIES", "20000"))
+    RESULT_CACHE_PHASH = os.environ.get("RESULT_CACHE_PHASH", "false").lower() == "true"
+    RESULT_CACHE_PHASH_DISTANCE = int(os.environ.get("RESULT_CACHE_PHASH_DISTANCE", "4"))
+
 
 def setup_logging():
     logging.basicConfig(
@@ -59,55 +217,3 @@ def setup_logging():
         format="%(asctime)s - %(name)s - %(levelname)s - %(message)s"
     )
 
-
-# --- ModelLoader Class ---
-try:
-    from ultralytics import YOLO
-except ImportError:
-    # Define a mock YOLO class if ultralytics is not available for testing purposes
-    class YOLO:
-        def __init__(self, path):
-            pass
-        def __call__(self, *args, **kwargs):
-            return []
-        @property
-        def names(self):
-            return {0: "mock_class"}
-
-
-class ModelLoader:
-    def __init__(self, waste_model_path, pothole_model_path):
-        self.device = "cuda" if torch.cuda.is_available() else "cpu"
-        logging.info(f"Loading YOLO models on {self.device.upper()}...")
-
-        if not os.path.exists(waste_model_path):
-            raise FileNotFoundError(f"Waste model not found: {waste_model_path}")
-
-        if not os.path.exists(pothole_model_path):
-            raise FileNotFoundError(f"Pothole model not found: {pothole_model_path}")
-
-        try:
-            self.waste_model = YOLO(waste_model_path)
-            self.pothole_model = YOLO(pothole_model_path)
-            logging.info("Models loaded successfully.")
-        except Exception as e:
-            logging.exception("Failed to load YOLO models.")
-            raise e
-
-    def predict(self, image_path, task_type="waste", conf=0.25, imgsz=640):
-        model = self.waste_model if task_type == "waste" else self.pothole_model
-
-        return model(
-            source=image_path,
-            conf=conf,
-            imgsz=imgsz,  # Fixed typo here
-            device=self.device 
-        )
-
-    def get_class_name(self, task_type, class_id):
-        """Return class name from YOLO model."""
-        if task_type == "waste":
-            return self.waste_model.names.get(class_id, "unknown")
-        elif task_type == "pothole":
-            return self.pothole_model.names.get(class_id, "unknown")
-        return "unknown"
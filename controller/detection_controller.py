@@ -1,17 +1,42 @@
-import os
-from flask import Blueprint, request, jsonify, current_app 
+from flask import Blueprint, request, jsonify, current_app, url_for, Response, stream_with_context
 from werkzeug.utils import secure_filename 
 from models.db import db
-from services.detection_service import detect_image_type 
+from services.detection_service import detect_image_type, detect_batch, delete_detections
+from services.bulk_upload import (
+    BulkUploadError,
+    batched,
+    iter_items,
+    iter_uploaded_files,
+    merge_metadata,
+    open_archive,
+    parse_metadata
+)
+from services.job_queue import wants_async, enqueue_job
+from services.geo_index import GEO_INDEX
+from services.write_behind import persist
+from services.detection_listing import (
+    ListQueryError,
+    page_detections,
+    parse_fields,
+    parse_limit,
+    relation_names,
+    stream_detections
+)
+from utils.json_stream import iter_json_array
+from services.video_ingest import allowed_video, gps_track_path_for
+from controller.job_controller import job_accepted
 from controller.auth.auth_middleware import token_required
 from models.user_model import User
 from models.detection import Detection
 from datetime import datetime
-from sqlalchemy import select 
-from sqlalchemy.orm import joinedload, selectinload 
 
 detection_bp = Blueprint('detection_bp', __name__, url_prefix='/detections')
 
+# get_detections_by_user's fields when the request names none
+USER_DETECTION_FIELDS = ["id", "detection_type", "image_name", "latitude", "longitude", "location"]
+# get_user_full_details' fields when the request names none
+FULL_DETAILS_FIELDS = USER_DETECTION_FIELDS + ["timestamp", "detection_status"]
+
 def allowed_file(filename):
     ALLOWED_EXTENSIONS = {'png','jpg','jpeg','gif'}
     return '.' in filename and filename.rsplit('.', 1)[1].lower() in ALLOWED_EXTENSIONS
@@ -22,12 +47,17 @@ def create_detection(current_user):
     lat = request.form.get('latitude')
     lon = request.form.get('longitude')
     location = request.form.get('location')
+    # Optional hint ("pothole" / "waste") used to match reports of an existing incident
+    detection_type = request.form.get('detection_type')
     
     if not image or not lat or not lon or not location:
         return jsonify({'error': 'Missing required fields (image, latitude, longitude, or location)'}), 400
     
     if image.filename == '':
         return jsonify({'error': 'No file selected for upload'}), 400
+
+    if detection_type and detection_type not in ['pothole', 'waste']:
+        return jsonify({'error': 'Invalid detection_type'}), 400
         
     if not allowed_file(image.filename):
         return jsonify({'error': 'Image file type not allowed'}), 400
@@ -38,15 +68,38 @@ def create_detection(current_user):
     except ValueError:
         return jsonify({'error': 'Invalid latitude/longitude'}), 400
         
+    # Async mode: persist the upload, queue it for the job workers and answer right away
+    if wants_async():
+        job = enqueue_job(
+            "detection", image.filename, data=image.read(), user_id=current_user.id,
+            latitude=latitude, longitude=longitude, location=location, task_type=detection_type
+        )
+        return job_accepted(job, url_for('detection_bp.get_my_job', job_id=job.id))
+
+    body, status_code = run_detection(image, current_user, latitude, longitude, location, detection_type)
+    return jsonify(body), status_code
+
+def run_detection(image, current_user, latitude, longitude, location, detection_type=None):
+    """
+    Detects, saves and builds the response body for one upload. Returns (body, status code);
+    shared by the synchronous endpoint and the background job workers.
+    """
     # 1. Pass the FileStorage object and location data directly to the service
     # 2. Expect four return values: detection_type, result_data, image_name, actual_image_path
     detection_type, result_data, image_name, actual_image_path = detect_image_type(
-        image, current_user.id, latitude, longitude, location
+        image, current_user.id, latitude, longitude, location, detection_type
     ) 
     
     if detection_type is None:
         # If no detection is found, the service has cleaned up its temporary files.
-        return jsonify({'message': 'No pothole or waste detected, file discarded.'}), 200
+        return {'message': 'No pothole or waste detected, file discarded.'}, 200
+
+    if result_data.get("attached"):
+        # A nearby open incident already covers this report; it was counted on that incident
+        return {
+            'message': f'{detection_type.capitalize()} already reported here; your report was added to it.',
+            'data': result_data
+        }, 200
         
     # The service has already saved the detection to the database.
     # We now just need to ensure the result data has the necessary info for the API response.
@@ -55,7 +108,7 @@ def create_detection(current_user):
     # The check for 'image_name' and 'actual_image_path' is redundant if we trust the service, 
     # but kept for robustness.
     if not image_name or not actual_image_path:
-        return jsonify({'error': 'Detection successful, but failed to retrieve saved file path from service.'}), 500
+        return {'error': 'Detection successful, but failed to retrieve saved file path from service.'}, 500
 
     # The service function `save_to_database` now returns the created Detection object.
     # The current `detect_image_type` implementation returns the `result` dictionary 
@@ -70,17 +123,17 @@ def create_detection(current_user):
     # but based on the provided service code, the `save_to_database` returns the ID.
     # I will modify the service's return to include the ID in the result_data.
     
-    # We must retrieve the newly created detection record to get its ID.
-    # The result_data is missing the ID since the service committed the record.
-    # We'll use the image_name to retrieve the record, which is brittle but necessary 
-    # given the current code structure where the service handles the commit.
-    new_detection = Detection.query.filter_by(image_name=image_name, user_id=current_user.id).first()
-    
-    if not new_detection:
-         return jsonify({'error': 'Failed to retrieve newly created detection record.'}), 500
+    # The service now returns the saved detection's ID in result_data. Fall back to the
+    # image_name lookup only if it is missing (the "both" policy saves several rows per image).
+    new_detection_id = result_data.get("id")
+    if not new_detection_id:
+        new_detection = Detection.query.filter_by(image_name=image_name, user_id=current_user.id).first()
+        if not new_detection:
+            return {'error': 'Failed to retrieve newly created detection record.'}, 500
+        new_detection_id = new_detection.id
          
     result_data.update({
-        "id": new_detection.id, 
+        "id": new_detection_id, 
         # Latitude, longitude, location are already in result_data from service
         "user": {
             "id": current_user.id,
@@ -91,25 +144,155 @@ def create_detection(current_user):
         }
     })
 
-    return jsonify({
+    return {
         'message': f'{detection_type.capitalize()} detected successfully.',
         'data': result_data
-    }), 201
+    }, 201
+
+@token_required
+def create_detections_bulk(current_user):
+    """
+    Many images in one request: a multipart `images` list or a ZIP `archive`, with
+    per-image metadata. Inference runs in batches and every resulting row is written
+    in a single transaction; the response summarises each item.
+    """
+    archive = request.files.get('archive')
+    images = request.files.getlist('images')
+    if not archive and not images:
+        return jsonify({'error': 'Provide an `archive` ZIP or one or more `images` files'}), 400
+
+    defaults = {
+        "latitude": request.form.get('latitude'),
+        "longitude": request.form.get('longitude'),
+        "location": request.form.get('location')
+    }
+    try:
+        metadata = parse_metadata(request.form.get('metadata'))
+        if archive:
+            archive_metadata, entries = open_archive(archive)
+            metadata = merge_metadata(archive_metadata, metadata)
+        else:
+            entries = iter_uploaded_files(images)
+    except BulkUploadError as e:
+        return jsonify({'error': str(e)}), 400
+
+    summaries, rows = [], []
+    for batch in batched(iter_items(entries, metadata, defaults), current_app.config['BULK_BATCH_SIZE']):
+        ready = [item for item in batch if "error" not in item]
+        batch_summaries, batch_rows = detect_batch(ready, current_user.id) if ready else ([], [])
+        done = {summary["index"]: summary for summary in batch_summaries}
+        for item in batch:
+            summaries.append(done.get(item["index"]) or {
+                "index": item["index"], "filename": item["filename"], "status": "error", "error": item["error"]
+            })
+        rows.extend(batch_rows)
+
+    # One transaction (or one write-behind submit) for the whole upload
+    persist(rows, GEO_INDEX.adder(rows) if GEO_INDEX is not None else None)
+
+    counts = {}
+    for summary in summaries:
+        counts[summary["status"]] = counts.get(summary["status"], 0) + 1
+    return jsonify({
+        'message': f"Processed {len(summaries)} images.",
+        'total': len(summaries),
+        'detected': counts.get("detected", 0),
+        'no_detection': counts.get("no_detection", 0),
+        'errors': counts.get("error", 0),
+        'items': summaries
+    }), 200
+
+@token_required
+def create_video_detection(current_user):
+    """
+    Queues a dashcam video (optionally with a `gps` CSV track: t, latitude, longitude)
+    for background ingestion; one detection is saved per tracked object.
+    """
+    video = request.files.get('video')
+    gps = request.files.get('gps')
+    task_type = request.form.get('task_type', 'pothole')
+
+    if not video or video.filename == '':
+        return jsonify({'error': 'No video file provided'}), 400
+    if not allowed_video(video.filename):
+        return jsonify({'error': 'Video file type not allowed'}), 400
+    if task_type not in ['pothole', 'waste']:
+        return jsonify({'error': 'Invalid task_type'}), 400
+    try:
+        latitude = float(request.form.get('latitude', 0.0))
+        longitude = float(request.form.get('longitude', 0.0))
+    except ValueError:
+        return jsonify({'error': 'Invalid latitude/longitude'}), 400
+
+    job = enqueue_job(
+        "video", video.filename, upload=video, user_id=current_user.id, task_type=task_type,
+        latitude=latitude, longitude=longitude, location=request.form.get('location', '')
+    )
+    if gps:
+        gps.save(gps_track_path_for(job.upload_path))
+    return job_accepted(job, url_for('detection_bp.get_my_job', job_id=job.id))
+
+def _list_args(default_fields=None):
+    """(fields, limit, cursor) from the query string; raises ListQueryError."""
+    return (
+        parse_fields(request.args.get('fields'), default_fields),
+        parse_limit(request.args.get('limit')),
+        request.args.get('cursor')
+    )
+
+def _page_response(body, next_cursor):
+    response = jsonify(body)
+    if next_cursor:
+        response.headers['X-Next-Cursor'] = next_cursor
+    return response, 200
 
 @token_required
 def get_my_detections(current_user):
-    records = Detection.query.filter(Detection.user_id == current_user.id).all()
-    if not records:
+    try:
+        fields, limit, cursor = _list_args()
+        records, next_cursor = page_detections(
+            Detection.user_id == current_user.id, fields=fields, limit=limit, cursor=cursor)
+    except ListQueryError as e:
+        return jsonify({'error': str(e)}), 400
+    if not records and not cursor:
         return jsonify({'message': 'No detections found for this user'}), 200
-    return jsonify([r.to_dict() for r in records]), 200
+    return _page_response(records, next_cursor)
 
 @token_required
 def get_my_by_type(current_user, detection_type):
     if detection_type not in ['pothole', 'waste']:
         return jsonify({'error': 'Invalid detection type'}), 400
-    records = Detection.query.filter_by(
-        user_id=current_user.id, detection_type=detection_type).all()
-    return jsonify([r.to_dict() for r in records]), 200
+    try:
+        fields, limit, cursor = _list_args()
+        records, next_cursor = page_detections(
+            Detection.user_id == current_user.id, Detection.detection_type == detection_type,
+            fields=fields, limit=limit, cursor=cursor)
+    except ListQueryError as e:
+        return jsonify({'error': str(e)}), 400
+    return _page_response(records, next_cursor)
+
+def _export_response(criteria, default_fields=None):
+    """Streams every matching detection as one JSON array (see stream_detections)."""
+    try:
+        fields = parse_fields(request.args.get('fields'), default_fields)
+    except ListQueryError as e:
+        return jsonify({'error': str(e)}), 400
+    rows = stream_detections(*criteria, fields=fields)
+    return Response(
+        stream_with_context(iter_json_array(rows)),
+        mimetype="application/json",
+        headers={"X-Accel-Buffering": "no"}
+    )
+
+@token_required
+def export_my_detections(current_user):
+    criteria = [Detection.user_id == current_user.id]
+    detection_type = request.args.get('type')
+    if detection_type:
+        if detection_type not in ['pothole', 'waste']:
+            return jsonify({'error': 'Invalid detection type'}), 400
+        criteria.append(Detection.detection_type == detection_type)
+    return _export_response(criteria)
 
 @token_required
 def get_my_single(current_user, id): 
@@ -118,55 +301,58 @@ def get_my_single(current_user, id):
 
 @token_required
 def get_detections_by_user(current_user, user_id): 
-    stmt = (
-        select(Detection)
-        .where(Detection.user_id == user_id)
-        .options(joinedload(Detection.user)) 
-        .order_by(Detection.timestamp.desc())
-    )
-    records = db.session.execute(stmt).scalars().all() 
-    if not records:
+    try:
+        fields, limit, cursor = _list_args(USER_DETECTION_FIELDS)
+        records, next_cursor = page_detections(
+            Detection.user_id == user_id, fields=fields, limit=limit, cursor=cursor)
+    except ListQueryError as e:
+        return jsonify({'error': str(e)}), 400
+    if not records and not cursor:
         return jsonify({"message": "No detections found for this user"}), 404
-    data = []
-    for det in records:
-        user = det.user         
-        det_dict = {
-            "id": det.id,
-            "detection_type": det.detection_type,
-            "image_name": det.image_name,
-            "latitude": det.latitude,
-            "longitude": det.longitude,
-            "location": det.location,
-            "user": {
-                "id": user.id,
-                "name": getattr(user, 'name', None),
-                "email": user.email,
-                "role": getattr(user, 'role', None),
-                "organization_name": getattr(user, 'organization_name', None)
-            }
-        }
-        data.append(det_dict)
 
-    return jsonify({"detections": data}), 200
+    # Every row belongs to the same user: load it once instead of joining it per row
+    user = db.session.get(User, user_id)
+    user_dict = {
+        "id": user.id,
+        "name": getattr(user, 'name', None),
+        "email": user.email,
+        "role": getattr(user, 'role', None),
+        "organization_name": getattr(user, 'organization_name', None)
+    } if user else None
+    for det_dict in records:
+        det_dict["user"] = user_dict
+
+    return jsonify({"detections": records, "next_cursor": next_cursor}), 200
+
+@token_required
+def export_detections_by_user(current_user, user_id):
+    if getattr(current_user, "role", "user") != "admin":
+        return jsonify({"error": "Unauthorized"}), 403
+    return _export_response([Detection.user_id == user_id], USER_DETECTION_FIELDS)
 
 @token_required
 def get_user_full_details(current_user, user_id):
     if getattr(current_user, "role", "user") != "admin":
         return jsonify({"error": "Unauthorized"}), 403
-    user = (
-        User.query.options(
-            joinedload(User.detections)
-            .joinedload(Detection.departments)
-            .joinedload("department"),
-            joinedload(User.detections)
-            .joinedload(Detection.tags)
-            .joinedload("tag")
-        )
-        .filter(User.id == user_id)
-        .first()
-    )
+    user = db.session.get(User, user_id)
     if not user:
         return jsonify({"error": "User not found"}), 404
+    try:
+        fields, limit, cursor = _list_args(FULL_DETAILS_FIELDS)
+        # Names are attached by detection id
+        fields = fields if "id" in fields else ["id"] + fields
+        detections, next_cursor = page_detections(
+            Detection.user_id == user_id, fields=fields, limit=limit, cursor=cursor)
+    except ListQueryError as e:
+        return jsonify({'error': str(e)}), 400
+
+    # Department and tag names for the whole page in one query each, instead of
+    # joining both relations onto every detection (detections x departments x tags rows)
+    departments, tags = relation_names([det["id"] for det in detections])
+    for det in detections:
+        det["departments"] = departments.get(det["id"], [])
+        det["tags"] = tags.get(det["id"], [])
+
     data = {
         "id": user.id,
         "name": user.name,
@@ -175,26 +361,9 @@ def get_user_full_details(current_user, user_id):
         "organization_name": user.organization_name,
         "created_at": user.created_at.strftime("%Y-%m-%d %H:%M:%S"),
         "updated_at": user.updated_at.strftime("%Y-%m-%d %H:%M:%S"),
-        "detections": []
+        "detections": detections,
+        "next_cursor": next_cursor
     }
-    for det in user.detections:
-        # Assuming Detection.departments and Detection.tags are relationships
-        departments = [dept.department.name for dept in det.departments if hasattr(dept, 'department') and dept.department]
-        tags = [tag.tag.name for tag in det.tags if hasattr(tag, 'tag') and tag.tag]
-        
-        data["detections"].append({
-            "id": det.id,
-            "detection_type": det.detection_type,
-            "image_name": det.image_name,
-            "latitude": det.latitude,
-            "longitude": det.longitude,
-            "location": det.location,
-            "timestamp": det.timestamp.strftime("%Y-%m-%d %H:%M:%S"),
-            "detection_status": det.detection_status,
-            "departments": departments,
-            "tags": tags
-        })
-
     return jsonify(data), 200
 
 @token_required
@@ -215,52 +384,22 @@ def update_my_detection(current_user, id):
 
 @token_required
 def delete_my_detection(current_user, id):
-    record = Detection.query.filter_by(user_id=current_user.id, id=id).first()
-    if not record:
+    # Files are removed in the background (services/file_gc.py)
+    deleted = delete_detections(Detection.user_id == current_user.id, Detection.id == id)
+    if not deleted:
         return jsonify({'error': 'Record not found'}), 404
-        
-    # The image path handling is tricky as the folder is determined by detection type
-    # but the path is saved in the record. We rely on the saved paths first.
-    
-    original_path_to_delete = record.image_path
-    annotated_path_to_delete = record.detected_image_path
-    
-    # Try to delete original image
-    if original_path_to_delete and os.path.exists(original_path_to_delete):
-        os.remove(original_path_to_delete)
-        
-    # Try to delete annotated image
-    if annotated_path_to_delete and os.path.exists(annotated_path_to_delete):
-        os.remove(annotated_path_to_delete)
-            
-    db.session.delete(record)
-    db.session.commit()
-    return jsonify({'message': f'{record.detection_type.capitalize()} deleted successfully'}), 200
+    detection_type = deleted[0][1]
+    return jsonify({'message': f'{detection_type.capitalize()} deleted successfully'}), 200
 
 @token_required
 def delete_all_my_by_type(current_user, detection_type):
     if detection_type not in ['pothole', 'waste']:
         return jsonify({'error': 'Invalid detection type'}), 400
-        
-    records = Detection.query.filter_by(
-        user_id=current_user.id, detection_type=detection_type).all()
-        
-    for record in records:
-        original_path_to_delete = record.image_path
-        annotated_path_to_delete = record.detected_image_path
-        
-        # Try to delete original image
-        if original_path_to_delete and os.path.exists(original_path_to_delete):
-            os.remove(original_path_to_delete)
-        
-        # Try to delete annotated image
-        if annotated_path_to_delete and os.path.exists(annotated_path_to_delete):
-            os.remove(annotated_path_to_delete)
-                
-        db.session.delete(record)
-        
-    db.session.commit()
+
+    # Set-based deletes in one transaction; files are removed in the background
+    deleted = delete_detections(
+        Detection.user_id == current_user.id, Detection.detection_type == detection_type)
     return jsonify({
         "message": f"All {detection_type} records deleted successfully.",
-        "count": len(records)
+        "count": len(deleted)
     }), 200
\ No newline at end of file
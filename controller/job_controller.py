@@ -0,0 +1,103 @@
+import json
+import time
+from flask import jsonify, Response, stream_with_context
+from config import Config
+from models.db import db
+from models.detection_job import DetectionJob
+from controller.auth.auth_middleware import token_required
+from services.job_queue import FINAL_STATUSES
+
+# Jobs submitted through the authenticated /api/detections endpoints
+OWNED_JOB_KINDS = ("detection", "video")
+
+
+def job_accepted(job, status_url):
+    """202 answer for a queued upload: where to poll and where to stream its progress."""
+    response = jsonify({
+        "message": "Upload accepted for processing.",
+        "job_id": job.id,
+        "status": job.status,
+        "status_url": status_url,
+        "events_url": f"{status_url}/events"
+    })
+    response.status_code = 202
+    response.headers["Location"] = status_url
+    return response
+
+
+def _job_events(job_id):
+    """
+    Server-sent events for one job: a `status` event whenever the job changes state,
+    until it is done or failed (or JOB_EVENTS_TIMEOUT_S passes).
+    """
+    def stream():
+        deadline = time.monotonic() + Config.JOB_EVENTS_TIMEOUT_S
+        last_status = None
+        while True:
+            job = db.session.get(DetectionJob, job_id)
+            payload = job.to_dict() if job else None
+            # Release the connection between polls; the stream may stay open for minutes
+            db.session.remove()
+
+            if payload is None:
+                yield "event: error\ndata: {\"error\": \"Job not found\"}\n\n"
+                return
+            if payload["status"] != last_status:
+                last_status = payload["status"]
+                yield f"event: status\ndata: {json.dumps(payload)}\n\n"
+            else:
+                yield ": keep-alive\n\n"
+            if last_status in FINAL_STATUSES:
+                return
+            if time.monotonic() > deadline:
+                yield "event: timeout\ndata: {}\n\n"
+                return
+            time.sleep(Config.JOB_POLL_INTERVAL_S)
+
+    return Response(
+        stream_with_context(stream()),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+# ---------------------------
+# /api/detections/jobs (owner only)
+# ---------------------------
+@token_required
+def get_my_job(current_user, job_id):
+    job = DetectionJob.query.filter(
+        DetectionJob.id == job_id,
+        DetectionJob.user_id == current_user.id,
+        DetectionJob.kind.in_(OWNED_JOB_KINDS)
+    ).first()
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict()), 200
+
+@token_required
+def get_my_job_events(current_user, job_id):
+    job = DetectionJob.query.filter(
+        DetectionJob.id == job_id,
+        DetectionJob.user_id == current_user.id,
+        DetectionJob.kind.in_(OWNED_JOB_KINDS)
+    ).first()
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return _job_events(job_id)
+
+
+# ---------------------------
+# /detection/jobs (anonymous, like /detection/detects)
+# ---------------------------
+def get_inference_job(job_id):
+    job = DetectionJob.query.filter_by(id=job_id, kind="inference").first()
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return jsonify(job.to_dict()), 200
+
+def get_inference_job_events(job_id):
+    job = DetectionJob.query.filter_by(id=job_id, kind="inference").first()
+    if not job:
+        return jsonify({'error': 'Job not found'}), 404
+    return _job_events(job_id)
@@ -0,0 +1,29 @@
+# export_models.py
+"""
+Exports the waste and pothole YOLO weights to ONNX so ModelLoader can run them
+on the "onnxruntime" or "openvino" backend (set INFERENCE_BACKEND in config).
+
+The .onnx file (dynamic batch and image size) and a .meta.json with the class
+names are written next to each .pt file.
+
+Usage: python export_models.py [imgsz]
+"""
+
+import sys
+import logging
+
+from config import Config, setup_logging
+from services.inference_backends import export_onnx
+
+logger = logging.getLogger(__name__)
+
+
+def export_all(imgsz):
+    for weights_path in (Config.WASTE_MODEL_PATH, Config.POTHOLE_MODEL_PATH):
+        onnx_path = export_onnx(weights_path, imgsz=imgsz)
+        print(f"{weights_path} -> {onnx_path}")
+
+
+if __name__ == '__main__':
+    setup_logging()
+    export_all(int(sys.argv[1]) if len(sys.argv) > 1 else Config.MODEL_IMGSZ)
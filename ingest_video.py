@@ -0,0 +1,43 @@
+# ingest_video.py
+"""
+Runs a dashcam video through frame sampling, batched inference and tracking,
+and saves one detection per tracked object (see services/video_ingest.py).
+
+Usage: python ingest_video.py VIDEO --user-id UUID [--gps track.csv]
+                              [--lat 0 --lon 0 --location ""] [--task pothole]
+"""
+
+import json
+import argparse
+
+from config import setup_logging
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("video")
+    parser.add_argument("--user-id", required=True)
+    parser.add_argument("--gps", default=None, help="CSV with t, latitude, longitude columns")
+    parser.add_argument("--lat", type=float, default=0.0)
+    parser.add_argument("--lon", type=float, default=0.0)
+    parser.add_argument("--location", default="")
+    parser.add_argument("--task", default="pothole", choices=["pothole", "waste"])
+    args = parser.parse_args()
+
+    from app import app
+    from services.video_ingest import ingest_video
+
+    with app.app_context():
+        summary = ingest_video(
+            args.video, args.user_id, args.lat, args.lon, args.location,
+            task_type=args.task, gps_track_path=args.gps
+        )
+    detections = summary.pop("detections")
+    print(json.dumps(summary, indent=2))
+    for d in detections:
+        print(f"  track {d['track_id']:>4}  t={d['time_s']:>8.2f}s  conf={d['confidence']:.2f}  {d['id']}")
+
+
+if __name__ == '__main__':
+    setup_logging()
+    main()
@@ -0,0 +1,26 @@
+"""add a heartbeat to detection jobs
+
+Revision ID: 2e8a6c4f0b71
+Revises: 5b7c9e1d3f20
+Create Date: 2026-10-18 18:04:12.518342
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '2e8a6c4f0b71'
+down_revision = '5b7c9e1d3f20'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('detection_jobs', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('heartbeat_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('detection_jobs', schema=None) as batch_op:
+        batch_op.drop_column('heartbeat_at')
@@ -0,0 +1,47 @@
+"""add detection_jobs queue table
+
+Revision ID: 3c1f0a9b2d47
+Revises: 7911f685f904
+Create Date: 2026-10-18 09:12:40.118203
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '3c1f0a9b2d47'
+down_revision = '7911f685f904'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    op.create_table('detection_jobs',
+    sa.Column('id', sa.String(length=36), nullable=False),
+    sa.Column('user_id', sa.String(length=36), nullable=True),
+    sa.Column('kind', sa.String(length=20), nullable=False),
+    sa.Column('status', sa.String(length=20), nullable=False),
+    sa.Column('attempts', sa.Integer(), nullable=False),
+    sa.Column('image_name', sa.String(length=200), nullable=False),
+    sa.Column('upload_path', sa.String(length=300), nullable=False),
+    sa.Column('task_type', sa.String(length=20), nullable=True),
+    sa.Column('latitude', sa.Float(), nullable=True),
+    sa.Column('longitude', sa.Float(), nullable=True),
+    sa.Column('location', sa.String(length=255), nullable=True),
+    sa.Column('result', sa.Text(), nullable=True),
+    sa.Column('status_code', sa.Integer(), nullable=True),
+    sa.Column('error', sa.Text(), nullable=True),
+    sa.Column('created_at', sa.DateTime(), nullable=False),
+    sa.Column('started_at', sa.DateTime(), nullable=True),
+    sa.Column('finished_at', sa.DateTime(), nullable=True),
+    sa.ForeignKeyConstraint(['user_id'], ['user.id'], ),
+    sa.PrimaryKeyConstraint('id')
+    )
+    # Workers claim the oldest queued job; stale "processing" jobs are found by started_at
+    op.create_index('ix_detection_jobs_status_created_at', 'detection_jobs', ['status', 'created_at'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_detection_jobs_status_created_at', table_name='detection_jobs')
+    op.drop_table('detection_jobs')
@@ -0,0 +1,62 @@
+"""add indexes for the detection access paths
+
+Revision ID: 5b7c9e1d3f20
+Revises: 8d2e4b6f1a93
+Create Date: 2026-10-18 15:22:47.309118
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '5b7c9e1d3f20'
+down_revision = '8d2e4b6f1a93'
+branch_labels = None
+depends_on = None
+
+# Must match models.detection.CLOSED_STATUSES, or the geo index query cannot use it
+OPEN_DETECTIONS = "lower(detection_status) NOT IN ('resolved', 'closed')"
+
+
+def upgrade():
+    with op.batch_alter_table('detections', schema=None) as batch_op:
+        # Per-user lists, newest first, continued by a (timestamp, id) cursor
+        batch_op.create_index('ix_detections_user_timestamp', ['user_id', 'timestamp', 'id'], unique=False)
+        batch_op.create_index('ix_detections_user_type_timestamp', ['user_id', 'detection_type', 'timestamp', 'id'], unique=False)
+        batch_op.create_index('ix_detections_timestamp', ['timestamp', 'id'], unique=False)
+        # Fallback id lookup after an upload
+        batch_op.create_index('ix_detections_image_name_user', ['image_name', 'user_id'], unique=False)
+
+    # Open incidents by last report (duplicate suppression); only open rows are indexed
+    op.create_index(
+        'ix_detections_open_last_seen', 'detections',
+        [sa.text('coalesce(last_reported_at, timestamp)')], unique=False,
+        postgresql_where=sa.text(OPEN_DETECTIONS), sqlite_where=sa.text(OPEN_DETECTIONS)
+    )
+
+    # Foreign keys that are looked up or deleted by
+    op.create_index('ix_detection_department_detection_id', 'detection_department', ['detection_id'], unique=False)
+    op.create_index('ix_detection_department_department_id', 'detection_department', ['department_id'], unique=False)
+    op.create_index('ix_detection_tag_detection_id', 'detection_tag', ['detection_id'], unique=False)
+    op.create_index('ix_detection_tag_tag_id', 'detection_tag', ['tag_id'], unique=False)
+    op.create_index('ix_image_detection_id', 'image', ['detection_id'], unique=False)
+
+    # Name -> id lookups of the tag cache
+    op.create_index('ix_tag_name', 'tag', ['name'], unique=False)
+
+
+def downgrade():
+    op.drop_index('ix_tag_name', table_name='tag')
+    op.drop_index('ix_image_detection_id', table_name='image')
+    op.drop_index('ix_detection_tag_tag_id', table_name='detection_tag')
+    op.drop_index('ix_detection_tag_detection_id', table_name='detection_tag')
+    op.drop_index('ix_detection_department_department_id', table_name='detection_department')
+    op.drop_index('ix_detection_department_detection_id', table_name='detection_department')
+    op.drop_index('ix_detections_open_last_seen', table_name='detections')
+
+    with op.batch_alter_table('detections', schema=None) as batch_op:
+        batch_op.drop_index('ix_detections_image_name_user')
+        batch_op.drop_index('ix_detections_timestamp')
+        batch_op.drop_index('ix_detections_user_type_timestamp')
+        batch_op.drop_index('ix_detections_user_timestamp')
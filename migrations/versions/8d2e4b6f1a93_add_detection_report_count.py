@@ -0,0 +1,28 @@
+"""add report_count and last_reported_at to detections
+
+Revision ID: 8d2e4b6f1a93
+Revises: 3c1f0a9b2d47
+Create Date: 2026-10-18 11:40:05.532671
+
+"""
+from alembic import op
+import sqlalchemy as sa
+
+
+# revision identifiers, used by Alembic.
+revision = '8d2e4b6f1a93'
+down_revision = '3c1f0a9b2d47'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    with op.batch_alter_table('detections', schema=None) as batch_op:
+        batch_op.add_column(sa.Column('report_count', sa.Integer(), server_default='1', nullable=False))
+        batch_op.add_column(sa.Column('last_reported_at', sa.DateTime(), nullable=True))
+
+
+def downgrade():
+    with op.batch_alter_table('detections', schema=None) as batch_op:
+        batch_op.drop_column('last_reported_at')
+        batch_op.drop_column('report_count')
@@ -1,16 +1,23 @@
 import os
 import logging
-import torch 
-from ultralytics import YOLO
+import torch
+from config import Config
+from services.batch_scheduler import BatchScheduler
+from services.inference_backends import load_backend
+from services.tiling import should_tile, tiled_predict
+from utils.file_utils import as_bgr_array
 
 logger = logging.getLogger(__name__)
 
 class ModelLoader:
-    def __init__(self, waste_model_path, pothole_model_path):
+    def __init__(self, waste_model_path, pothole_model_path, batching=None,
+                 max_batch_size=None, max_wait_ms=None, backend=None, precision=None):
         # FIX: Dynamically determine the best device (CUDA if available, otherwise CPU)
         self.device = "cuda" if torch.cuda.is_available() else "cpu"
-        
-        logger.info(f"Loading YOLO models on {self.device.upper()}...")
+        self.backend = backend or Config.INFERENCE_BACKEND
+        self.precision = precision or Config.INFERENCE_PRECISION
+
+        logger.info(f"Loading YOLO models on {self.device.upper()} ({self.backend} backend)...")
 
         if not os.path.exists(waste_model_path):
             raise FileNotFoundError(f"Waste model not found: {waste_model_path}")
@@ -19,30 +26,79 @@ class ModelLoader:
             raise FileNotFoundError(f"Pothole model not found: {pothole_model_path}")
 
         try:
-            self.waste_model = YOLO(waste_model_path)
-            self.pothole_model = YOLO(pothole_model_path)
+            self.waste_model = load_backend(self.backend, waste_model_path, self.device, self.precision)
+            self.pothole_model = load_backend(self.backend, pothole_model_path, self.device, self.precision)
             logger.info("Models loaded successfully.")
         except Exception as e:
             logger.exception("Failed to load YOLO models.")
             raise e
 
+        # Micro-batching: concurrent predict() calls for the same model share one forward pass
+        if batching is None:
+            batching = Config.INFERENCE_BATCHING
+        self.scheduler = None
+        if batching:
+            self.scheduler = BatchScheduler(
+                self._run_batch,
+                max_batch_size=max_batch_size or Config.INFERENCE_MAX_BATCH_SIZE,
+                max_wait_ms=Config.INFERENCE_MAX_WAIT_MS if max_wait_ms is None else max_wait_ms,
+                name="yolo-batch"
+            )
+
+    def _get_model(self, task_type):
+        return self.waste_model if task_type == "waste" else self.pothole_model
+
     def predict(self, image_path, task_type="waste", conf=0.25, imgsz=640):
-        model = self.waste_model if task_type == "waste" else self.pothole_model
+        # Large photos are sliced into tiles that run as one batch (see services/tiling.py)
+        if Config.TILING_ENABLED:
+            image_path = as_bgr_array(image_path)
+            if should_tile(image_path):
+                return [tiled_predict(self, image_path, task_type, conf, imgsz)]
+
+        if self.scheduler is None:
+            return self.predict_batch([image_path], task_type, conf, imgsz)
+
+        # Waits for the batch this request was grouped into; returns a one-element list
+        # so callers keep indexing results[0] as with a direct YOLO call.
+        future = self.scheduler.submit(task_type, (image_path, conf, imgsz))
+        return [future.result()]
 
-        # Pass the dynamically set device to the prediction call
-        return model(
-            source=image_path,
-            conf=conf,
-            imgsz=imgsz,
-            device=self.device 
-        )
+    def predict_batch(self, sources, task_type="waste", conf=0.25, imgsz=640):
+        """Runs one forward pass over several images (paths or BGR arrays)."""
+        return self._get_model(task_type).predict(list(sources), conf=conf, imgsz=imgsz)
+
+    def _run_batch(self, task_type, items):
+        """BatchScheduler callback: groups queued requests by (conf, imgsz) and runs each group once."""
+        results = [None] * len(items)
+        groups = {}
+        for i, (source, conf, imgsz) in enumerate(items):
+            groups.setdefault((conf, imgsz), []).append((i, source))
+
+        for (conf, imgsz), members in groups.items():
+            outputs = self.predict_batch([s for _, s in members], task_type, conf, imgsz)
+            for (i, _), output in zip(members, outputs):
+                results[i] = output
+
+        return results
 
     def get_class_name(self, task_type, class_id):
-        """Return class name from YOLO model."""
+        """Return class name from the loaded model."""
         if task_type == "waste":
             return self.waste_model.names.get(class_id, "unknown")
 
         elif task_type == "pothole":
             return self.pothole_model.names.get(class_id, "unknown")
 
-        return "unknown"
\ No newline at end of file
+        return "unknown"
+
+
+def create_model_loader(waste_model_path, pothole_model_path):
+    """
+    Returns the in-process ModelLoader, or a client for the inference worker
+    pool when INFERENCE_WORKERS > 0. Use services.model_registry instead of
+    calling this directly so each process loads the models only once.
+    """
+    if Config.INFERENCE_WORKERS > 0:
+        from services.inference_pool import InferencePool
+        return InferencePool(waste_model_path, pothole_model_path, workers=Config.INFERENCE_WORKERS)
+    return ModelLoader(waste_model_path, pothole_model_path)
@@ -5,3 +5,4 @@ from .tag import Tag
 from .detection import Detection
 from .image import Image
 from .relations import DetectionDepartment, DetectionTag
+from .detection_job import DetectionJob
@@ -2,6 +2,9 @@ from datetime import datetime
 from .db import db
 import uuid6 as uuid 
 
+# detection_status values (lower-cased) of incidents that are no longer open
+CLOSED_STATUSES = ("resolved", "closed")
+
 class Detection(db.Model):
     __tablename__ = "detections"
 
@@ -32,12 +35,35 @@ class Detection(db.Model):
     department = db.Column(db.String(100), nullable=False, default="General")
     detection_status = db.Column(db.String(50), nullable=False, default="Pending")
 
+    # Later reports of the same incident (see services/geo_index.py) are counted here
+    report_count = db.Column(db.Integer, nullable=False, default=1, server_default="1")
+    last_reported_at = db.Column(db.DateTime, nullable=True)
+
     # Relationships
     user = db.relationship("User", back_populates='detections')
     images = db.relationship('Image', back_populates='detection', lazy=True)
     departments = db.relationship('DetectionDepartment', back_populates='detection', lazy=True)
     tags = db.relationship('DetectionTag', back_populates='detection', lazy=True)
 
+    # One index per access path (see tests/test_query_plans.py):
+    #   user lists, newest first, continued by (timestamp, id) cursor
+    #   the same filtered by type (also delete-all-by-type)
+    #   global time order
+    #   the image_name fallback lookup after an upload
+    #   open incidents by last report (services/geo_index.py), partial on open rows
+    __table_args__ = (
+        db.Index("ix_detections_user_timestamp", "user_id", "timestamp", "id"),
+        db.Index("ix_detections_user_type_timestamp", "user_id", "detection_type", "timestamp", "id"),
+        db.Index("ix_detections_timestamp", "timestamp", "id"),
+        db.Index("ix_detections_image_name_user", "image_name", "user_id"),
+        db.Index(
+            "ix_detections_open_last_seen",
+            db.func.coalesce(last_reported_at, timestamp),
+            postgresql_where=db.func.lower(detection_status).notin_(CLOSED_STATUSES),
+            sqlite_where=db.func.lower(detection_status).notin_(CLOSED_STATUSES)
+        ),
+    )
+
     def to_dict(self):
         return {
             "id": self.id,
@@ -53,5 +79,7 @@ class Detection(db.Model):
             "waste_category": self.waste_category,
             "department": self.department,
             "timestamp": self.timestamp.strftime("%Y-%m-%d %H:%M:%S"),
-            "detection_status": self.detection_status
+            "detection_status": self.detection_status,
+            "report_count": self.report_count,
+            "last_reported_at": self.last_reported_at.strftime("%Y-%m-%d %H:%M:%S") if self.last_reported_at else None
         }
\ No newline at end of file
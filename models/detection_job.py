@@ -0,0 +1,56 @@
+import json
+from datetime import datetime
+from .db import db
+import uuid6 as uuid
+
+
+class DetectionJob(db.Model):
+    """An upload waiting for (or done with) background detection; see services/job_queue.py."""
+    __tablename__ = "detection_jobs"
+
+    id = db.Column(db.String(36), primary_key=True, default=lambda: str(uuid.uuid7()))
+    user_id = db.Column(db.String(36), db.ForeignKey("user.id"), nullable=True)
+
+    # "detection" (POST /api/detections/), "inference" (POST /detection/detects)
+    # or "video" (POST /api/detections/video)
+    kind = db.Column(db.String(20), nullable=False, default="detection")
+    status = db.Column(db.String(20), nullable=False, default="queued")
+    attempts = db.Column(db.Integer, nullable=False, default=0)
+
+    # The persisted upload and the request parameters
+    image_name = db.Column(db.String(200), nullable=False)
+    upload_path = db.Column(db.String(300), nullable=False)
+    task_type = db.Column(db.String(20), nullable=True)
+    latitude = db.Column(db.Float, nullable=True)
+    longitude = db.Column(db.Float, nullable=True)
+    location = db.Column(db.String(255), nullable=True)
+
+    # Outcome: the response body the synchronous endpoint would have returned
+    result = db.Column(db.Text, nullable=True)
+    status_code = db.Column(db.Integer, nullable=True)
+    error = db.Column(db.Text, nullable=True)
+
+    created_at = db.Column(db.DateTime, default=datetime.utcnow, nullable=False)
+    started_at = db.Column(db.DateTime, nullable=True)
+    # Refreshed by the worker holding the claim; a job goes back to the queue once it stops
+    heartbeat_at = db.Column(db.DateTime, nullable=True)
+    finished_at = db.Column(db.DateTime, nullable=True)
+
+    __table_args__ = (
+        db.Index("ix_detection_jobs_status_created_at", "status", "created_at"),
+    )
+
+    def to_dict(self):
+        return {
+            "id": self.id,
+            "kind": self.kind,
+            "status": self.status,
+            "attempts": self.attempts,
+            "image_name": self.image_name,
+            "result": json.loads(self.result) if self.result else None,
+            "status_code": self.status_code,
+            "error": self.error,
+            "created_at": self.created_at.strftime("%Y-%m-%d %H:%M:%S") if self.created_at else None,
+            "started_at": self.started_at.strftime("%Y-%m-%d %H:%M:%S") if self.started_at else None,
+            "finished_at": self.finished_at.strftime("%Y-%m-%d %H:%M:%S") if self.finished_at else None
+        }
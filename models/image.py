@@ -10,7 +10,7 @@ class Image(db.Model):
         default=lambda: str(uuid.uuid7())
     )
     
-    detection_id = db.Column(db.String(36), db.ForeignKey('detections.id'))
+    detection_id = db.Column(db.String(36), db.ForeignKey('detections.id'), index=True)
     
     uploaded_filename = db.Column(db.String, nullable=False)
     annotated_filename = db.Column(db.String, nullable=True)
@@ -11,7 +11,7 @@ class Tag(db.Model):
         unique=True, 
         nullable=False
     )
-    name = db.Column(db.String, nullable=False)
+    name = db.Column(db.String, nullable=False, index=True)
     
     department_id = db.Column(db.String(36), db.ForeignKey('department.id'), nullable=True) # 👈 Change to String(36)
 
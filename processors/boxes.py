@@ -0,0 +1,14 @@
+import numpy as np
+
+
+def box_arrays(boxes):
+    """
+    The whole Boxes tensor as NumPy in one transfer: (xyxy [n, 4], conf [n], cls [n]).
+    `boxes.data` is [n, 6] (x1, y1, x2, y2, conf, cls), or [n, 7] with a track id
+    before conf.
+    """
+    data = boxes.data
+    if hasattr(data, "cpu"):
+        data = data.cpu().numpy()
+    data = np.asarray(data, dtype=np.float64)
+    return data[:, :4], data[:, -2], data[:, -1].astype(np.int64)
@@ -1,4 +1,5 @@
-from utils.file_utils import load_image_as_bgr_array
+from utils.file_utils import as_bgr_array
+from processors.boxes import box_arrays
 import cv2
 import numpy as np
 
@@ -6,76 +7,90 @@ class PotholeProcessor:
     def __init__(self):
         pass
 
+    @staticmethod
+    def _clip_boxes(boxes, image):
+        """Integer pixel bounds of xyxy boxes, clipped to the image (truncated like int())."""
+        h, w = image.shape[:2]
+        clipped = np.maximum(boxes, 0).astype(np.int64)
+        clipped[:, [0, 2]] = np.minimum(clipped[:, [0, 2]], w)
+        clipped[:, [1, 3]] = np.minimum(clipped[:, [1, 3]], h)
+        return clipped
+
     def estimate_depth_heuristic(self, bbox, image):
         """
         Estimates depth based on darkness heuristic (darker area = greater depth).
         Max depth assumed to be 0.3m.
         """
-        # Ensure bbox values are within image bounds and valid integers
-        x1, y1, x2, y2 = [int(max(0, v)) for v in bbox]
-        x1, x2 = min(x1, image.shape[1]), min(x2, image.shape[1])
-        y1, y2 = min(y1, image.shape[0]), min(y2, image.shape[0])
-        
-        # Check for valid crop dimensions
-        if x2 <= x1 or y2 <= y1:
-            return 0.0
-            
-        crop = image[y1:y2, x1:x2]
-        if crop.size == 0:
-            return 0.0
-            
-        gray = cv2.cvtColor(crop, cv2.COLOR_BGR2GRAY)
-        mean = float(gray.mean())
-        
+        return float(self.estimate_depths(np.asarray([bbox], dtype=np.float64), image)[0])
+
+    def estimate_depths(self, boxes, image):
+        """
+        estimate_depth_heuristic for [n, 4] xyxy boxes at once: one grayscale
+        conversion and an integral image give every box's mean darkness in O(1).
+        """
+        if len(boxes) == 0:
+            return np.zeros(0)
+        x1, y1, x2, y2 = self._clip_boxes(boxes, image).T
+        area = (x2 - x1) * (y2 - y1)
+        valid = (x2 > x1) & (y2 > y1)
+        if not valid.any():
+            return np.zeros(len(boxes))
+
+        # Only the region the boxes cover is converted; coordinates shift into it
+        ox, oy = int(x1[valid].min()), int(y1[valid].min())
+        region = image[oy:int(y2[valid].max()), ox:int(x2[valid].max())]
+        gray = cv2.cvtColor(region, cv2.COLOR_BGR2GRAY)
+        # float64 sums are exact for any realistic image size (int32 overflows past ~8 MP)
+        integral = cv2.integral(gray, sdepth=cv2.CV_64F)
+        x1, x2 = np.clip(x1 - ox, 0, gray.shape[1]), np.clip(x2 - ox, 0, gray.shape[1])
+        y1, y2 = np.clip(y1 - oy, 0, gray.shape[0]), np.clip(y2 - oy, 0, gray.shape[0])
+        total = integral[y2, x2] - integral[y1, x2] - integral[y2, x1] + integral[y1, x1]
+        mean = np.divide(total, area, out=np.zeros(len(boxes)), where=valid)
+
         # Scale (255 - mean) normalized by 255 to a maximum of 0.3m
         # 255 (white) -> 0m; 0 (black) -> 0.3m
-        depth_m = max(0.0, (255.0 - mean) / 255.0 * 0.3)
-        return float(depth_m)
+        depth_m = np.maximum(0.0, (255.0 - mean) / 255.0 * 0.3)
+        return np.where(valid, depth_m, 0.0)
 
-    def extract(self, image_path: str, yolo_results):
-        img = load_image_as_bgr_array(image_path)
+    def extract(self, image, yolo_results):
+        # `image` is the decoded BGR array shared with the model (or a path as a fallback)
+        img = as_bgr_array(image)
         h, w = img.shape[:2]
         r = yolo_results[0]
         boxes = getattr(r, 'boxes', None)
         names = getattr(r, 'names', {}) if hasattr(r, 'names') else {}
 
-        detections = []
         if boxes is None or len(boxes) == 0:
             return {"detections": [], "primary": None, "road_type": "unknown"}
 
-        for box in boxes:
-            # Unified tensor to numpy conversion
-            try:
-                xyxy = box.xyxy[0].cpu().numpy()
-                conf = float(box.conf[0].cpu().numpy())
-                cls = int(box.cls[0].cpu().numpy())
-            except Exception:
-                xyxy = box.xyxy[0].numpy() if len(box.xyxy) > 0 else np.zeros(4)
-                conf = box.conf.item() if len(box.conf) > 0 else 0.0
-                cls = box.cls.item() if len(box.cls) > 0 else -1
-            
-            x1, y1, x2, y2 = map(float, xyxy.tolist())
-            area_px = max(0.0, (x2 - x1) * (y2 - y1))
-            area_pct = area_px / (w * h) if (w*h) > 0 else 0.0
-
-            depth_m = self.estimate_depth_heuristic([x1,y1,x2,y2], img)
-
-            # risk score: area_pct scaled by (1 + depth_ratio)
-            depth_ratio = (depth_m / 0.1) if depth_m and depth_m > 1e-6 else 0.0
-            risk_score = float(area_pct * (1.0 + depth_ratio))
+        # Every box is scored at once on arrays
+        xyxy, conf, cls = box_arrays(boxes)
+        area_px = np.maximum(0.0, (xyxy[:, 2] - xyxy[:, 0]) * (xyxy[:, 3] - xyxy[:, 1]))
+        area_pct = area_px / (w * h) if (w * h) > 0 else np.zeros(len(xyxy))
+        depth_m = self.estimate_depths(xyxy, img)
 
-            detections.append({
-                "xyxy": [x1, y1, x2, y2],
-                "conf": conf,
-                "class_id": cls,
-                "class_name": names.get(cls, str(cls)),
-                "area_px": float(area_px),
-                "area_pct": float(area_pct),
-                "est_depth_m": depth_m,
-                "risk_score": float(risk_score)
-            })
+        # risk score: area_pct scaled by (1 + depth_ratio)
+        depth_ratio = np.where(depth_m > 1e-6, depth_m / 0.1, 0.0)
+        risk_score = area_pct * (1.0 + depth_ratio)
 
-        detections_sorted = sorted(detections, key=lambda x: x['risk_score'], reverse=True)
+        # Highest risk first; a stable sort keeps the model's order between ties
+        order = np.argsort(-risk_score, kind="stable")
+        detections_sorted = [
+            {
+                "xyxy": box,
+                "conf": c,
+                "class_id": k,
+                "class_name": names.get(k, str(k)),
+                "area_px": a,
+                "area_pct": p,
+                "est_depth_m": d,
+                "risk_score": s
+            }
+            for box, c, k, a, p, d, s in zip(
+                xyxy[order].tolist(), conf[order].tolist(), cls[order].tolist(), area_px[order].tolist(),
+                area_pct[order].tolist(), depth_m[order].tolist(), risk_score[order].tolist()
+            )
+        ]
         primary = detections_sorted[0] if detections_sorted else None
 
         # Road type heuristic based on vertical position
@@ -83,7 +98,7 @@ class PotholeProcessor:
         if primary and h > 0:
             _, y1, _, y2 = primary['xyxy']
             # If the pothole is primarily in the bottom half of the image (y > 0.5 * h)
-            if (y2 / h) > 0.5: 
+            if (y2 / h) > 0.5:
                 road_type = "asphalt"
 
-        return {"detections": detections_sorted, "primary": primary, "road_type": road_type}
\ No newline at end of file
+        return {"detections": detections_sorted, "primary": primary, "road_type": road_type}
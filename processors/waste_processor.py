@@ -1,70 +1,60 @@
-from utils.file_utils import load_image_as_bgr_array
+from utils.file_utils import as_bgr_array
+from processors.boxes import box_arrays
 import numpy as np
-# Note: cv2 is not strictly needed here, but ensure load_image_as_bgr_array is robust
+# Note: cv2 is not strictly needed here, but ensure as_bgr_array is robust
 
 class WasteProcessor:
     def __init__(self):
         pass
 
-    def extract(self, image_path: str, yolo_results):
-        img = load_image_as_bgr_array(image_path)
+    def extract(self, image, yolo_results):
+        # `image` is the decoded BGR array shared with the model (or a path as a fallback)
+        img = as_bgr_array(image)
         h, w = img.shape[:2]
         r = yolo_results[0]
         boxes = getattr(r, 'boxes', None)
         names = getattr(r, 'names', {}) if hasattr(r, 'names') else {}
 
-        detections = []
         if boxes is None or len(boxes) == 0:
             return {"detections": [], "primary": None, "waste_type": "unknown"}
 
-        for box in boxes:
-            # Unified tensor to numpy conversion
-            try:
-                xyxy = box.xyxy[0].cpu().numpy()
-                conf = float(box.conf[0].cpu().numpy())
-                cls = int(box.cls[0].cpu().numpy())
-            except Exception:
-                xyxy = box.xyxy[0].numpy() if len(box.xyxy) > 0 else np.zeros(4)
-                conf = box.conf.item() if len(box.conf) > 0 else 0.0
-                cls = box.cls.item() if len(box.cls) > 0 else -1
-            
-            x1, y1, x2, y2 = map(float, xyxy.tolist())
-            area_px = max(0.0, (x2 - x1) * (y2 - y1))
-            area_pct = area_px / (w * h) if (w*h) > 0 else 0.0
-
-            # Density (Mask area / Bbox area)
-            density = 1.0 # Default if no mask is available
-            if hasattr(box, 'mask') and box.mask is not None:
-                try:
-                    # Get the mask for the current detection
-                    mask_data = box.mask.data[0].cpu().numpy()
-                    
-                    # Ensure mask has non-zero size before dividing
-                    if mask_data.size > 0:
-                        density = float(mask_data.sum() / mask_data.size)
-                    else:
-                        density = 0.0
-                except Exception:
-                    density = 1.0 
-
-            # Proximity to the bottom of the image (h - bottom_y) / h
-            bottom_y = y2
-            proximity_pct = (h - bottom_y) / h if h > 0 else 0.0
-
-            detections.append({
-                "xyxy": [x1, y1, x2, y2],
-                "conf": conf,
-                "class_id": cls,
-                "class_name": names.get(cls, str(cls)),
-                "area_px": float(area_px),
-                "area_pct": float(area_pct),
-                "density": float(density),
-                "proximity_pct": float(proximity_pct)
-            })
-
-        # Primary detection is the one with the largest pixel area
-        detections_sorted = sorted(detections, key=lambda x: x['area_px'], reverse=True)
+        # Every box is measured at once on arrays
+        xyxy, conf, cls = box_arrays(boxes)
+        n = len(xyxy)
+        area_px = np.maximum(0.0, (xyxy[:, 2] - xyxy[:, 0]) * (xyxy[:, 3] - xyxy[:, 1]))
+        area_pct = area_px / (w * h) if (w * h) > 0 else np.zeros(n)
+
+        # Density (Mask area / mask size); 1.0 when the model gives no masks
+        density = np.ones(n)
+        masks = getattr(r, 'masks', None)
+        if masks is not None and len(masks) == n:
+            mask_data = masks.data
+            mask_data = mask_data.cpu().numpy() if hasattr(mask_data, 'cpu') else np.asarray(mask_data)
+            if mask_data[0].size > 0:
+                density = mask_data.reshape(n, -1).mean(axis=1, dtype=np.float64)
+
+        # Proximity to the bottom of the image (h - bottom_y) / h
+        proximity_pct = (h - xyxy[:, 3]) / h if h > 0 else np.zeros(n)
+
+        # Primary detection is the one with the largest pixel area (stable between ties)
+        order = np.argsort(-area_px, kind="stable")
+        detections_sorted = [
+            {
+                "xyxy": box,
+                "conf": c,
+                "class_id": k,
+                "class_name": names.get(k, str(k)),
+                "area_px": a,
+                "area_pct": p,
+                "density": d,
+                "proximity_pct": x
+            }
+            for box, c, k, a, p, d, x in zip(
+                xyxy[order].tolist(), conf[order].tolist(), cls[order].tolist(), area_px[order].tolist(),
+                area_pct[order].tolist(), density[order].tolist(), proximity_pct[order].tolist()
+            )
+        ]
         primary = detections_sorted[0] if detections_sorted else None
         waste_type = primary.get('class_name') if primary else 'unknown'
 
-        return {"detections": detections_sorted, "primary": primary, "waste_type": waste_type}
\ No newline at end of file
+        return {"detections": detections_sorted, "primary": primary, "waste_type": waste_type}
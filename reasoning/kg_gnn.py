@@ -2,26 +2,58 @@
 """
 Knowledge-Graph + lightweight GNN-based department classifier.
 Used AFTER YOLO detection to determine responsible department.
+
+The graph holds department, tag and attribute nodes. Departments and tags come
+from the database (see services/knowledge_graph.py) and can be added at runtime
+with add_department / add_tag / add_edge; the sparse adjacency is extended in
+place instead of being rebuilt from the graph.
 """
 
+import hashlib
+import threading
+
 import networkx as nx
 import numpy as np
 import torch
 import torch.nn as nn
 import torch.nn.functional as F
 
-
-DEPARTMENTS = [
-    "Waste Management",
-    "Construction",
-    "Municipality",
-    "Roads",
-    "Electricity",
-    "Water",
-    "Ward Office"
+from reasoning.routing_table import (
+    ATTRIBUTES,
+    DEPARTMENTS,
+    RoutingTable,
+    all_flag_combinations,
+    attribute_flags
+)
+
+# Logical edges (Attribute -> Department), added whenever both ends exist
+ATTRIBUTE_EDGES = [
+    ("large_waste", "Waste Management"),
+    ("hazardous_waste", "Waste Management"),
+    ("large_waste", "Ward Office"), # Local management often handles large objects
+    ("deep_pothole", "Roads"),
+    ("large_pothole", "Roads"),
+    ("near_electric", "Electricity"),
+    ("near_water", "Water")
 ]
 
 
+def tag_node(name):
+    """Graph node of a tag; prefixed so a tag may share a department's name."""
+    return f"tag:{name}"
+
+
+def _propagate(adj, h):
+    """A @ h for a dense or sparse [N, N] adjacency and [N, H] or [B, N, H] node states."""
+    if not adj.is_sparse:
+        return torch.matmul(adj, h)
+    if h.dim() == 2:
+        return torch.sparse.mm(adj, h)
+    B, N, H = h.shape
+    m = torch.sparse.mm(adj, h.permute(1, 0, 2).reshape(N, B * H))
+    return m.reshape(N, B, H).permute(1, 0, 2)
+
+
 class SimpleGNN(nn.Module):
     def __init__(self, in_dim, hidden_dim, out_dim):
         super().__init__()
@@ -32,163 +64,285 @@ class SimpleGNN(nn.Module):
     def forward(self, features, adj, steps=2):
         # Initial transformation
         h = F.relu(self.fc1(features))
-        
+
         # Message Passing (Graph Convolution equivalent for 2 steps)
         for _ in range(steps):
             # Message aggregation: m = A * h
-            m = torch.matmul(adj, h)
+            m = _propagate(adj, h)
             # Message update
             h = F.relu(self.fc_msg(m))
-            
+
         # Output layer with Sigmoid for multi-label confidence/scores
         return torch.sigmoid(self.fc_out(h))
 
 
 class KnowledgeGraphReasoner:
-    def __init__(self):
+    def __init__(self, compiled=True, departments=None, tags=None):
+        # compiled: route through a table of every attribute combination (see
+        # reasoning/routing_table.py), rebuilt when the graph or weights change
+        self.compiled = compiled
         self.G = nx.DiGraph()
+        self._lock = threading.RLock()
 
-        # Department nodes
-        for d in DEPARTMENTS:
-            self.G.add_node(d, type='dept')
+        # Nodes are append-only, so a node's index never changes
+        self.nodes = []
+        self.node_index = {}
+        self.departments = []
+        self._dept_idx = []
 
-        # Attribute nodes
-        self.attrs = [
-            "large_waste", "hazardous_waste",
-            "large_pothole", "deep_pothole",
-            "near_electric", "near_water"
-        ]
+        # Undirected links with self-loops, kept as COO lists plus node degrees
+        self._links = set()
+        self._rows, self._cols = [], []
+        self._degree = []
+        self._graph_version = 0
 
+        # Attribute nodes
+        self.attrs = list(ATTRIBUTES)
         for a in self.attrs:
-            self.G.add_node(a, type='attr')
-
-        # Logical edges (Attribute -> Department)
-        edges = [
-            ("large_waste", "Waste Management"),
-            ("hazardous_waste", "Waste Management"),
-            ("large_waste", "Ward Office"), # Local management often handles large objects
-            ("deep_pothole", "Roads"),
-            ("large_pothole", "Roads"),
-            ("near_electric", "Electricity"),
-            ("near_water", "Water")
-        ]
+            self._add_node(a, 'attr')
+        self._attr_idx = np.array([self.node_index[a] for a in self.attrs])
 
-        for u, v in edges:
-            self.G.add_edge(u, v)
-
-        self.nodes = list(self.G.nodes())
-        self.node_index = {n: i for i, n in enumerate(self.nodes)}
+        # Department and tag nodes (the built-in list until the database is loaded)
+        for d in (DEPARTMENTS if departments is None else departments):
+            self.add_department(d)
+        for name, department in (tags or []):
+            self.add_tag(name, department)
 
         self.in_dim = 8
         self.hidden_dim = 16
-        self.out_dim = len(DEPARTMENTS)
-        
+        # One score per node, read out on the department nodes, so departments can
+        # be added without changing the weights
+        self.out_dim = 1
+
         # Initialize model (can load pre-trained weights here if available)
         self.model = SimpleGNN(self.in_dim, self.hidden_dim, self.out_dim)
 
+        # A, the routing table and the fingerprint are cached against the graph version;
+        # weight changes must go through load_state_dict() or invalidate_routing_table()
+        self._adj = None
+        self._adj_key = None
+        self._table = None
+        self._table_key = None
+        self._fingerprint = None
+        self._fingerprint_key = None
+
+    # ---------------------------
+    # GRAPH UPDATES
+    # ---------------------------
+    def _add_node(self, node, node_type):
+        if node in self.node_index:
+            return False
+        self.G.add_node(node, type=node_type)
+        self.node_index[node] = len(self.nodes)
+        self.nodes.append(node)
+        self._degree.append(0)
+        self._link(node, node)  # self-loop (required for GNN message passing)
+        return True
+
+    def _link(self, u, v):
+        ui, vi = self.node_index[u], self.node_index[v]
+        key = (min(ui, vi), max(ui, vi))
+        if key in self._links:
+            return
+        self._links.add(key)
+        # Directed edge (for attribute -> dept), undirected for message passing (dept -> attribute)
+        pairs = [(ui, vi)] if ui == vi else [(ui, vi), (vi, ui)]
+        for r, c in pairs:
+            self._rows.append(r)
+            self._cols.append(c)
+            self._degree[r] += 1
+
+    def add_department(self, name):
+        with self._lock:
+            if not self._add_node(name, 'dept'):
+                return False
+            self.departments.append(name)
+            self._dept_idx.append(self.node_index[name])
+            for attr, department in ATTRIBUTE_EDGES:
+                if department == name:
+                    self.add_edge(attr, name)
+            self._graph_version += 1
+            return True
+
+    def add_tag(self, name, department=None):
+        with self._lock:
+            added = self._add_node(tag_node(name), 'tag')
+            if department is not None:
+                self.add_department(department)
+                self.add_edge(tag_node(name), department)
+            if added:
+                self._graph_version += 1
+            return added
+
+    def add_edge(self, u, v):
+        with self._lock:
+            if u not in self.node_index or v not in self.node_index:
+                raise KeyError(f"Unknown node in edge {u!r} -> {v!r}")
+            if self.G.has_edge(u, v):
+                return False
+            self.G.add_edge(u, v)
+            self._link(u, v)
+            self._graph_version += 1
+            return True
+
+    def load_graph(self, departments, tags):
+        """
+        Adds the departments and (tag name, department name or None) pairs that are
+        not in the graph yet. Returns how many nodes were added.
+        """
+        with self._lock:
+            before = len(self.nodes)
+            for name in departments:
+                self.add_department(name)
+            for name, department in tags:
+                self.add_tag(name, department)
+            return len(self.nodes) - before
+
     # ---------------------------
     # FEATURE MATRIX (X)
     # ---------------------------
-    def build_feature_matrix(self, detection):
-        N = len(self.nodes)
-        feats = np.zeros((N, self.in_dim), dtype=np.float32)
-
-        params = detection.get("params", {})
-        t = detection.get("type")
-
-        # Trigger map
-        attr_map = {a: False for a in self.attrs}
-
-        # ---- Waste logic ----
-        if t == "waste":
-            p = params.get("primary", {})
-            if p:
-                if p.get("area_pct", 0) > 0.02:
-                    attr_map["large_waste"] = True
-
-                cls = p.get("class_name", "").lower()
-                if "battery" in cls or "chemical" in cls:
-                    attr_map["hazardous_waste"] = True
-
-        # ---- Pothole logic ----
-        # FIX: Corrected typo 'pothhole' to 'pothole'
-        if t == "pothole": 
-            p = params.get("primary", {})
-            if p:
-                if p.get("area_pct", 0) > 0.01:
-                    attr_map["large_pothole"] = True
-                if p.get("est_depth_m", 0) > 0.05:
-                    attr_map["deep_pothole"] = True
+    def attribute_flags(self, detection):
+        """Which attribute nodes a detection activates, as a bool per entry of self.attrs."""
+        return attribute_flags(detection, self.attrs)
+
+    def build_feature_batch(self, detections):
+        """Features of many detections as one [B, N, F] tensor."""
+        return self._features_from_flags([self.attribute_flags(d) for d in detections])
+
+    def _features_from_flags(self, flag_rows):
+        flags = np.array(flag_rows, dtype=np.float32)
+        feats = np.zeros((len(flag_rows), len(self.nodes), self.in_dim), dtype=np.float32)
 
         # Apply attribute features (Binary activation features)
-        for a in self.attrs:
-            idx = self.node_index[a]
-            val = 1.0 if attr_map[a] else 0.0
-            feats[idx, 0] = val
-            feats[idx, 1] = val # Duplicating features slightly increases the input dimension size
+        # Duplicating features slightly increases the input dimension size
+        if len(flag_rows):
+            feats[:, self._attr_idx, 0] = flags
+            feats[:, self._attr_idx, 1] = flags
 
         # Dept priors (Weak prior signal for each department node)
-        for i, d in enumerate(DEPARTMENTS):
-            idx = self.node_index[d]
-            # Use index 2 for a generic department prior feature
-            feats[idx, 2] = 0.1 
+        # Use index 2 for a generic department prior feature
+        feats[:, self._dept_idx, 2] = 0.1
 
         return torch.from_numpy(feats)
 
+    def build_feature_matrix(self, detection):
+        return self.build_feature_batch([detection])[0]
+
     # ---------------------------
     # ADJACENCY MATRIX (A)
     # ---------------------------
     def build_adj_matrix(self):
-        N = len(self.nodes)
-        adj = np.zeros((N, N), dtype=np.float32)
-
-        # Build unnormalized symmetric adjacency matrix (A)
-        for u, v in self.G.edges():
-            ui, vi = self.node_index[u], self.node_index[v]
-            adj[ui, vi] = 1 # Directed edge (for attribute -> dept)
-            adj[vi, ui] = 1 # Undirected for message passing (dept -> attribute)
-
-        # Add self-loops (required for GNN message passing)
-        for i in range(N):
-            adj[i, i] = 1
-
-        # Normalize A: Row-normalize to get D^-1 A or similar (sum(row) = 1)
-        # This is a simple normalization used in some GNN variants.
-        # Note: A proper GCN uses a symmetric normalization D^-0.5 A D^-0.5
-        adj_sum = adj.sum(axis=1, keepdims=True)
-        # Handle division by zero for isolated nodes (though none exist here)
-        adj_sum[adj_sum == 0] = 1 
-        adj = adj / adj_sum
-        
-        return torch.from_numpy(adj)
+        """
+        Row-normalized adjacency (D^-1 A, sum(row) = 1) as a sparse [N, N] tensor,
+        straight from the maintained COO lists and degrees.
+        Note: A proper GCN uses a symmetric normalization D^-0.5 A D^-0.5
+        """
+        with self._lock:
+            N = len(self.nodes)
+            rows = np.array(self._rows, dtype=np.int64)
+            cols = np.array(self._cols, dtype=np.int64)
+            degree = np.array(self._degree, dtype=np.float32)
+
+        values = 1.0 / degree[rows]
+        indices = torch.from_numpy(np.stack([rows, cols]))
+        return torch.sparse_coo_tensor(
+            indices, torch.from_numpy(values), (N, N), check_invariants=False
+        ).coalesce()
+
+    def adjacency(self):
+        """The normalized adjacency, rebuilt only when the graph changes."""
+        key = self._graph_version
+        if self._adj is None or self._adj_key != key:
+            self._adj = self.build_adj_matrix()
+            self._adj_key = key
+        return self._adj
+
+    # ---------------------------
+    # ROUTING TABLE
+    # ---------------------------
+    def load_state_dict(self, state_dict):
+        """Loads GNN weights; the routing table is recompiled on next use."""
+        with self._lock:
+            self.model.load_state_dict(state_dict)
+            self.invalidate_routing_table()
+
+    def invalidate_routing_table(self):
+        """Call after changing the GNN's weights in place (graph changes are tracked already)."""
+        with self._lock:
+            self._table = None
+            self._fingerprint = None
+
+    def fingerprint(self):
+        """Content hash of the graph and the weights; identifies a compiled table."""
+        with self._lock:
+            key = self._graph_version
+            if self._fingerprint is None or self._fingerprint_key != key:
+                digest = hashlib.sha1()
+                graph = (self.nodes, sorted(self.G.edges()), self.attrs, self.departments)
+                digest.update(repr(graph).encode("utf-8"))
+                for name, tensor in self.model.state_dict().items():
+                    digest.update(name.encode("utf-8"))
+                    digest.update(tensor.detach().cpu().numpy().tobytes())
+                self._fingerprint = digest.hexdigest()[:16]
+                self._fingerprint_key = key
+            return self._fingerprint
+
+    def compile_routing_table(self):
+        """Evaluates SimpleGNN once for every attribute combination."""
+        with self._lock:
+            rows = self._scores(self._features_from_flags(all_flag_combinations(len(self.attrs))))
+            return RoutingTable(rows, self.fingerprint(), self.attrs, list(self.departments))
+
+    def routing_table(self):
+        with self._lock:
+            key = self._graph_version
+            if self._table is None or self._table_key != key:
+                self._table = self.compile_routing_table()
+                self._table_key = key
+            return self._table
 
     # ---------------------------
     # FINAL REASONING
     # ---------------------------
     def reason(self, detection_record):
-        feat = self.build_feature_matrix(detection_record)
-        adj = self.build_adj_matrix()
-
+        return self.reason_many([detection_record])[0]
+
+    def reason_many(self, detection_records):
+        """
+        Department scores for many detections: table lookups when compiled, otherwise
+        one GNN pass over a [B, N, F] batch. Returns one {department: score} dict per
+        record, in order.
+        """
+        if not detection_records:
+            return []
+        if self.compiled:
+            return self.routing_table().reason_many(detection_records)
+        with self._lock:
+            return self._scores(self.build_feature_batch(detection_records))
+
+    def _scores(self, feats):
+        departments = list(self.departments)
         with torch.no_grad():
-            out = self.model(feat, adj)
-            
-            # Extract scores for only the department nodes
-            dept_scores_tensor = out[[self.node_index[d] for d in DEPARTMENTS]]
-            
-            # Sum/Average the scores for the department nodes to get the final confidence
-            # Summing the node outputs is a simple way to aggregate the result
-            # Assuming the model is designed to make the department node scores meaningful
-            final_scores = dept_scores_tensor.sum(dim=0).numpy()
-
-
-        # Normalization (Min-Max scaling for scores 0 to 1)
+            out = self.model(feats, self.adjacency())
+
+            # Extract the score of each department node
+            final_scores = out[:, self._dept_idx, 0].numpy()
+
+
+        # Normalization (Min-Max scaling for scores 0 to 1), per record
         total = final_scores
-        total_min, total_max = total.min(), total.max()
-        
-        if total_max == total_min:
-             # If all scores are equal (e.g., all 0.0), return equal scores
-             normalized_scores = np.ones_like(total) / len(DEPARTMENTS)
-        else:
-             normalized_scores = (total - total_min) / (total_max - total_min)
-        
-        return {dept: float(normalized_scores[i]) for i, dept in enumerate(DEPARTMENTS)}
\ No newline at end of file
+        total_min = total.min(axis=1, keepdims=True)
+        total_max = total.max(axis=1, keepdims=True)
+        span = total_max - total_min
+
+        # If all scores are equal (e.g., all 0.0), return equal scores
+        normalized_scores = np.where(
+            span == 0,
+            1.0 / len(departments),
+            (total - total_min) / np.where(span == 0, 1.0, span)
+        )
+
+        return [
+            {dept: float(row[i]) for i, dept in enumerate(departments)}
+            for row in normalized_scores.tolist()
+        ]
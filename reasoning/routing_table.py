@@ -0,0 +1,114 @@
+# reasoning/routing_table.py
+"""
+Torch-free department routing from a precompiled lookup table.
+
+The reasoner's input depends only on which of the six attribute flags a
+detection sets, so there are just 2^6 = 64 possible outputs. KnowledgeGraphReasoner
+evaluates all of them in one GNN pass (compile_routing_table) and routing becomes
+a table lookup. A table saved with `save` can be loaded by a process that never
+imports torch and used wherever a reasoner is expected (reason / reason_many).
+"""
+
+import os
+import json
+
+
+DEPARTMENTS = [
+    "Waste Management",
+    "Construction",
+    "Municipality",
+    "Roads",
+    "Electricity",
+    "Water",
+    "Ward Office"
+]
+
+ATTRIBUTES = [
+    "large_waste", "hazardous_waste",
+    "large_pothole", "deep_pothole",
+    "near_electric", "near_water"
+]
+
+
+# ---------------------------
+# ATTRIBUTE FLAGS
+# ---------------------------
+def attribute_flags(detection, attrs=ATTRIBUTES):
+    """Which attribute nodes a detection activates, as a bool per entry of `attrs`."""
+    params = detection.get("params", {})
+    t = detection.get("type")
+
+    # Trigger map
+    attr_map = {a: False for a in attrs}
+
+    # ---- Waste logic ----
+    if t == "waste":
+        p = params.get("primary", {})
+        if p:
+            if p.get("area_pct", 0) > 0.02:
+                attr_map["large_waste"] = True
+
+            cls = p.get("class_name", "").lower()
+            if "battery" in cls or "chemical" in cls:
+                attr_map["hazardous_waste"] = True
+
+    # ---- Pothole logic ----
+    # FIX: Corrected typo 'pothhole' to 'pothole'
+    if t == "pothole":
+        p = params.get("primary", {})
+        if p:
+            if p.get("area_pct", 0) > 0.01:
+                attr_map["large_pothole"] = True
+            if p.get("est_depth_m", 0) > 0.05:
+                attr_map["deep_pothole"] = True
+
+    return [attr_map[a] for a in attrs]
+
+
+def flags_key(flags):
+    """Table row of a flag combination: bit i is set when flag i is."""
+    return sum(1 << i for i, flag in enumerate(flags) if flag)
+
+
+def all_flag_combinations(n=len(ATTRIBUTES)):
+    """Every flag combination, in table-row order."""
+    return [[bool(key >> i & 1) for i in range(n)] for key in range(1 << n)]
+
+
+# ---------------------------
+# LOOKUP TABLE
+# ---------------------------
+class RoutingTable:
+    def __init__(self, rows, fingerprint, attrs=ATTRIBUTES, departments=DEPARTMENTS):
+        # rows[key] = {department: score} for the flag combination `key`
+        self.rows = rows
+        self.fingerprint = fingerprint
+        self.attrs = list(attrs)
+        self.departments = list(departments)
+
+    def reason(self, detection_record):
+        # A copy, so callers may edit the scores without corrupting the table
+        return dict(self.rows[flags_key(attribute_flags(detection_record, self.attrs))])
+
+    def reason_many(self, detection_records):
+        return [self.reason(record) for record in detection_records]
+
+    def save(self, path):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        tmp_path = f"{path}.tmp"
+        with open(tmp_path, "w", encoding="utf-8") as fh:
+            json.dump({
+                "fingerprint": self.fingerprint,
+                "attributes": self.attrs,
+                "departments": self.departments,
+                "rows": self.rows
+            }, fh)
+        os.replace(tmp_path, path)
+
+    @classmethod
+    def load(cls, path):
+        with open(path, "r", encoding="utf-8") as fh:
+            payload = json.load(fh)
+        if len(payload["rows"]) != 1 << len(payload["attributes"]):
+            raise ValueError(f"Routing table {path} has {len(payload['rows'])} rows for {len(payload['attributes'])} attributes")
+        return cls(payload["rows"], payload["fingerprint"], payload["attributes"], payload["departments"])
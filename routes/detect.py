@@ -6,20 +6,10 @@ import uuid # For default UUID fallback
 # Assuming these imports correctly point to your singletons or services:
 from utils.file_utils import save_upload
 from services.inference_service import InferenceService
-from model_loader import ModelLoader     
+from services.model_registry import get_model_loader
 
-# --- Singletons (Initialization for this file only) ---
-# NOTE: If this logic is moved to detection_routes.py, delete this block!
-try:
-    model_loader = ModelLoader(
-        waste_model_path="runs/detect/waste_yolo_fast/weights/waste.pt",
-        pothole_model_path="runs/pothole_yolov8/weights/best.pt"
-    )
-    inference_service = InferenceService(model_loader)
-except Exception as e:
-    # Handle model loading failure gracefully at startup
-    logging.error(f"Failed to initialize ModelLoader: {e}")
-    inference_service = None 
+# Models are shared through the registry and loaded on first use
+inference_service = InferenceService()
 
 logger = logging.getLogger(__name__)
 detect_bp = Blueprint("detect", __name__)
@@ -48,8 +38,11 @@ def detect():
     image_path = data.get("image_path")
     saved_path = None
 
-    if inference_service is None:
-        return jsonify({"success": False, "error": "ML services failed to load at startup."}), 503
+    try:
+        get_model_loader()
+    except Exception as e:
+        logger.error(f"Failed to initialize ModelLoader: {e}")
+        return jsonify({"success": False, "error": "ML services failed to load."}), 503
 
     try:
         if image:
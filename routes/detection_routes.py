@@ -1,21 +1,34 @@
 import os
-from flask import Blueprint, request, jsonify, current_app 
+from flask import Blueprint, request, jsonify, current_app, url_for
+from werkzeug.routing import AnyConverter
 import logging
 from datetime import datetime
 
 from services.inference_service import InferenceService 
-from model_loader import ModelLoader 
 from utils.file_utils import save_upload 
+from services.job_queue import wants_async, enqueue_job
 
 from controller.detection_controller import (
     create_detection,
+    create_detections_bulk,
+    create_video_detection,
     get_my_single,
     get_my_detections,
     get_my_by_type,
     update_my_detection,
     delete_my_detection,
     delete_all_my_by_type,
-    get_detections_by_user
+    get_detections_by_user,
+    export_my_detections,
+    export_detections_by_user,
+    get_user_full_details
+)
+from controller.job_controller import (
+    job_accepted,
+    get_my_job,
+    get_my_job_events,
+    get_inference_job,
+    get_inference_job_events
 )
 
 from models.db import db
@@ -26,11 +39,7 @@ logger = logging.getLogger(__name__)
 
 detect_ml_bp = Blueprint("detect_ml", __name__)
 
-model_loader = ModelLoader(
-    waste_model_path="runs/detect/waste_yolo_fast/weights/waste.pt",
-    pothole_model_path="runs/pothole_yolov8/weights/best.pt"
-)
-inference = InferenceService(model_loader)
+inference = InferenceService()
 
 
 @detect_ml_bp.route("/detects", methods=["POST"])
@@ -47,6 +56,14 @@ def detect_route():
             file = request.files["image"]
             saved_path = save_upload(file)  
 
+            if wants_async():
+                known_user = db.session.get(User, user_id) if user_id else None
+                job = enqueue_job(
+                    "inference", os.path.basename(saved_path), upload_path=saved_path,
+                    user_id=known_user.id if known_user else None, task_type=task_type
+                )
+                return job_accepted(job, url_for("detect_ml.get_inference_job", job_id=job.id))
+
             result = inference.run(
                 image_path=saved_path,
                 user_id=user_id,
@@ -108,13 +125,39 @@ def detect_route():
         logger.exception("Detection API error")
         return jsonify({"success": False, "error": str(e)}), 500
 
+detect_ml_bp.route("/jobs/<string:job_id>", methods=["GET"])(get_inference_job)
+detect_ml_bp.route("/jobs/<string:job_id>/events", methods=["GET"])(get_inference_job_events)
+
 detection_bp = Blueprint("detection_bp", __name__, url_prefix="/detections")
 
+
+class DetectionTypeConverter(AnyConverter):
+    """
+    Matches "pothole" or "waste". Weighted ahead of the string converter so
+    /my/<detection_type> wins over /my/<id> for those two words (equal weights
+    would leave it to the order werkzeug first saw the path shape in).
+    """
+    weight = 50
+
+    def __init__(self, map):
+        super().__init__(map, "pothole", "waste")
+
+
+# Must run before the routes below are added
+detection_bp.record_once(lambda state: state.app.url_map.converters.setdefault("detection_type", DetectionTypeConverter))
+
 detection_bp.route("/", methods=["POST"])(create_detection)
+detection_bp.route("/bulk", methods=["POST"])(create_detections_bulk)
+detection_bp.route("/video", methods=["POST"])(create_video_detection)
 detection_bp.route("/my", methods=["GET"])(get_my_detections)
-detection_bp.route("/my/<string:detection_type>", methods=["GET"])(get_my_by_type)
+detection_bp.route("/my/export", methods=["GET"])(export_my_detections)
+detection_bp.route("/my/<detection_type:detection_type>", methods=["GET"])(get_my_by_type)
 detection_bp.route("/my/<string:id>", methods=["GET"])(get_my_single)
 detection_bp.route("/my/<string:id>", methods=["PUT"])(update_my_detection)
+detection_bp.route("/my/<detection_type:detection_type>", methods=["DELETE"])(delete_all_my_by_type)
 detection_bp.route("/my/<string:id>", methods=["DELETE"])(delete_my_detection)
-detection_bp.route("/my/<string:detection_type>", methods=["DELETE"])(delete_all_my_by_type)
-detection_bp.route("/user/<string:user_id>", methods=["GET"])(get_detections_by_user)
\ No newline at end of file
+detection_bp.route("/user/<string:user_id>", methods=["GET"])(get_detections_by_user)
+detection_bp.route("/user/<string:user_id>/export", methods=["GET"])(export_detections_by_user)
+detection_bp.route("/user/<string:user_id>/details", methods=["GET"])(get_user_full_details)
+detection_bp.route("/jobs/<string:job_id>", methods=["GET"])(get_my_job)
+detection_bp.route("/jobs/<string:job_id>/events", methods=["GET"])(get_my_job_events)
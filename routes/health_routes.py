@@ -0,0 +1,30 @@
+import time
+from flask import Blueprint, jsonify, current_app
+
+from services.model_registry import registry
+
+health_bp = Blueprint("health", __name__)
+
+STARTED_AT = time.time()
+
+
+@health_bp.route("/healthz", methods=["GET"])
+def healthz():
+    # Liveness: the process is up and serving requests
+    return jsonify({
+        "status": "ok",
+        "uptime_s": round(time.time() - STARTED_AT, 1)
+    }), 200
+
+
+@health_bp.route("/readyz", methods=["GET"])
+def readyz():
+    # Readiness: models loaded and warmed (always ready when warm-up is disabled)
+    ready = registry.ready or not current_app.config.get("WARMUP_ON_STARTUP", True)
+    return jsonify({
+        "ready": ready,
+        "load_times_s": registry.load_times,
+        "warmup_ms": registry.warmup_ms,
+        "warmup_error": registry.warmup_error,
+        "memory": registry.memory_report()
+    }), 200 if ready else 503
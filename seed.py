@@ -6,27 +6,23 @@ have been successfully created (using Flask-Migrate).
 """
 
 from models import db, Department
-from app import create_app
+from reasoning.routing_table import DEPARTMENTS
+from config import Config
 import logging
 import sys
 
 logger = logging.getLogger(__name__)
 
-# CRITICAL FIX: This list MUST EXACTLY match the DEPARTMENTS list in reasoning/kg_gnn.py
-DEPARTMENTS_TO_SEED = [
-    "Waste Management",
-    "Construction",
-    "Municipality",
-    "Roads",
-    "Electricity",
-    "Water",
-    "Ward Office"
-]
+# The reasoner's built-in departments; running reasoners pick up new rows on their
+# next knowledge-graph sync (KG_SYNC_INTERVAL_S)
+DEPARTMENTS_TO_SEED = DEPARTMENTS
 
 def seed_departments():
-    # Application setup
+    # Application setup (only the database is needed: no job workers or model warm-up)
+    Config.JOB_WORKERS = 0
+    Config.WARMUP_ON_STARTUP = False
     try:
-        app = create_app()
+        from app import app
     except Exception as e:
         logger.error(f"Failed to create application context: {e}")
         sys.exit(1)
@@ -0,0 +1,106 @@
+import time
+import queue
+import logging
+import threading
+from concurrent.futures import Future
+
+logger = logging.getLogger(__name__)
+
+
+class BatchScheduler:
+    """
+    Dynamic micro-batching in front of a batched callable.
+
+    Callers submit single items and get a Future back. One worker thread per key
+    collects items until `max_batch_size` is reached or `max_wait_ms` has passed
+    since the first item arrived, then hands the whole batch to `run_batch(key, items)`,
+    which must return one result per item (in order).
+    """
+
+    def __init__(self, run_batch, max_batch_size=8, max_wait_ms=10.0, name="batch-scheduler"):
+        self.run_batch = run_batch
+        self.max_batch_size = max(1, int(max_batch_size))
+        self.max_wait = max(0.0, float(max_wait_ms)) / 1000.0
+        self.name = name
+
+        self._queues = {}
+        self._lock = threading.Lock()
+        self._closed = False
+
+    def submit(self, key, item):
+        future = Future()
+        self._queue_for(key).put((item, future))
+        return future
+
+    def shutdown(self):
+        with self._lock:
+            self._closed = True
+            queues = list(self._queues.values())
+            self._queues.clear()
+        for q in queues:
+            q.put(None)
+
+    def _queue_for(self, key):
+        with self._lock:
+            if self._closed:
+                raise RuntimeError(f"{self.name} is shut down")
+
+            q = self._queues.get(key)
+            if q is None:
+                q = queue.Queue()
+                self._queues[key] = q
+                worker = threading.Thread(
+                    target=self._worker,
+                    args=(key, q),
+                    name=f"{self.name}-{key}",
+                    daemon=True
+                )
+                worker.start()
+            return q
+
+    def _worker(self, key, q):
+        while True:
+            first = q.get()
+            if first is None:
+                return
+
+            batch = [first]
+            deadline = time.monotonic() + self.max_wait
+            stop = False
+
+            # Keep collecting until the batch is full or the first item has waited long enough
+            while len(batch) < self.max_batch_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    break
+                try:
+                    nxt = q.get(timeout=remaining)
+                except queue.Empty:
+                    break
+                if nxt is None:
+                    stop = True
+                    break
+                batch.append(nxt)
+
+            self._dispatch(key, batch)
+            if stop:
+                return
+
+    def _dispatch(self, key, batch):
+        items = [item for item, _ in batch]
+        futures = [future for _, future in batch]
+
+        try:
+            results = self.run_batch(key, items)
+            if len(results) != len(items):
+                raise RuntimeError(
+                    f"Batch returned {len(results)} results for {len(items)} items"
+                )
+        except Exception as e:
+            logger.exception(f"Batched call failed for key {key!r} ({len(items)} items).")
+            for future in futures:
+                future.set_exception(e)
+            return
+
+        for future, result in zip(futures, results):
+            future.set_result(result)
@@ -0,0 +1,181 @@
+"""
+Input side of POST /api/detections/bulk.
+
+Images come either as a multipart list (`images` fields) or as one ZIP archive
+(`archive`). Per-image latitude / longitude / location are read from a
+`metadata` form field or a metadata.json / metadata.csv inside the archive:
+
+  - a JSON list aligned with the images, or of objects with a "filename" key
+  - a JSON object keyed by filename
+  - a CSV with filename, latitude, longitude, location columns
+
+Form-level latitude / longitude / location act as defaults for every image.
+
+Archive entries are read one at a time straight from the (spooled) upload, so
+only the current batch of images is ever held in memory.
+"""
+
+import io
+import csv
+import json
+import os
+import zlib
+import zipfile
+
+from config import Config
+from utils.file_utils import allowed_file
+
+METADATA_NAMES = ("metadata.json", "metadata.csv")
+
+# What a corrupt, truncated, encrypted or unsupported entry raises while it is read
+ENTRY_ERRORS = (zipfile.BadZipFile, zlib.error, EOFError, NotImplementedError, RuntimeError)
+
+
+class BulkUploadError(ValueError):
+    pass
+
+
+# ---------------------------
+# METADATA
+# ---------------------------
+def parse_metadata(raw, filename="metadata.json"):
+    """Normalises any supported metadata layout to {"by_index": {...}, "by_name": {...}}."""
+    by_index, by_name = {}, {}
+    if not raw:
+        return {"by_index": by_index, "by_name": by_name}
+
+    try:
+        if filename.lower().endswith(".csv"):
+            entries = list(csv.DictReader(io.StringIO(raw)))
+        else:
+            entries = json.loads(raw)
+    except ValueError as e:
+        raise BulkUploadError(f"Invalid metadata: {e}")
+
+    if isinstance(entries, dict):
+        by_name.update((os.path.basename(k), v) for k, v in entries.items())
+    elif isinstance(entries, list):
+        for i, entry in enumerate(entries):
+            if not isinstance(entry, dict):
+                raise BulkUploadError("Metadata entries must be objects")
+            if entry.get("filename"):
+                by_name[os.path.basename(entry["filename"])] = entry
+            else:
+                by_index[i] = entry
+    else:
+        raise BulkUploadError("Metadata must be a list or an object")
+
+    return {"by_index": by_index, "by_name": by_name}
+
+
+def merge_metadata(*layers):
+    merged = {"by_index": {}, "by_name": {}}
+    for layer in layers:
+        merged["by_index"].update(layer["by_index"])
+        merged["by_name"].update(layer["by_name"])
+    return merged
+
+
+def _metadata_for(metadata, index, filename, defaults):
+    entry = metadata["by_name"].get(os.path.basename(filename)) or metadata["by_index"].get(index) or {}
+    values = {key: entry.get(key, defaults.get(key)) for key in ("latitude", "longitude", "location")}
+    try:
+        values["latitude"] = float(values["latitude"])
+        values["longitude"] = float(values["longitude"])
+    except (TypeError, ValueError):
+        raise BulkUploadError("Missing or invalid latitude/longitude")
+    if not values["location"]:
+        raise BulkUploadError("Missing location")
+    return values
+
+
+# ---------------------------
+# SOURCES
+# ---------------------------
+def iter_uploaded_files(files):
+    """(filename, read) for every multipart `images` field."""
+    for storage in files:
+        yield storage.filename or "", storage.read
+
+
+def open_archive(archive):
+    """
+    Opens the uploaded ZIP without extracting it. Returns (metadata, entries) where
+    entries yields (filename, read) lazily; nothing is decompressed until read() is called.
+    """
+    try:
+        zf = zipfile.ZipFile(archive.stream)
+    except zipfile.BadZipFile:
+        raise BulkUploadError("Archive is not a valid ZIP file")
+
+    metadata = parse_metadata(None)
+    infos = []
+    for info in zf.infolist():
+        name = os.path.basename(info.filename)
+        if info.is_dir() or not name or name.startswith("."):
+            continue
+        if name.lower() in METADATA_NAMES:
+            data = _read_capped(zf, info, Config.BULK_MAX_METADATA_BYTES, "Metadata file")
+            try:
+                raw = data.decode("utf-8-sig")
+            except UnicodeDecodeError:
+                raise BulkUploadError(f"Metadata file {name} is not UTF-8 text")
+            metadata = merge_metadata(metadata, parse_metadata(raw, name))
+            continue
+        infos.append(info)
+
+    def entries():
+        for info in infos:
+            yield info.filename, lambda info=info: _read_capped(zf, info, Config.BULK_MAX_IMAGE_BYTES, "Image")
+
+    return metadata, entries()
+
+
+def _read_capped(zf, info, limit, what):
+    """An entry's bytes, never inflating more than `limit`; broken entries raise BulkUploadError."""
+    if info.file_size > limit:
+        raise BulkUploadError(f"{what} larger than {limit} bytes")
+    try:
+        with zf.open(info) as fh:
+            data = fh.read(limit + 1)
+    except ENTRY_ERRORS as e:
+        raise BulkUploadError(f"Could not read {os.path.basename(info.filename)} from the archive: {e}")
+    # The header size can lie; never inflate more than the limit
+    if len(data) > limit:
+        raise BulkUploadError(f"{what} larger than {limit} bytes")
+    return data
+
+
+# ---------------------------
+# ITEMS
+# ---------------------------
+def iter_items(entries, metadata, defaults):
+    """
+    Turns (filename, read) entries into detect_batch items. Entries that cannot be
+    processed come back with an "error" key instead of data.
+    """
+    for index, (filename, read) in enumerate(entries):
+        if index >= Config.BULK_MAX_ITEMS:
+            yield {"index": index, "filename": filename, "error": f"More than {Config.BULK_MAX_ITEMS} images"}
+            continue
+        if not allowed_file(filename):
+            yield {"index": index, "filename": filename, "error": "Image file type not allowed"}
+            continue
+        try:
+            item = {"index": index, "filename": os.path.basename(filename)}
+            item.update(_metadata_for(metadata, index, filename, defaults))
+            item["data"] = read()
+            yield item
+        except BulkUploadError as e:
+            yield {"index": index, "filename": filename, "error": str(e)}
+
+
+def batched(items, size):
+    batch = []
+    for item in items:
+        batch.append(item)
+        if len(batch) >= size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
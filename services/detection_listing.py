@@ -0,0 +1,179 @@
+"""
+Read side of the detection list endpoints: keyset pagination and field projection.
+
+Pages are ordered newest first on (timestamp, id) and continue from an opaque
+cursor (the last row's timestamp and id, base64url-encoded), so every page is
+one index range scan of at most `limit` rows however many detections a user
+has, and rows inserted meanwhile never shift or repeat a page.
+
+`fields=id,timestamp,...` selects only those columns; the default is every
+field of Detection.to_dict().
+
+Exports use stream_detections instead: one query read through a server-side
+cursor EXPORT_YIELD_PER rows at a time, so rows reach the client while the
+query is still running and memory stays flat however many rows there are.
+"""
+
+import json
+import base64
+import binascii
+from datetime import datetime
+
+from sqlalchemy import select, tuple_
+
+from config import Config
+from models import db, Detection, Department, DetectionDepartment, DetectionTag, Tag
+
+
+class ListQueryError(ValueError):
+    pass
+
+
+def _format_dt(value):
+    return value.strftime("%Y-%m-%d %H:%M:%S") if value else None
+
+
+# Public field -> (column, formatter); same names and formats as Detection.to_dict()
+DETECTION_FIELDS = {
+    "id": (Detection.id, None),
+    "user_id": (Detection.user_id, None),
+    "image_name": (Detection.image_name, None),
+    "image_path": (Detection.image_path, None),
+    "detected_image_path": (Detection.detected_image_path, None),
+    "detection_type": (Detection.detection_type, None),
+    "latitude": (Detection.latitude, None),
+    "longitude": (Detection.longitude, None),
+    "location": (Detection.location, None),
+    "pothole_severity": (Detection.pothole_severity, None),
+    "waste_category": (Detection.waste_category, None),
+    "department": (Detection.department, None),
+    "timestamp": (Detection.timestamp, _format_dt),
+    "detection_status": (Detection.detection_status, None),
+    "report_count": (Detection.report_count, None),
+    "last_reported_at": (Detection.last_reported_at, _format_dt)
+}
+
+
+# ---------------------------
+# REQUEST ARGUMENTS
+# ---------------------------
+def parse_fields(raw, default=None):
+    """`fields` query argument -> list of field names (default: every field)."""
+    if not raw:
+        return list(default or DETECTION_FIELDS)
+    fields = [name.strip() for name in raw.split(",") if name.strip()]
+    unknown = [name for name in fields if name not in DETECTION_FIELDS]
+    if unknown:
+        raise ListQueryError(f"Unknown fields: {', '.join(unknown)}. Allowed: {', '.join(DETECTION_FIELDS)}")
+    return list(dict.fromkeys(fields))
+
+
+def parse_limit(raw):
+    if raw in (None, ""):
+        return Config.DETECTION_PAGE_SIZE
+    try:
+        limit = int(raw)
+    except ValueError:
+        raise ListQueryError("limit must be an integer")
+    if limit < 1:
+        raise ListQueryError("limit must be at least 1")
+    return min(limit, Config.DETECTION_PAGE_MAX)
+
+
+def encode_cursor(timestamp, detection_id):
+    raw = json.dumps([timestamp.isoformat(), detection_id], separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(cursor):
+    """Cursor -> (timestamp, id) of the last row of the previous page, or None."""
+    if not cursor:
+        return None
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        timestamp, detection_id = json.loads(raw)
+        return datetime.fromisoformat(timestamp), str(detection_id)
+    except (binascii.Error, ValueError, TypeError):
+        raise ListQueryError("Invalid cursor")
+
+
+# ---------------------------
+# QUERY
+# ---------------------------
+def _to_dicts(results, fields):
+    formatters = [(name, DETECTION_FIELDS[name][1]) for name in fields]
+    for result in results:
+        row = result._mapping
+        yield {name: formatter(row[name]) if formatter else row[name] for name, formatter in formatters}
+
+
+def page_query(criteria, fields, limit, after=None):
+    """SELECT of `limit` rows (None: all) after the (timestamp, id) `after`, newest first."""
+    columns = [DETECTION_FIELDS[name][0].label(name) for name in fields]
+    # The sort key is always selected, for the next cursor
+    stmt = (
+        select(Detection.timestamp.label("_ts"), Detection.id.label("_id"), *columns)
+        .where(*criteria)
+        .order_by(Detection.timestamp.desc(), Detection.id.desc())
+        .limit(limit)
+    )
+    if after is not None:
+        stmt = stmt.where(tuple_(Detection.timestamp, Detection.id) < tuple_(*after))
+    return stmt
+
+
+def page_detections(*criteria, fields=None, limit=None, cursor=None):
+    """
+    One page of detections matching `criteria`, newest first, as dicts with only
+    `fields`. Returns (rows, next cursor or None on the last page).
+    """
+    fields = fields or list(DETECTION_FIELDS)
+    limit = limit or Config.DETECTION_PAGE_SIZE
+
+    # One extra row tells whether there is a next page
+    stmt = page_query(criteria, fields, limit + 1, decode_cursor(cursor))
+    results = db.session.execute(stmt).all()
+    next_cursor = None
+    if len(results) > limit:
+        results = results[:limit]
+        next_cursor = encode_cursor(results[-1]._ts, results[-1]._id)
+
+    return list(_to_dicts(results, fields)), next_cursor
+
+
+def stream_detections(*criteria, fields=None):
+    """
+    Every detection matching `criteria`, newest first, as a generator of dicts with
+    only `fields`. Rows are fetched through a server-side cursor (yield_per turns
+    on stream_results), EXPORT_YIELD_PER at a time; the query runs on first use.
+    """
+    fields = fields or list(DETECTION_FIELDS)
+    stmt = page_query(criteria, fields, None).execution_options(yield_per=Config.EXPORT_YIELD_PER)
+    results = db.session.execute(stmt)
+    try:
+        yield from _to_dicts(results, fields)
+    finally:
+        results.close()
+
+
+def relation_names(detection_ids):
+    """
+    ({detection id: [department names]}, {detection id: [tag names]}) for a page of
+    detections: one query per relation, so the cost is linear in the rows found.
+    """
+    departments, tags = {}, {}
+    if not detection_ids:
+        return departments, tags
+    for names, link, target, name, key in (
+        (departments, DetectionDepartment, Department, Department.name, DetectionDepartment.department_id),
+        (tags, DetectionTag, Tag, Tag.name, DetectionTag.tag_id)
+    ):
+        rows = db.session.execute(
+            select(link.detection_id, name)
+            .join(target, key == target.id)
+            .where(link.detection_id.in_(detection_ids))
+            .order_by(link.detection_id, name)
+        )
+        for detection_id, value in rows:
+            names.setdefault(detection_id, []).append(value)
+    return departments, tags
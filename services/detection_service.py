@@ -1,26 +1,37 @@
 import os
-import time
+import shutil
+import logging
+import uuid6 as uuid
 from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor
 from flask import current_app
+from werkzeug.utils import secure_filename
+from config import Config
 # Assuming these imports are available and necessary
-from models import db, Detection, Image, Tag, DetectionTag
-from services.model_loader__old import ModelLoader # Note: Using __old version
+from sqlalchemy import delete, exists, select
+from models import db, Detection, Image, DetectionDepartment, DetectionTag
 from utils.viz import annotate_and_save_ultralytics
-from reasoning.kg_gnn import KnowledgeGraphReasoner
+from utils.file_utils import decode_image_bytes, write_bytes
 from processors.waste_processor import WasteProcessor
 from processors.pothole_processor import PotholeProcessor
+from services.model_registry import registry, get_model_loader, get_reasoner
+from services.result_cache import RESULT_CACHE, content_hash, perceptual_hash
+from services.tiling import should_tile
+from services.geo_index import GEO_INDEX
+from services.write_behind import persist
+from services.name_cache import TAG_IDS
+from services.file_gc import FILE_GC
 
-# Singletons
-kg = KnowledgeGraphReasoner()
+logger = logging.getLogger(__name__)
+
+# Singletons (models and reasoner live in the shared registry and load on first use)
 WASTE_PROCESSOR = WasteProcessor()
 POTHOLE_PROCESSOR = PotholeProcessor()
-MODEL_LOADER = ModelLoader(
-    waste_model_path="runs/detect/waste_yolo_fast/weights/waste.pt",
-    pothole_model_path="runs/pothole_yolov8/weights/best.pt"
-)
 
-POTHOLE_MODEL = MODEL_LOADER.pothole_model
-WASTE_MODEL = MODEL_LOADER.waste_model
+DETECTION_CONF = 0.5
+
+# Used by DETECTION_MODE="concurrent" to run both detectors side by side
+DETECTOR_POOL = ThreadPoolExecutor(max_workers=Config.DETECTION_THREADS, thread_name_prefix="detector")
 
 # --- FIX: Removed integer conversion logic ---
 def _normalize_user_id(uid):
@@ -31,10 +42,12 @@ def _normalize_user_id(uid):
         return uid
     return None
 
-def save_to_database(detection_type, result):
-    print("Using DB URI:", current_app.config['SQLALCHEMY_DATABASE_URI'])
-    print("Saving detection payload:", result)  # <<< DEBUG PRINT
-
+def build_detection_rows(detection_type, result, tag_id=None):
+    """
+    The Detection row for a result plus its Image (and waste Tag link) rows. IDs are
+    generated client-side, so nothing has to be flushed and many results can be
+    written in one transaction.
+    """
     # FIX: Get UUID string directly and use a fallback UUID if user_id is missing
     normalized_user_id = result.get("user_id")
     if normalized_user_id is None:
@@ -57,141 +70,376 @@ def save_to_database(detection_type, result):
     }
     payload = {k: v for k, v in detection_payload.items() if v is not None}
     
-    detection = Detection(**payload)
-    db.session.add(detection)
-    db.session.flush() # Flushes the new detection.id (UUID)
+    detection = Detection(id=str(uuid.uuid7()), **payload)
+    rows = [detection]
 
     # The image row logic seems redundant given the fields in Detection, 
     # but kept for compatibility if the Image model is used elsewhere.
     annotated = result.get("annotated_name")
     if annotated:
-        image_row = Image(
+        rows.append(Image(
+            id=str(uuid.uuid7()),
             detection_id=detection.id, # detection.id is UUID string
             uploaded_filename=result.get("image_name") or "",
             annotated_filename=annotated,
             timestamp=datetime.utcnow()
-        )
-        db.session.add(image_row)
+        ))
 
     # Save tags for waste
-    waste_cat = result.get("waste_category")
-    if waste_cat:
-        tag = Tag.query.filter_by(name=waste_cat).first()
-        if tag:
-            try:
-                dt = DetectionTag(detection_id=detection.id, tag_id=tag.id)
-                db.session.add(dt)
-            except:
-                try:
-                    detection.tags.append(tag)
-                except:
-                    pass
+    if tag_id is not None:
+        rows.append(DetectionTag(id=str(uuid.uuid7()), detection_id=detection.id, tag_id=tag_id))
 
-    db.session.commit()
+    return rows
+
+def save_to_database(detection_type, result):
+    logger.debug(f"Saving {detection_type} detection: {result}")
+
+    # Tag ids come from the in-process name cache, not a query per detection
+    rows = build_detection_rows(detection_type, result, TAG_IDS.get_id(result.get("waste_category")))
+    detection = rows[0]
+    persist(rows, GEO_INDEX.adder(rows) if GEO_INDEX is not None else None)
     return detection
 
-def detect_image_type(image, user_id, latitude=0.0, longitude=0.0, location=""):
-    if not POTHOLE_MODEL or not WASTE_MODEL:
-        return None, None, None, None
-    
-    timestamp = int(time.time())
-    original_filename = f"{timestamp}_{image.filename}"
-    uid = str(timestamp)
+def delete_detections(*criteria):
+    """
+    Deletes the detections matching `criteria` with their image, department and tag
+    rows, set-based in one transaction, and queues their files for FILE_GC.
+    Returns [(id, detection_type)] of the deleted detections.
+    """
+    doomed = select(Detection.id).where(*criteria)
+    links = (Image, DetectionDepartment, DetectionTag)
+    for link in links:
+        db.session.execute(delete(link).where(link.detection_id.in_(doomed)))
+
+    # A matching detection committed after the deletes above still has its relation
+    # rows; it is left alone rather than failing the foreign keys
+    unlinked = [~exists().where(link.detection_id == Detection.id) for link in links]
+    deleted = db.session.execute(
+        delete(Detection)
+        .where(*criteria, *unlinked)
+        .returning(Detection.id, Detection.detection_type, Detection.image_path, Detection.detected_image_path)
+    ).all()
+    db.session.commit()
+
+    if GEO_INDEX is not None:
+        GEO_INDEX.remove_many(row.id for row in deleted)
+    FILE_GC.collect(path for row in deleted for path in (row.image_path, row.detected_image_path))
+    return [(row.id, row.detection_type) for row in deleted]
 
-    temp_path = os.path.join(
-        current_app.config['STORAGE_FOLDER'],
-        f"temp_{original_filename}"
+def _has_boxes(results):
+    return bool(results) and len(getattr(results[0], "boxes", [])) > 0
+
+def _max_confidence(results):
+    if not _has_boxes(results):
+        return 0.0
+    return float(results[0].boxes.conf.max())
+
+def _run_detectors(frame, mode=None, policy=None):
+    """
+    Runs the pothole and waste models on the decoded frame and returns the
+    [(task_type, results), ...] that should be reported, in priority order.
+
+    cascade:    pothole first, waste only when no pothole was found (legacy behaviour).
+    concurrent: both models run at the same time and the hits are settled by `policy`:
+                pothole_first, highest_confidence or both.
+    """
+    mode = mode or current_app.config.get("DETECTION_MODE", "cascade")
+    policy = policy or current_app.config.get("DETECTION_POLICY", "pothole_first")
+    model_loader = get_model_loader()
+
+    if mode != "concurrent":
+        pothole_results = model_loader.predict(frame, "pothole", conf=DETECTION_CONF)
+        if _has_boxes(pothole_results):
+            return [("pothole", pothole_results)]
+        waste_results = model_loader.predict(frame, "waste", conf=DETECTION_CONF)
+        if _has_boxes(waste_results):
+            return [("waste", waste_results)]
+        return []
+
+    pothole_future = DETECTOR_POOL.submit(model_loader.predict, frame, "pothole", DETECTION_CONF)
+    waste_future = DETECTOR_POOL.submit(model_loader.predict, frame, "waste", DETECTION_CONF)
+    return _settle_hits(pothole_future.result(), waste_future.result(), policy)
+
+def _settle_hits(pothole_results, waste_results, policy):
+    hits = [
+        (task_type, results)
+        for task_type, results in (("pothole", pothole_results), ("waste", waste_results))
+        if _has_boxes(results)
+    ]
+    if not hits or policy == "both":
+        return hits
+    if policy == "highest_confidence":
+        return [max(hits, key=lambda hit: _max_confidence(hit[1]))]
+    # pothole_first
+    return hits[:1]
+
+def _predict_many(frames, task_type):
+    """One forward pass over all frames (large ones are tiled separately); [results, ...] per frame."""
+    model_loader = get_model_loader()
+    outputs = [None] * len(frames)
+    plain = []
+    for i, frame in enumerate(frames):
+        if Config.TILING_ENABLED and should_tile(frame):
+            outputs[i] = model_loader.predict(frame, task_type, conf=DETECTION_CONF)
+        else:
+            plain.append(i)
+    if plain:
+        batch = model_loader.predict_batch([frames[i] for i in plain], task_type, conf=DETECTION_CONF)
+        for i, result in zip(plain, batch):
+            outputs[i] = [result]
+    return outputs
+
+def _run_detectors_batch(frames, mode=None, policy=None):
+    """_run_detectors for many frames at once, with one batched call per model."""
+    mode = mode or current_app.config.get("DETECTION_MODE", "cascade")
+    policy = policy or current_app.config.get("DETECTION_POLICY", "pothole_first")
+
+    if mode != "concurrent":
+        hits = [[] for _ in frames]
+        remaining = []
+        for i, results in enumerate(_predict_many(frames, "pothole")):
+            if _has_boxes(results):
+                hits[i] = [("pothole", results)]
+            else:
+                remaining.append(i)
+        if remaining:
+            for i, results in zip(remaining, _predict_many([frames[i] for i in remaining], "waste")):
+                if _has_boxes(results):
+                    hits[i] = [("waste", results)]
+        return hits
+
+    pothole_future = DETECTOR_POOL.submit(_predict_many, frames, "pothole")
+    waste_future = DETECTOR_POOL.submit(_predict_many, frames, "waste")
+    return [
+        _settle_hits(pothole_results, waste_results, policy)
+        for pothole_results, waste_results in zip(pothole_future.result(), waste_future.result())
+    ]
+
+def _pothole_analysis(frame, pothole_results, uid):
+    annotated_filename = annotate_and_save_ultralytics(
+        pothole_results,
+        frame,
+        current_app.config['POTHOLE_DETECTED_FOLDER'],
+        uid
     )
-    image.save(temp_path)
-
-    # POTHOLE DETECTION 
-    pothole_results = POTHOLE_MODEL.predict(source=temp_path, conf=0.5)
-    if pothole_results and len(getattr(pothole_results[0], "boxes", [])) > 0:
-        original_image_path = os.path.join(current_app.config['POTHOLE_ORIGINAL_FOLDER'], original_filename)
-        image.save(original_image_path)
-        annotated_filename = annotate_and_save_ultralytics(
-            pothole_results,
-            temp_path,
-            current_app.config['POTHOLE_DETECTED_FOLDER'],
-            uid
+    annotated_image_path = os.path.join(current_app.config['POTHOLE_DETECTED_FOLDER'], annotated_filename)
+
+    pothole_info = POTHOLE_PROCESSOR.extract(frame, pothole_results)
+    primary = pothole_info.get("primary") or {}
+    record = {"type": "pothole", "params": pothole_info}
+
+    return record, {
+        "detection_type": "pothole",
+        "detected_image_path": annotated_image_path,
+        "annotated_name": annotated_filename,
+        "pothole_severity": primary.get("class_name") or "unknown",
+        "waste_category": None,
+        "detection_status": f"{primary.get('class_name', 'pothole')} detected",
+        "department": None,
+        "area_pct": primary.get("area_pct"),
+        "est_depth_m": primary.get("est_depth_m")
+    }
+
+def _waste_analysis(frame, waste_results, uid):
+    annotated_filename = annotate_and_save_ultralytics(
+        waste_results,
+        frame,
+        current_app.config['WASTE_DETECTED_FOLDER'],
+        uid
+    )
+    annotated_image_path = os.path.join(current_app.config['WASTE_DETECTED_FOLDER'], annotated_filename)
+
+    waste_info = WASTE_PROCESSOR.extract(frame, waste_results)
+    primary = waste_info.get("primary") or {}
+    category = primary.get("class_name") or "Unknown"
+    record = {"type": "waste", "params": waste_info}
+
+    return record, {
+        "detection_type": "waste",
+        "detected_image_path": annotated_image_path,
+        "annotated_name": annotated_filename,
+        "pothole_severity": None,
+        "waste_category": category,
+        "detection_status": f"{category} detected",
+        "department": None,
+        "area_pct": primary.get("area_pct")
+    }
+
+# Model output -> (reasoner record, cacheable analysis without its department)
+ANALYSIS_BUILDERS = {
+    "pothole": _pothole_analysis,
+    "waste": _waste_analysis,
+}
+
+ORIGINAL_FOLDERS = {
+    "pothole": "POTHOLE_ORIGINAL_FOLDER",
+    "waste": "WASTE_ORIGINAL_FOLDER",
+}
+
+def _analyze(frame, uid):
+    """Runs the detectors and builds one analysis per reported hit (JSON-serialisable, so it can be cached)."""
+    return analyze_hits([(frame, detection_type, results, uid) for detection_type, results in _run_detectors(frame)])
+
+def _annotated_files_exist(analyses):
+    return all(a.get("detected_image_path") and os.path.exists(a["detected_image_path"]) for a in analyses)
+
+def _copy_annotated(analysis, uid):
+    """
+    Gives a cached analysis its own annotated file (a hard link where possible), so
+    deleting one report never removes the image another report points to.
+    """
+    source = analysis["detected_image_path"]
+    annotated_filename = f"{uid}_annotated.jpg"
+    target = os.path.join(os.path.dirname(source), annotated_filename)
+    if os.path.abspath(target) != os.path.abspath(source):
+        # `uid` is unique per upload; an existing target belongs to another report and
+        # is never replaced (both calls fail with FileExistsError)
+        try:
+            os.link(source, target)
+        except FileExistsError:
+            raise
+        except OSError:
+            with open(source, "rb") as src, open(target, "xb") as dst:
+                shutil.copyfileobj(src, dst)
+    return dict(analysis, detected_image_path=target, annotated_name=annotated_filename)
+
+def _build_result(analysis, data, original_filename, user_id, latitude, longitude, location):
+    detection_type = analysis["detection_type"]
+    original_image_path = os.path.join(current_app.config[ORIGINAL_FOLDERS[detection_type]], original_filename)
+    write_bytes(original_image_path, data)
+
+    logger.debug(f"Original image {original_image_path}, annotated image {analysis['detected_image_path']}")
+
+    result = {
+        "user_id": user_id,
+        "image_name": original_filename,
+        "image_path": original_image_path,
+        "latitude": latitude,
+        "longitude": longitude,
+        "location": location,
+    }
+    result.update((k, v) for k, v in analysis.items() if k != "detection_type")
+    return result
+
+def analyze_hits(hits):
+    """
+    Annotated image, processor fields and department for each (frame, detection_type,
+    results, uid) hit. The departments come from one batched reasoner pass.
+    """
+    built = [ANALYSIS_BUILDERS[detection_type](frame, results, uid) for frame, detection_type, results, uid in hits]
+    scores = get_reasoner().reason_many([record for record, _ in built])
+    for (_, analysis), dept_scores in zip(built, scores):
+        analysis["department"] = max(dept_scores, key=dept_scores.get)
+    return [analysis for _, analysis in built]
+
+def analyze_hit(frame, detection_type, results, uid):
+    """Annotated image, processor fields and department for one model hit on `frame`."""
+    return analyze_hits([(frame, detection_type, results, uid)])[0]
+
+def build_report(analysis, data, original_filename, user_id, latitude, longitude, location):
+    """
+    Writes the original image for an analysis and returns (result, rows) without
+    touching the session.
+    """
+    result = _build_result(analysis, data, original_filename, user_id, latitude, longitude, location)
+    rows = build_detection_rows(analysis["detection_type"], result, TAG_IDS.get_id(result.get("waste_category")))
+    return result, rows
+
+def _cache_context():
+    mode = current_app.config.get("DETECTION_MODE", "cascade")
+    policy = current_app.config.get("DETECTION_POLICY", "pothole_first")
+    context = f"{mode}:{policy}|{registry.model_version}|kg={registry.reasoner_version}|conf={DETECTION_CONF}"
+    if Config.TILING_ENABLED:
+        context += (
+            f"|tiles={Config.TILE_SIZE}:{Config.TILE_OVERLAP}:{Config.TILE_MIN_SIZE}"
+            f":{Config.TILE_MERGE}:{Config.TILE_MERGE_THRESHOLD}:{Config.TILE_INCLUDE_FULL}"
         )
-        annotated_image_path = os.path.join(current_app.config['POTHOLE_DETECTED_FOLDER'], annotated_filename)
+    return context
 
-        # ===== DEBUG PRINTS =====
-        print("Original image path:", original_image_path)
-        print("Annotated image path:", annotated_image_path)
+def _find_duplicate(frame, latitude, longitude, detection_type=None):
+    """
+    The open incident this photo re-reports, or None. Only incidents of the
+    client's `detection_type` hint (or of any type without one) within the dedup
+    radius count. In "verify" mode the photo must also show that incident's type,
+    which costs one model instead of the whole pipeline; in "skip" mode a matching
+    hint is trusted and no model runs. Returns (Detection, distance_m) once the
+    report has been attached.
+    """
+    if GEO_INDEX is None or (not latitude and not longitude):
+        return None
+    types = (detection_type,) if detection_type in ("pothole", "waste") else ("pothole", "waste")
+    nearby = GEO_INDEX.nearest(latitude, longitude, types)
+    if nearby is None:
+        return None
+
+    incident_id, incident_type, distance = nearby
+    trusted = current_app.config.get("GEO_DEDUP_MODE") == "skip" and detection_type == incident_type
+    if not trusted:
+        results = get_model_loader().predict(frame, incident_type, conf=DETECTION_CONF)
+        if not _has_boxes(results):
+            return None
 
-        pothole_info = POTHOLE_PROCESSOR.extract(temp_path, pothole_results)
-        primary = pothole_info.get("primary") or {}
-        record = {"type": "pothole", "params": pothole_info}
-        scores = kg.reason(record)
-        department = max(scores, key=scores.get)
+    incident = GEO_INDEX.attach(incident_id)
+    return (incident, distance) if incident is not None else None
 
+def detect_image_type(image, user_id, latitude=0.0, longitude=0.0, location="", detection_type=None):
+    # Unique per upload (UUIDv7 sorts by time); concurrent uploads never share file names
+    uid = uuid.uuid7().hex
+    original_filename = f"{uid}_{image.filename}"
+
+    # Decode the request body once; the same array feeds the model, processors and annotator.
+    # The raw bytes are written to disk only if something is detected.
+    data = image.read()
+    frame = decode_image_bytes(data)
+
+    # A repeat report of a known open incident is counted on it instead of saved again
+    duplicate = _find_duplicate(frame, latitude, longitude, detection_type)
+    if duplicate is not None:
+        incident, distance = duplicate
+        # The incident is usually another user's: only what the reporter needs to know
         result = {
-            "user_id": user_id,
-            "image_name": original_filename,
-            "image_path": original_image_path,
-            "detected_image_path": annotated_image_path,
-            "annotated_name": annotated_filename,
-            "latitude": latitude,
-            "longitude": longitude,
-            "location": location,
-            "pothole_severity": primary.get("class_name") or "unknown",
-            "waste_category": None,
-            "detection_status": f"{primary.get('class_name', 'pothole')} detected",
-            "department": department,
-            "area_pct": primary.get("area_pct"),
-            "est_depth_m": primary.get("est_depth_m")
+            "id": incident.id,
+            "detection_type": incident.detection_type,
+            "report_count": incident.report_count,
+            "last_reported_at": incident.last_reported_at.strftime("%Y-%m-%d %H:%M:%S"),
+            "distance_m": round(distance, 1),
+            "attached": True
         }
-        os.remove(temp_path)
-        detection_record = save_to_database("pothole", result) 
-        return "pothole", result, original_filename, original_image_path
-        
-    # WASTE DETECTION
-    waste_results = WASTE_MODEL.predict(source=temp_path, conf=0.5)
-    if waste_results and len(getattr(waste_results[0], "boxes", [])) > 0:
-        original_image_path = os.path.join(current_app.config['WASTE_ORIGINAL_FOLDER'], original_filename)
-        image.save(original_image_path)
-        annotated_filename = annotate_and_save_ultralytics(
-            waste_results,
-            temp_path,
-            current_app.config['WASTE_DETECTED_FOLDER'],
-            uid
+        return incident.detection_type, result, None, None
+
+    # Re-submitted photos reuse the cached analysis and skip inference entirely
+    cached = False
+    if RESULT_CACHE is not None:
+        phash = perceptual_hash(frame) if current_app.config.get("RESULT_CACHE_PHASH") else None
+        analyses, cached = RESULT_CACHE.get_or_compute(
+            content_hash(data),
+            _cache_context(),
+            lambda: _analyze(frame, uid),
+            phash=phash,
+            validate=_annotated_files_exist
         )
-        annotated_image_path = os.path.join(current_app.config['WASTE_DETECTED_FOLDER'], annotated_filename)
-
-        # ===== DEBUG PRINTS =====
-        print("Original image path:", original_image_path)
-        print("Annotated image path:", annotated_image_path)
-
-        waste_info = WASTE_PROCESSOR.extract(temp_path, waste_results)
-        primary = waste_info.get("primary") or {}
-        category = primary.get("class_name") or "Unknown"
-        record = {"type": "waste", "params": waste_info}
-        scores = kg.reason(record)
-        department = max(scores, key=scores.get)
-        
-        result = {
-            "user_id": user_id,
-            "image_name": original_filename,
-            "image_path": original_image_path,
-            "detected_image_path": annotated_image_path,
-            "annotated_name": annotated_filename,
-            "latitude": latitude,
-            "longitude": longitude,
-            "location": location,
-            "pothole_severity": None,
-            "waste_category": category,
-            "detection_status": f"{category} detected",
-            "department": department,
-            "area_pct": primary.get("area_pct")
-        }
-        os.remove(temp_path)
-        detection_record = save_to_database("waste", result)
-        return "waste", result, original_filename, original_image_path
+    else:
+        analyses = _analyze(frame, uid)
+
+    if analyses:
+        saved = []
+        for analysis in analyses:
+            if cached:
+                analysis = _copy_annotated(analysis, uid)
+            result = _build_result(analysis, data, original_filename, user_id, latitude, longitude, location)
+            detection_record = save_to_database(analysis["detection_type"], result)
+            result["id"] = detection_record.id
+            saved.append((analysis["detection_type"], result))
+
+        # The first hit is the reported one; with the "both" policy the others ride along
+        detection_type, result = saved[0]
+        if len(saved) > 1:
+            result["additional_detections"] = [
+                dict(extra, detection_type=extra_type) for extra_type, extra in saved[1:]
+            ]
+        return detection_type, result, original_filename, result["image_path"]
 
     # NO DETECTION
-    os.remove(temp_path)
     result = {
         "user_id": user_id,
         "image_name": None,
@@ -207,3 +455,78 @@ def detect_image_type(image, user_id, latitude=0.0, longitude=0.0, location=""):
         "department": None
     }
     return None, result, None, None
+
+def detect_batch(items, user_id):
+    """
+    Bulk counterpart of detect_image_type. `items` are dicts with index, filename,
+    data, latitude, longitude and location. Cached analyses are reused and the rest
+    go through each model as one batch. Returns ([summary, ...], [rows, ...]); the
+    rows are not added to the session, so the caller can commit everything at once.
+    """
+    batch_id = uuid.uuid7().hex
+    context = _cache_context() if RESULT_CACHE is not None else None
+    use_phash = current_app.config.get("RESULT_CACHE_PHASH")
+
+    analyses, cached, digests, phashes, frames = {}, set(), {}, {}, {}
+    summaries = {}
+    for item in items:
+        i = item["index"]
+        try:
+            frames[i] = decode_image_bytes(item["data"])
+        except ValueError as e:
+            summaries[i] = {"index": i, "filename": item["filename"], "status": "error", "error": str(e)}
+            continue
+        if RESULT_CACHE is not None:
+            digests[i] = content_hash(item["data"])
+            phashes[i] = perceptual_hash(frames[i]) if use_phash else None
+            hit = RESULT_CACHE.lookup(digests[i], context, phashes[i], validate=_annotated_files_exist)
+            if hit is not None:
+                analyses[i] = hit
+                cached.add(i)
+
+    pending = [i for i in frames if i not in analyses]
+    if pending:
+        hits = dict(zip(pending, _run_detectors_batch([frames[i] for i in pending])))
+        # Every hit in the batch is routed with one reasoner pass
+        built = iter(analyze_hits([
+            (frames[i], detection_type, results, f"{batch_id}_{i}")
+            for i in pending for detection_type, results in hits[i]
+        ]))
+        for i in pending:
+            analyses[i] = [next(built) for _ in hits[i]]
+            if RESULT_CACHE is not None:
+                RESULT_CACHE.store(digests[i], context, analyses[i], phashes[i])
+
+    rows = []
+    for item in items:
+        i = item["index"]
+        if i in summaries:
+            continue
+        summary = {"index": i, "filename": item["filename"], "cached": i in cached}
+        summaries[i] = summary
+        if not analyses[i]:
+            summary.update(status="no_detection", detection_status="No detection")
+            continue
+
+        original_filename = f"{batch_id}_{i}_{secure_filename(item['filename'])}"
+        created = []
+        for analysis in analyses[i]:
+            if i in cached:
+                analysis = _copy_annotated(analysis, f"{batch_id}_{i}")
+            result, detection_rows = build_report(
+                analysis, item["data"], original_filename, user_id,
+                item["latitude"], item["longitude"], item["location"]
+            )
+            rows.extend(detection_rows)
+            created.append({
+                "id": detection_rows[0].id,
+                "detection_type": analysis["detection_type"],
+                "department": result["department"],
+                "detection_status": result["detection_status"]
+            })
+
+        summary.update(status="detected", **created[0])
+        if len(created) > 1:
+            summary["additional_detections"] = created[1:]
+
+    return [summaries[item["index"]] for item in items], rows
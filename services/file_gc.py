@@ -0,0 +1,69 @@
+"""
+Background removal of image files whose detection rows were deleted.
+
+Deleting rows is one set-based statement; removing their files is slow disk I/O
+(a stat and an unlink per file), so the request only hands the paths to a queue
+and a daemon thread removes them. Files still queued when the process exits are
+removed by an exit hook; a hard crash leaves them as orphans on disk.
+"""
+
+import os
+import queue
+import atexit
+import logging
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class FileGC:
+    def __init__(self):
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self.stats = {"removed": 0, "missing": 0, "failed": 0}
+
+    def collect(self, paths):
+        """Queues files for removal; empty and None paths are skipped."""
+        paths = [path for path in paths if path]
+        if not paths:
+            return
+        self._ensure_started()
+        for path in paths:
+            self._queue.put(path)
+
+    def _ensure_started(self):
+        with self._lock:
+            if self._thread is None:
+                self._thread = threading.Thread(target=self._run, name="file-gc", daemon=True)
+                self._thread.start()
+                atexit.register(self.drain)
+
+    def _remove(self, path):
+        try:
+            os.remove(path)
+            self.stats["removed"] += 1
+        except FileNotFoundError:
+            self.stats["missing"] += 1
+        except OSError:
+            self.stats["failed"] += 1
+            logger.exception(f"Could not remove {path}")
+
+    def _run(self):
+        while True:
+            path = self._queue.get()
+            try:
+                self._remove(path)
+            finally:
+                self._queue.task_done()
+
+    def drain(self):
+        """Removes everything queued so far (waits for the worker)."""
+        if self._thread is not None:
+            self._queue.join()
+
+    def pending(self):
+        return self._queue.qsize()
+
+
+FILE_GC = FileGC()
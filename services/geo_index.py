@@ -0,0 +1,171 @@
+"""
+In-memory spatial index of recent open incidents, for duplicate suppression.
+
+Detections reported within GEO_DEDUP_RADIUS_M and GEO_DEDUP_WINDOW_DAYS of an
+open incident of the same type are attached to it (report_count and
+last_reported_at) instead of becoming a new row. An incident is open while its
+detection_status is not one of CLOSED_STATUSES (case-insensitive).
+
+The index is a grid of roughly radius-sized cells keyed by (type, lat cell,
+lon cell). It is loaded from the detections table on first use, reloaded every
+GEO_INDEX_REFRESH_S (so incidents created by other processes show up), and
+updated in place when this process saves or attaches a detection.
+"""
+
+import math
+import time
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from sqlalchemy import func, select, update
+
+from config import Config
+from models import db, Detection
+from models.detection import CLOSED_STATUSES
+from utils.geo import haversine_m
+
+logger = logging.getLogger(__name__)
+
+METRES_PER_DEGREE = 111320.0
+
+
+def open_incidents_query(since):
+    """Open incidents last seen since `since` (served by the partial ix_detections_open_last_seen)."""
+    last_seen = func.coalesce(Detection.last_reported_at, Detection.timestamp)
+    return (
+        select(Detection.id, Detection.detection_type, Detection.latitude, Detection.longitude, last_seen)
+        .where(last_seen >= since)
+        .where(func.lower(Detection.detection_status).notin_(CLOSED_STATUSES))
+    )
+
+
+class GeoIndex:
+    def __init__(self, radius_m=None, window_days=None, refresh_s=None):
+        self.radius_m = radius_m or Config.GEO_DEDUP_RADIUS_M
+        self.window_days = window_days or Config.GEO_DEDUP_WINDOW_DAYS
+        self.refresh_s = Config.GEO_INDEX_REFRESH_S if refresh_s is None else refresh_s
+        self.cell_deg = self.radius_m / METRES_PER_DEGREE
+
+        self._lock = threading.Lock()
+        self._cells = {}     # (type, lat cell, lon cell) -> {id: (lat, lon, last_seen)}
+        self._loaded_at = None
+
+    # ---------------------------
+    # GRID
+    # ---------------------------
+    def _cell(self, lat, lon):
+        return int(math.floor(lat / self.cell_deg)), int(math.floor(lon / self.cell_deg))
+
+    def _insert(self, cells, detection_id, detection_type, lat, lon, last_seen):
+        cy, cx = self._cell(lat, lon)
+        cells.setdefault((detection_type, cy, cx), {})[detection_id] = (lat, lon, last_seen)
+
+    def add(self, detection_id, detection_type, lat, lon, last_seen=None):
+        if not lat and not lon:
+            return
+        with self._lock:
+            self._insert(self._cells, detection_id, detection_type, lat, lon, last_seen or datetime.utcnow())
+
+    @staticmethod
+    def entries_for(rows):
+        """(id, type, lat, lon) of the Detection rows; read before commit expires them."""
+        return [
+            (row.id, row.detection_type, row.latitude, row.longitude)
+            for row in rows if isinstance(row, Detection)
+        ]
+
+    def add_entries(self, entries):
+        for detection_id, detection_type, lat, lon in entries:
+            self.add(detection_id, detection_type, lat, lon)
+
+    def adder(self, rows):
+        """Callback that indexes the Detection rows once they are committed."""
+        entries = self.entries_for(rows)
+        return lambda: self.add_entries(entries)
+
+    def remove(self, detection_id):
+        self.remove_many([detection_id])
+
+    def remove_many(self, detection_ids):
+        detection_ids = set(detection_ids)
+        if not detection_ids:
+            return
+        with self._lock:
+            for entries in self._cells.values():
+                for detection_id in detection_ids.intersection(entries):
+                    del entries[detection_id]
+
+    # ---------------------------
+    # LOADING
+    # ---------------------------
+    def reload(self):
+        """Rebuilds the grid from the open incidents of the last GEO_DEDUP_WINDOW_DAYS."""
+        stmt = open_incidents_query(datetime.utcnow() - timedelta(days=self.window_days))
+        cells = {}
+        count = 0
+        for detection_id, detection_type, lat, lon, seen in db.session.execute(stmt):
+            if lat or lon:
+                self._insert(cells, detection_id, detection_type, lat, lon, seen)
+                count += 1
+        with self._lock:
+            self._cells = cells
+            self._loaded_at = time.monotonic()
+        logger.info(f"Geo index loaded {count} open incidents")
+
+    def _ensure_fresh(self):
+        if self._loaded_at is None or time.monotonic() - self._loaded_at > self.refresh_s:
+            self.reload()
+
+    # ---------------------------
+    # QUERIES
+    # ---------------------------
+    def nearest(self, lat, lon, detection_types=("pothole", "waste")):
+        """
+        Closest open incident of one of `detection_types` within the radius and time
+        window, as (detection_id, detection_type, distance_m), or None.
+        """
+        if not lat and not lon:
+            return None
+        self._ensure_fresh()
+
+        cutoff = datetime.utcnow() - timedelta(days=self.window_days)
+        cy, cx = self._cell(lat, lon)
+        # A degree of longitude shrinks with latitude, so the radius spans more lon cells
+        dx = int(math.ceil(1.0 / max(math.cos(math.radians(lat)), 0.01)))
+
+        best = None
+        with self._lock:
+            for detection_type in detection_types:
+                for y in (cy - 1, cy, cy + 1):
+                    for x in range(cx - dx, cx + dx + 1):
+                        for detection_id, (elat, elon, seen) in self._cells.get((detection_type, y, x), {}).items():
+                            if seen < cutoff:
+                                continue
+                            distance = haversine_m(lat, lon, elat, elon)
+                            if distance <= self.radius_m and (best is None or distance < best[2]):
+                                best = (detection_id, detection_type, distance)
+        return best
+
+    def attach(self, detection_id):
+        """
+        Records one more report on an incident. Returns the updated Detection, or None
+        if it was deleted or closed meanwhile (it is then dropped from the index).
+        """
+        now = datetime.utcnow()
+        updated = db.session.execute(
+            update(Detection)
+            .where(Detection.id == detection_id, func.lower(Detection.detection_status).notin_(CLOSED_STATUSES))
+            .values(report_count=Detection.report_count + 1, last_reported_at=now)
+        ).rowcount
+        db.session.commit()
+
+        if not updated:
+            self.remove(detection_id)
+            return None
+        detection = db.session.get(Detection, detection_id)
+        self.add(detection.id, detection.detection_type, detection.latitude, detection.longitude, now)
+        return detection
+
+
+GEO_INDEX = GeoIndex() if Config.GEO_DEDUP_ENABLED else None
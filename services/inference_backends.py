@@ -0,0 +1,377 @@
+"""
+Inference backends behind ModelLoader.
+
+Every backend takes a batch of images (BGR arrays or paths) and returns one
+ultralytics `Results` per image, so processors, annotation and reasoning see
+the same boxes / confidences / class ids whichever runtime produced them.
+
+  ultralytics  - PyTorch eager YOLO (default)
+  onnxruntime  - exported ONNX graph on ONNX Runtime (CPU)
+  openvino     - the same ONNX graph compiled by OpenVINO (CPU)
+
+The ONNX runtimes need the weights exported first: `python export_models.py`.
+Reduced-precision variants (INFERENCE_PRECISION) come from `python calibrate_models.py`
+and are only used while their calibration report stays within QUANT_MAX_MAP_DRIFT.
+"""
+
+import os
+import ast
+import json
+import logging
+from abc import ABC, abstractmethod
+
+import cv2
+import numpy as np
+import torch
+from ultralytics import YOLO
+from ultralytics.engine.results import Results
+
+from config import Config
+from utils.file_utils import as_bgr_array
+
+logger = logging.getLogger(__name__)
+
+
+PRECISIONS = ("fp32", "int8_dynamic", "int8_static", "bf16")
+
+
+def onnx_path_for(weights_path):
+    return os.path.splitext(weights_path)[0] + ".onnx"
+
+
+def meta_path_for(onnx_path):
+    return os.path.splitext(onnx_path)[0] + ".meta.json"
+
+
+def quantized_path_for(onnx_path, precision):
+    return os.path.splitext(onnx_path)[0] + f".{precision}.onnx"
+
+
+def manifest_path_for(weights_path):
+    """Calibration report written by `python calibrate_models.py`."""
+    return os.path.splitext(weights_path)[0] + ".quant.json"
+
+
+def load_manifest(weights_path):
+    path = manifest_path_for(weights_path)
+    if not os.path.exists(path):
+        return {}
+    with open(path, encoding="utf-8") as fh:
+        return json.load(fh)
+
+
+def bf16_supported():
+    try:
+        return bool(torch.ops.mkldnn._is_mkldnn_bf16_supported())
+    except Exception:
+        return False
+
+
+def approved_precision(weights_path, precision, backend_name, max_drift=None):
+    """
+    Accuracy guardrail: a reduced-precision variant is only used when the
+    calibration report shows its mAP drift against fp32 within `max_drift`.
+    Anything else falls back to fp32 with a warning.
+    """
+    if precision == "fp32":
+        return precision
+    if precision not in PRECISIONS:
+        raise ValueError(f"Unknown inference precision '{precision}' (expected one of {PRECISIONS})")
+
+    if precision.startswith("int8") and backend_name == "ultralytics":
+        logger.warning("INT8 models need the onnxruntime or openvino backend; using fp32.")
+        return "fp32"
+    if precision == "bf16" and (backend_name == "onnxruntime" or not bf16_supported()):
+        logger.warning(f"bf16 is not available for the {backend_name} backend on this CPU; using fp32.")
+        return "fp32"
+
+    if max_drift is None:
+        max_drift = Config.QUANT_MAX_MAP_DRIFT
+    entry = load_manifest(weights_path).get(precision)
+    if not entry:
+        logger.warning(f"No calibration report for {precision} of {weights_path}; using fp32.")
+        return "fp32"
+    if entry["drift"] > max_drift:
+        logger.warning(
+            f"{precision} of {weights_path} drifts {entry['drift']:.4f} mAP50 from fp32 "
+            f"(allowed {max_drift}); using fp32."
+        )
+        return "fp32"
+    return precision
+
+
+def export_onnx(weights_path, imgsz=640):
+    """Exports YOLO weights to ONNX (dynamic batch / size) plus a sidecar with class names."""
+    model = YOLO(weights_path)
+    onnx_path = model.export(format="onnx", imgsz=imgsz, dynamic=True)
+
+    meta = {
+        "source": os.path.basename(weights_path),
+        "imgsz": imgsz,
+        "stride": int(model.model.stride.max()),
+        "names": {int(k): v for k, v in model.names.items()}
+    }
+    with open(meta_path_for(onnx_path), "w", encoding="utf-8") as fh:
+        json.dump(meta, fh, ensure_ascii=False, indent=2)
+
+    logger.info(f"Exported {weights_path} -> {onnx_path}")
+    return onnx_path
+
+
+# ---------------------------
+# PYTORCH (ULTRALYTICS)
+# ---------------------------
+class UltralyticsBackend:
+    name = "ultralytics"
+
+    def __init__(self, weights_path, device="cpu", precision="fp32"):
+        self.weights_path = weights_path
+        self.device = device
+        self.precision = precision
+        self.model = YOLO(weights_path)
+
+    @property
+    def names(self):
+        return self.model.names
+
+    def memory_bytes(self):
+        """Bytes held by the network's parameters and buffers."""
+        net = self.model.model
+        tensors = list(net.parameters()) + list(net.buffers())
+        return sum(t.numel() * t.element_size() for t in tensors)
+
+    def predict(self, sources, conf=0.25, imgsz=640):
+        # bf16 runs the convolutions under CPU autocast; boxes still come back as float32
+        with torch.autocast("cpu", dtype=torch.bfloat16, enabled=self.precision == "bf16"):
+            return self.model(
+                source=list(sources),
+                conf=conf,
+                imgsz=imgsz,
+                batch=len(sources),
+                device=self.device,
+                verbose=False
+            )
+
+
+# ---------------------------
+# ONNX GRAPH (SHARED PRE / POST-PROCESSING)
+# ---------------------------
+def letterbox(img, size, color=(114, 114, 114), auto=False, stride=32):
+    """
+    Resizes keeping aspect ratio and pads to a size x size square, or with `auto`
+    only up to the next multiple of `stride` (ultralytics' LetterBox).
+    """
+    h, w = img.shape[:2]
+    ratio = min(size / h, size / w)
+    new_w, new_h = int(round(w * ratio)), int(round(h * ratio))
+    pad_w, pad_h = size - new_w, size - new_h
+    if auto:
+        pad_w, pad_h = pad_w % stride, pad_h % stride
+    pad_w, pad_h = pad_w / 2, pad_h / 2
+
+    if (w, h) != (new_w, new_h):
+        img = cv2.resize(img, (new_w, new_h), interpolation=cv2.INTER_LINEAR)
+
+    top, bottom = int(round(pad_h - 0.1)), int(round(pad_h + 0.1))
+    left, right = int(round(pad_w - 0.1)), int(round(pad_w + 0.1))
+    img = cv2.copyMakeBorder(img, top, bottom, left, right, cv2.BORDER_CONSTANT, value=color)
+    return img, ratio, (left, top)
+
+
+def preprocess(frames, imgsz, stride=32):
+    """
+    Letterboxes BGR frames into one float32 RGB NCHW batch; returns it with the
+    per-frame transforms. Like ultralytics' predictor on a dynamic-shape model, a
+    batch of same-sized frames gets the smallest stride-aligned rectangle (a 4:3
+    frame runs at 640x480, not 640x640); mixed sizes share the square.
+    """
+    auto = len({frame.shape for frame in frames}) == 1
+    inputs, transforms = [], []
+    for frame in frames:
+        img, ratio, (pad_x, pad_y) = letterbox(frame, imgsz, auto=auto, stride=stride)
+        inputs.append(img[:, :, ::-1].transpose(2, 0, 1))  # BGR HWC -> RGB CHW
+        transforms.append((ratio, pad_x, pad_y))
+    batch = np.ascontiguousarray(np.stack(inputs), dtype=np.float32) / 255.0
+    return batch, transforms
+
+
+def nms(boxes, scores, iou_thres):
+    """Greedy non-maximum suppression on xyxy boxes; returns kept indices by descending score."""
+    order = scores.argsort()[::-1]
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    keep = []
+
+    while order.size > 0:
+        i = order[0]
+        keep.append(i)
+        rest = order[1:]
+
+        xx1 = np.maximum(boxes[i, 0], boxes[rest, 0])
+        yy1 = np.maximum(boxes[i, 1], boxes[rest, 1])
+        xx2 = np.minimum(boxes[i, 2], boxes[rest, 2])
+        yy2 = np.minimum(boxes[i, 3], boxes[rest, 3])
+        inter = np.clip(xx2 - xx1, 0, None) * np.clip(yy2 - yy1, 0, None)
+        iou = inter / (areas[i] + areas[rest] - inter + 1e-9)
+
+        order = rest[iou <= iou_thres]
+
+    return np.array(keep, dtype=np.int64)
+
+
+def postprocess(pred, conf, iou=0.7, max_det=300):
+    """
+    Turns one raw YOLOv8 head output [4 + nc, anchors] into an [n, 6] array of
+    (x1, y1, x2, y2, conf, cls) in letterboxed-input pixels, like ultralytics' NMS.
+    """
+    pred = pred.T
+    class_scores = pred[:, 4:]
+    cls = class_scores.argmax(axis=1)
+    scores = class_scores[np.arange(len(cls)), cls]
+
+    mask = scores > conf
+    if not mask.any():
+        return np.zeros((0, 6), dtype=np.float32)
+
+    xywh, scores, cls = pred[mask, :4], scores[mask], cls[mask]
+    boxes = np.empty_like(xywh)
+    boxes[:, 0] = xywh[:, 0] - xywh[:, 2] / 2
+    boxes[:, 1] = xywh[:, 1] - xywh[:, 3] / 2
+    boxes[:, 2] = xywh[:, 0] + xywh[:, 2] / 2
+    boxes[:, 3] = xywh[:, 1] + xywh[:, 3] / 2
+
+    # Class-aware NMS: offset boxes per class so different classes never suppress each other
+    offsets = cls[:, None].astype(np.float32) * 7680.0
+    keep = nms(boxes + offsets, scores, iou)[:max_det]
+
+    return np.concatenate(
+        [boxes[keep], scores[keep, None], cls[keep, None].astype(np.float32)], axis=1
+    ).astype(np.float32)
+
+
+class OnnxGraphBackend(ABC):
+    """Common pre/post-processing for runtimes that execute the exported ONNX graph."""
+    name = "onnx"
+
+    def __init__(self, weights_path, device="cpu", precision="fp32"):
+        self.onnx_path = weights_path if weights_path.endswith(".onnx") else onnx_path_for(weights_path)
+        if not os.path.exists(self.onnx_path):
+            raise FileNotFoundError(
+                f"ONNX model not found: {self.onnx_path} (run `python export_models.py` first)"
+            )
+        self.device = device
+        self.precision = precision
+
+        # INT8 variants are separate graphs built by `python calibrate_models.py`
+        self.model_path = self.onnx_path
+        if precision.startswith("int8"):
+            self.model_path = quantized_path_for(self.onnx_path, precision)
+            if not os.path.exists(self.model_path):
+                raise FileNotFoundError(
+                    f"Quantized model not found: {self.model_path} (run `python calibrate_models.py` first)"
+                )
+
+        meta = self._load_meta()
+        self._names = {int(k): v for k, v in meta.get("names", {}).items()}
+        self.stride = int(meta.get("stride", 32))
+        self._load()
+
+    def _load_meta(self):
+        meta_path = meta_path_for(self.onnx_path)
+        if os.path.exists(meta_path):
+            with open(meta_path, encoding="utf-8") as fh:
+                return json.load(fh)
+        return {}
+
+    @property
+    def names(self):
+        return self._names
+
+    def memory_bytes(self):
+        """Size of the loaded graph (weights dominate what the runtime keeps resident)."""
+        return os.path.getsize(self.model_path)
+
+    @abstractmethod
+    def _load(self):
+        """Builds the runtime's session for self.model_path."""
+
+    @abstractmethod
+    def _infer(self, batch):
+        """Runs a float32 NCHW batch; returns the raw head output, one [4 + nc, anchors] array per image."""
+
+    def predict(self, sources, conf=0.25, imgsz=640):
+        frames = [as_bgr_array(s) for s in sources]
+        batch, transforms = preprocess(frames, imgsz, self.stride)
+
+        outputs = self._infer(batch)
+
+        results = []
+        for source, frame, pred, (ratio, pad_x, pad_y) in zip(sources, frames, outputs, transforms):
+            det = postprocess(pred, conf)
+            h, w = frame.shape[:2]
+            det[:, [0, 2]] = ((det[:, [0, 2]] - pad_x) / ratio).clip(0, w)
+            det[:, [1, 3]] = ((det[:, [1, 3]] - pad_y) / ratio).clip(0, h)
+            results.append(Results(
+                orig_img=frame,
+                path=source if isinstance(source, str) else "image0.jpg",
+                names=self.names,
+                boxes=torch.from_numpy(det)
+            ))
+        return results
+
+
+class OnnxRuntimeBackend(OnnxGraphBackend):
+    name = "onnxruntime"
+
+    def _load(self):
+        import onnxruntime as ort
+
+        options = ort.SessionOptions()
+        options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        self.session = ort.InferenceSession(
+            self.model_path, sess_options=options, providers=["CPUExecutionProvider"]
+        )
+        self.input_name = self.session.get_inputs()[0].name
+
+        # Fall back to the names and stride ultralytics stores in the graph metadata
+        meta = self.session.get_modelmeta().custom_metadata_map
+        if not self._names and "names" in meta:
+            self._names = {int(k): v for k, v in ast.literal_eval(meta["names"]).items()}
+        if not os.path.exists(meta_path_for(self.onnx_path)) and "stride" in meta:
+            self.stride = int(meta["stride"])
+
+    def _infer(self, batch):
+        return self.session.run(None, {self.input_name: batch})[0]
+
+
+class OpenVINOBackend(OnnxGraphBackend):
+    name = "openvino"
+
+    def _load(self):
+        import openvino as ov
+
+        core = ov.Core()
+        # Pin the precision: OpenVINO would otherwise pick bf16 on its own on capable CPUs
+        hint = "bf16" if self.precision == "bf16" else "f32"
+        self.compiled = core.compile_model(
+            core.read_model(self.model_path), "CPU", {"INFERENCE_PRECISION_HINT": hint}
+        )
+        self.output = self.compiled.output(0)
+
+    def _infer(self, batch):
+        return self.compiled(batch)[self.output]
+
+
+BACKENDS = {
+    UltralyticsBackend.name: UltralyticsBackend,
+    OnnxRuntimeBackend.name: OnnxRuntimeBackend,
+    OpenVINOBackend.name: OpenVINOBackend,
+}
+
+
+def load_backend(name, weights_path, device="cpu", precision="fp32"):
+    try:
+        backend_cls = BACKENDS[name]
+    except KeyError:
+        raise ValueError(f"Unknown inference backend '{name}' (expected one of {sorted(BACKENDS)})")
+    precision = approved_precision(weights_path, precision, name)
+    return backend_cls(weights_path, device, precision)
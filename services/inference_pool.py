@@ -0,0 +1,240 @@
+import os
+import queue
+import logging
+import itertools
+import threading
+import multiprocessing as mp
+from multiprocessing import shared_memory
+from concurrent.futures import Future
+
+import numpy as np
+import torch
+from ultralytics.engine.results import Results
+
+from config import Config
+from services.tiling import should_tile, tiled_predict
+from utils.file_utils import as_bgr_array
+
+logger = logging.getLogger(__name__)
+
+
+def _worker_main(waste_model_path, pothole_model_path, tasks, results, max_batch_size, threads):
+    """
+    Inference worker process: holds its own copy of the YOLO models and serves
+    tasks from the shared queue. Frames are read straight out of shared memory.
+    """
+    # Imported here so the parent never builds models for the workers
+    from model_loader import ModelLoader
+
+    if threads:
+        torch.set_num_threads(threads)
+
+    try:
+        loader = ModelLoader(waste_model_path, pothole_model_path, batching=False)
+    except Exception as e:
+        results.put((None, "error", repr(e)))
+        return
+
+    results.put((None, "ready", {
+        "waste": dict(loader.waste_model.names),
+        "pothole": dict(loader.pothole_model.names)
+    }))
+
+    while True:
+        task = tasks.get()
+        if task is None:
+            return
+
+        # Drain whatever else is already waiting so it shares the forward pass
+        batch = [task]
+        stop = False
+        while len(batch) < max_batch_size:
+            try:
+                nxt = tasks.get_nowait()
+            except queue.Empty:
+                break
+            if nxt is None:
+                stop = True
+                break
+            batch.append(nxt)
+
+        groups = {}
+        for task in batch:
+            task_id, task_type, conf, imgsz, shm_name, shape, dtype = task
+            groups.setdefault((task_type, conf, imgsz), []).append(task)
+
+        for (task_type, conf, imgsz), members in groups.items():
+            _run_group(loader, task_type, conf, imgsz, members, results)
+
+        if stop:
+            return
+
+
+def _read_frame(shm_name, shape, dtype):
+    # The parent owns the segment and unlinks it once the reply arrives
+    shm = shared_memory.SharedMemory(name=shm_name)
+    try:
+        # One memcpy out of the segment: ultralytics keeps references to its inputs,
+        # which would otherwise pin the buffer and keep it from closing
+        return np.ndarray(shape, dtype=np.dtype(dtype), buffer=shm.buf).copy()
+    finally:
+        shm.close()
+
+
+def _run_group(loader, task_type, conf, imgsz, members, results):
+    try:
+        frames = [_read_frame(shm_name, shape, dtype) for _, _, _, _, shm_name, shape, dtype in members]
+        outputs = loader.predict_batch(frames, task_type, conf, imgsz)
+        for (task_id, *_), r in zip(members, outputs):
+            results.put((task_id, "ok", r.boxes.data.cpu().numpy()))
+    except Exception as e:
+        for task_id, *_ in members:
+            results.put((task_id, "error", repr(e)))
+
+
+class InferencePool:
+    """
+    ModelLoader-compatible client for a pool of inference worker processes.
+
+    Each worker loads the YOLO models once and pulls tasks from a shared queue.
+    Decoded frames are copied into a shared-memory segment instead of being pickled;
+    only the box tensor comes back, and the ultralytics Results object is rebuilt here
+    so processors, annotation and reasoning work unchanged.
+    """
+
+    def __init__(self, waste_model_path, pothole_model_path, workers=None, threads=None,
+                 max_batch_size=None, timeout=None):
+        self.workers = workers or Config.INFERENCE_WORKERS or os.cpu_count() or 1
+        threads = threads if threads is not None else Config.INFERENCE_WORKER_THREADS
+        if not threads:
+            threads = max(1, (os.cpu_count() or 1) // self.workers)
+        self.timeout = timeout or Config.INFERENCE_TIMEOUT_S
+        self.device = "cpu"
+
+        if not os.path.exists(waste_model_path):
+            raise FileNotFoundError(f"Waste model not found: {waste_model_path}")
+
+        if not os.path.exists(pothole_model_path):
+            raise FileNotFoundError(f"Pothole model not found: {pothole_model_path}")
+
+        ctx = mp.get_context("spawn")
+        self._tasks = ctx.Queue()
+        self._results = ctx.Queue()
+        self._pending = {}
+        self._lock = threading.Lock()
+        self._ids = itertools.count()
+        self._ready = threading.Event()
+        self._names = {}
+        self._error = None
+
+        logger.info(f"Starting {self.workers} inference worker(s) with {threads} thread(s) each...")
+        self.processes = [
+            ctx.Process(
+                target=_worker_main,
+                args=(
+                    waste_model_path,
+                    pothole_model_path,
+                    self._tasks,
+                    self._results,
+                    max_batch_size or Config.INFERENCE_MAX_BATCH_SIZE,
+                    threads
+                ),
+                name=f"inference-worker-{i}",
+                daemon=True
+            )
+            for i in range(self.workers)
+        ]
+        for p in self.processes:
+            p.start()
+
+        self._listener = threading.Thread(target=self._collect, name="inference-results", daemon=True)
+        self._listener.start()
+
+    # ---------------------------
+    # RESULT COLLECTION
+    # ---------------------------
+    def _collect(self):
+        while True:
+            task_id, status, payload = self._results.get()
+            if task_id is None:
+                if status == "ready":
+                    self._names = payload
+                else:
+                    self._error = payload
+                    logger.error(f"Inference worker failed to start: {payload}")
+                self._ready.set()
+                continue
+
+            with self._lock:
+                future = self._pending.pop(task_id, None)
+            if future is None:
+                continue
+            if status == "ok":
+                future.set_result(payload)
+            else:
+                future.set_exception(RuntimeError(f"Inference failed: {payload}"))
+
+    def wait_ready(self, timeout=None):
+        if not self._ready.wait(timeout or self.timeout):
+            raise TimeoutError("Inference workers did not start in time")
+        if self._error and not self._names:
+            raise RuntimeError(f"Inference workers failed to start: {self._error}")
+
+    # ---------------------------
+    # MODELLOADER INTERFACE
+    # ---------------------------
+    def predict(self, image_path, task_type="waste", conf=0.25, imgsz=640):
+        if Config.TILING_ENABLED:
+            image_path = as_bgr_array(image_path)
+            if should_tile(image_path):
+                return [tiled_predict(self, image_path, task_type, conf, imgsz)]
+        return self.predict_batch([image_path], task_type, conf, imgsz)
+
+    def predict_batch(self, sources, task_type="waste", conf=0.25, imgsz=640):
+        self.wait_ready()
+
+        frames = [np.ascontiguousarray(as_bgr_array(s)) for s in sources]
+        segments, futures, task_ids = [], [], []
+        try:
+            for frame in frames:
+                shm = shared_memory.SharedMemory(create=True, size=max(1, frame.nbytes))
+                segments.append(shm)
+                np.ndarray(frame.shape, dtype=frame.dtype, buffer=shm.buf)[...] = frame
+
+                task_id = next(self._ids)
+                task_ids.append(task_id)
+                future = Future()
+                with self._lock:
+                    self._pending[task_id] = future
+                futures.append(future)
+                self._tasks.put((task_id, task_type, conf, imgsz, shm.name, frame.shape, frame.dtype.str))
+
+            names = self._names.get(task_type, {})
+            return [
+                Results(
+                    orig_img=frame,
+                    path="image0.jpg",
+                    names=names,
+                    boxes=torch.from_numpy(future.result(timeout=self.timeout))
+                )
+                for frame, future in zip(frames, futures)
+            ]
+        finally:
+            # Forget tasks that timed out so late replies are dropped
+            with self._lock:
+                for task_id in task_ids:
+                    self._pending.pop(task_id, None)
+            for shm in segments:
+                shm.close()
+                shm.unlink()
+
+    def get_class_name(self, task_type, class_id):
+        """Return class name as reported by the workers' models."""
+        self.wait_ready()
+        return self._names.get(task_type, {}).get(class_id, "unknown")
+
+    def shutdown(self):
+        for _ in self.processes:
+            self._tasks.put(None)
+        for p in self.processes:
+            p.join(timeout=5)
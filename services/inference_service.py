@@ -1,26 +1,38 @@
 import os
 import time
+import logging
+import uuid6 as uuid
 from datetime import datetime
 from flask import current_app
 # Assuming these utility and model imports are correctly defined elsewhere
 from utils.viz import annotate_and_save_ultralytics
-from reasoning.kg_gnn import KnowledgeGraphReasoner
+from utils.file_utils import as_bgr_array
+from services.model_registry import get_model_loader, get_reasoner
+from services.name_cache import DEPARTMENT_IDS, TAG_IDS
+from services.write_behind import persist
 from models import (
     db,
     Detection,
     Image,
-    Department,
-    Tag,
     DetectionDepartment,
     DetectionTag
 )
 
-# NOTE: The ModelLoader is typically initialized outside this class (e.g., in __init__) 
-# or accessed via current_app if running in a Flask context.
+logger = logging.getLogger(__name__)
+
+# NOTE: Models come from the shared registry (loaded once per process, on first use)
+# unless a specific ModelLoader is passed in.
 class InferenceService:
-    def __init__(self, model_loader):
-        self.model_loader = model_loader
-        self.reasoner = KnowledgeGraphReasoner()
+    def __init__(self, model_loader=None):
+        self._model_loader = model_loader
+
+    @property
+    def model_loader(self):
+        return self._model_loader or get_model_loader()
+
+    @property
+    def reasoner(self):
+        return get_reasoner()
     
     def save_detection_to_db(self, user_id, image_path, annotated_path, task_type, detections, department_scores):
         """
@@ -44,6 +56,7 @@ class InferenceService:
             
             # 3. Create the main Detection record
             det = Detection(
+                id=str(uuid.uuid7()),
                 user_id=user_id,
                 detection_type=task_type,
                 image_name=os.path.basename(image_path),
@@ -57,64 +70,46 @@ class InferenceService:
                 detection_status=f"{class_name} detected" if class_name else "detected"
             )
 
-            db.session.add(det)
-            # Flush session to populate det.id before related objects are created
-            db.session.flush()
-
             # 4. Create the Image record
             img = Image(
+                id=str(uuid.uuid7()),
                 detection_id=det.id, 
                 uploaded_filename=os.path.basename(image_path),
                 annotated_filename=os.path.basename(annotated_path),
                 timestamp=datetime.utcnow()
             )
-            db.session.add(img)
+            rows = [det, img]
 
             # 5. Handle Department association (DetectionDepartment)
-            dept = None
+            # Names resolve from the in-process cache; a missing row is created with one upsert
+            department_id = None
             if department_name:
-                # Find existing department or create a new one
-                dept = Department.query.filter_by(name=department_name).first()
-
-                if not dept:
-                    dept = Department(name=department_name)
-                    db.session.add(dept)
-                    db.session.flush()
-
+                department_id = DEPARTMENT_IDS.get_or_create_id(department_name)
                 rel = DetectionDepartment(
+                    id=str(uuid.uuid7()),
                     detection_id=det.id, 
-                    department_id=dept.id
+                    department_id=department_id
                 )
-                db.session.add(rel)
+                rows.append(rel)
 
             # 6. Handle Tag association (DetectionTag)
             if class_name:
-                # Find existing tag or create a new one
-                tag = Tag.query.filter_by(name=class_name).first()
-
-                if not tag:
-                    # Associate the tag with the detected department if available
-                    tag = Tag(
-                        name=class_name,
-                        department_id=dept.id if dept else None,
-                        user_id=user_id
-                    )
-                    db.session.add(tag)
-                    db.session.flush()
-
+                # Associate a new tag with the detected department if available
+                tag_id = TAG_IDS.get_or_create_id(class_name, department_id=department_id, user_id=user_id)
                 tag_rel = DetectionTag(
+                    id=str(uuid.uuid7()),
                     detection_id=det.id, 
-                    tag_id=tag.id
+                    tag_id=tag_id
                 )
-                db.session.add(tag_rel)
-                
-            db.session.commit()
-            print("Saved Detection + Department + Tag (ID:", det.id, ")")
+                rows.append(tag_rel)
+
+            # Ids are client-side, so nothing needs the database before this point
+            persist(rows)
+            logger.debug(f"Saved detection {det.id} with its department and tag")
             return True
         except Exception as e:
             db.session.rollback()
-            # Log the error properly in a real application
-            print("DB Save Error:", e)
+            logger.exception(f"Could not save the detection: {e}")
             return False
             
     def run(self, image_path, user_id, task_type="waste"):
@@ -123,8 +118,9 @@ class InferenceService:
         """
         start = time.time()
         try:
-            # 1. Run detection model
-            results = self.model_loader.predict(image_path, task_type)
+            # 1. Run detection model on the image decoded once (shared with the annotator)
+            frame = as_bgr_array(image_path)
+            results = self.model_loader.predict(frame, task_type)
             detections = []
             
             # Extract structured detection data
@@ -142,7 +138,7 @@ class InferenceService:
             uid = str(int(time.time())) 
             annotated_dir = current_app.config["ANNOTATED_FOLDER"]
             annotated_path = annotate_and_save_ultralytics(
-                results, image_path, annotated_dir, uid
+                results, frame, annotated_dir, uid
             )
             
             # 3. Prepare data for reasoning (GNN input)
@@ -198,8 +194,7 @@ class InferenceService:
                 "execution_time": round(time.time() - start, 3),
             }
         except Exception as e:
-            # Log the full traceback in a real application
-            print("INFERENCE ERROR:", e)
+            logger.exception(f"Inference failed: {e}")
             return {
                 "success": False,
                 "task_type": task_type,
@@ -0,0 +1,287 @@
+"""
+Durable detection job queue backed by the `detection_jobs` table.
+
+POST /api/detections/?async=1 (or /detection/detects?async=1, or any request
+with `Prefer: respond-async`) persists the upload, inserts a queued job and
+answers 202 with the job ID. Worker threads - inside the web app when
+JOB_WORKERS > 0, or in separate `python worker.py` processes - claim jobs with
+SELECT ... FOR UPDATE SKIP LOCKED, run the same code path as the synchronous
+endpoint and store its response body on the job. Clients poll the status
+endpoint or follow its server-sent events stream.
+
+While a job runs, its worker refreshes the job's heartbeat every
+JOB_HEARTBEAT_S, however long the job takes (a dashcam video can take many
+minutes). Jobs whose heartbeat is older than JOB_STALE_AFTER_S (the worker
+died) go back to the queue. The outcome is stored only while the worker still
+holds its claim (status "processing" at the attempt it claimed), so a worker
+that was given up on cannot overwrite the retry's result. A job that keeps
+failing is marked "failed" after JOB_MAX_ATTEMPTS.
+"""
+
+import os
+import io
+import json
+import logging
+import threading
+from datetime import datetime, timedelta
+
+from flask import request
+from sqlalchemy import func, select, update
+from werkzeug.datastructures import FileStorage
+from werkzeug.utils import secure_filename
+import uuid6 as uuid
+
+from config import Config
+from models import db, DetectionJob, User
+
+logger = logging.getLogger(__name__)
+
+FINAL_STATUSES = ("done", "failed")
+
+
+def wants_async():
+    """Async mode is requested per call (?async=1, Prefer: respond-async) or enabled for all uploads."""
+    if request.args.get("async", "").lower() in ("1", "true", "yes"):
+        return True
+    if "respond-async" in request.headers.get("Prefer", ""):
+        return True
+    return Config.ASYNC_DETECTIONS
+
+
+# ---------------------------
+# PRODUCER
+# ---------------------------
+def enqueue_job(kind, image_name, data=None, upload_path=None, user_id=None,
+                latitude=None, longitude=None, location=None, task_type=None, upload=None):
+    """
+    Persists the upload (the raw `data`, a FileStorage `upload` streamed to disk, or
+    an already saved `upload_path`) and commits a queued job for it.
+    """
+    job = DetectionJob(
+        id=str(uuid.uuid7()),
+        kind=kind,
+        user_id=user_id,
+        image_name=image_name,
+        upload_path=upload_path or "",
+        task_type=task_type,
+        latitude=latitude,
+        longitude=longitude,
+        location=location
+    )
+    if data is not None or upload is not None:
+        os.makedirs(Config.JOB_UPLOAD_FOLDER, exist_ok=True)
+        job.upload_path = os.path.join(Config.JOB_UPLOAD_FOLDER, f"{job.id}_{secure_filename(image_name)}")
+        if upload is not None:
+            upload.save(job.upload_path)
+        else:
+            with open(job.upload_path, "wb") as fh:
+                fh.write(data)
+
+    db.session.add(job)
+    db.session.commit()
+    return job
+
+
+# ---------------------------
+# CONSUMER
+# ---------------------------
+def claim_next_job():
+    """
+    Takes the oldest queued job. SKIP LOCKED lets concurrent workers pass over
+    rows another worker is claiming; the conditional UPDATE keeps the claim
+    exclusive on databases without row locks (SQLite).
+    """
+    stmt = (
+        select(DetectionJob.id)
+        .where(DetectionJob.status == "queued")
+        .order_by(DetectionJob.created_at)
+        .limit(1)
+        .with_for_update(skip_locked=True)
+    )
+    job_id = db.session.execute(stmt).scalar()
+    if job_id is None:
+        db.session.rollback()
+        return None
+
+    now = datetime.utcnow()
+    claimed = db.session.execute(
+        update(DetectionJob)
+        .where(DetectionJob.id == job_id, DetectionJob.status == "queued")
+        .values(status="processing", started_at=now, heartbeat_at=now, attempts=DetectionJob.attempts + 1)
+    ).rowcount
+    db.session.commit()
+    return db.session.get(DetectionJob, job_id) if claimed else None
+
+
+def _held(job_id, attempt):
+    """Criteria matching the job only while the claim of `attempt` is still in force."""
+    return DetectionJob.id == job_id, DetectionJob.status == "processing", DetectionJob.attempts == attempt
+
+
+def requeue_stale_jobs():
+    """Puts back jobs whose worker stopped refreshing their heartbeat."""
+    cutoff = datetime.utcnow() - timedelta(seconds=Config.JOB_STALE_AFTER_S)
+    last_seen = func.coalesce(DetectionJob.heartbeat_at, DetectionJob.started_at)
+    count = db.session.execute(
+        update(DetectionJob)
+        .where(DetectionJob.status == "processing", last_seen < cutoff)
+        .values(status="queued")
+    ).rowcount
+    db.session.commit()
+    if count:
+        logger.warning(f"Re-queued {count} stale detection job(s)")
+    return count
+
+
+def _run_detection_job(job):
+    from controller.detection_controller import run_detection
+
+    user = db.session.get(User, job.user_id)
+    if user is None:
+        return {"error": "Invalid user"}, 401
+    with open(job.upload_path, "rb") as fh:
+        image = FileStorage(stream=io.BytesIO(fh.read()), filename=job.image_name)
+    return run_detection(image, user, job.latitude, job.longitude, job.location, job.task_type)
+
+
+def _run_inference_job(job):
+    from routes.detection_routes import inference
+
+    result = inference.run(image_path=job.upload_path, user_id=job.user_id, task_type=job.task_type or "waste")
+    return result, 200
+
+
+def _run_video_job(job):
+    from services.video_ingest import gps_track_path_for, ingest_video
+
+    gps_path = gps_track_path_for(job.upload_path)
+    summary = ingest_video(
+        job.upload_path, job.user_id, job.latitude or 0.0, job.longitude or 0.0, job.location or "",
+        task_type=job.task_type or "pothole",
+        gps_track_path=gps_path if os.path.exists(gps_path) else None
+    )
+    return summary, 201
+
+
+JOB_HANDLERS = {
+    "detection": _run_detection_job,
+    "inference": _run_inference_job,
+    "video": _run_video_job,
+}
+
+
+class JobHeartbeat:
+    """
+    Refreshes a claimed job's heartbeat every JOB_HEARTBEAT_S from its own thread
+    and connection, so it keeps beating while the handler is busy in the model.
+    """
+
+    def __init__(self, job_id, attempt):
+        self._engine = db.engine
+        self._stop = threading.Event()
+        self._thread = threading.Thread(
+            target=self._beat, args=(job_id, attempt), name=f"job-heartbeat-{job_id}", daemon=True
+        )
+        self._thread.start()
+
+    def _beat(self, job_id, attempt):
+        while not self._stop.wait(Config.JOB_HEARTBEAT_S):
+            try:
+                with self._engine.begin() as conn:
+                    held = conn.execute(
+                        update(DetectionJob).where(*_held(job_id, attempt)).values(heartbeat_at=datetime.utcnow())
+                    ).rowcount
+            except Exception:
+                logger.exception(f"Could not refresh the heartbeat of detection job {job_id}")
+                continue
+            if not held:
+                logger.warning(f"Detection job {job_id} is no longer claimed by this worker")
+                return
+
+    def stop(self):
+        self._stop.set()
+        self._thread.join()
+
+
+def process_job(job):
+    job_id, attempt = job.id, job.attempts
+    heartbeat = JobHeartbeat(job_id, attempt)
+    try:
+        body, status_code = JOB_HANDLERS[job.kind](job)
+        outcome = {"result": json.dumps(body, default=str), "status_code": status_code, "status": "done", "error": None}
+    except Exception as e:
+        logger.exception(f"Detection job {job_id} failed")
+        db.session.rollback()
+        outcome = {"error": repr(e), "status": "failed" if attempt >= Config.JOB_MAX_ATTEMPTS else "queued"}
+    finally:
+        heartbeat.stop()
+
+    if outcome["status"] in FINAL_STATUSES:
+        outcome["finished_at"] = datetime.utcnow()
+    held = db.session.execute(update(DetectionJob).where(*_held(job_id, attempt)).values(**outcome)).rowcount
+    db.session.commit()
+    job = db.session.get(DetectionJob, job_id)
+    if not held:
+        logger.warning(f"Detection job {job_id} was re-queued while this worker ran it; its outcome is discarded")
+        return job
+
+    # Detections keep their own copies of the images they were built from
+    if job.status == "done" and job.kind in ("detection", "video"):
+        for path in (job.upload_path, f"{job.upload_path}.gps.csv"):
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+    return job
+
+
+# ---------------------------
+# WORKERS
+# ---------------------------
+class JobWorkerPool:
+    def __init__(self, app, threads):
+        self.app = app
+        self._stop = threading.Event()
+        self.threads = [
+            threading.Thread(target=self._work, name=f"detection-job-{i}", daemon=True)
+            for i in range(threads)
+        ]
+        for thread in self.threads:
+            thread.start()
+        logger.info(f"Started {threads} detection job worker(s)")
+
+    def _work(self):
+        poll = Config.JOB_POLL_INTERVAL_S
+        with self.app.app_context():
+            while not self._stop.is_set():
+                try:
+                    job = claim_next_job()
+                    if job is None:
+                        requeue_stale_jobs()
+                        self._stop.wait(poll)
+                        continue
+                    process_job(job)
+                except Exception:
+                    logger.exception("Detection job worker error")
+                    db.session.rollback()
+                    self._stop.wait(poll)
+                finally:
+                    db.session.remove()
+
+    def shutdown(self, timeout=None):
+        self._stop.set()
+        for thread in self.threads:
+            thread.join(timeout)
+
+
+_pool = None
+_pool_lock = threading.Lock()
+
+
+def start_job_workers(app, threads=None):
+    """Starts the worker threads once per process."""
+    global _pool
+    with _pool_lock:
+        if _pool is None:
+            _pool = JobWorkerPool(app, threads or Config.JOB_WORKERS)
+    return _pool
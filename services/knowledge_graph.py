@@ -0,0 +1,78 @@
+"""
+Keeps the reasoner's knowledge graph in step with the department and tag tables.
+
+The reasoner is built from the tables (or the built-in department list while
+they are empty), then only what is new is added: right away when this process
+creates a department or tag, and every KG_SYNC_INTERVAL_S for rows written by
+other processes (seed scripts, other workers).
+"""
+
+import logging
+
+from flask import has_app_context
+from sqlalchemy import select
+from sqlalchemy.exc import SQLAlchemyError
+
+from models import db, Department, Tag
+from reasoning.kg_gnn import KnowledgeGraphReasoner
+
+logger = logging.getLogger(__name__)
+
+
+def graph_rows():
+    """(department names, [(tag name, department name or None), ...]) from the database."""
+    departments = db.session.execute(select(Department.name).order_by(Department.name)).scalars().all()
+    tags = db.session.execute(
+        select(Tag.name, Department.name)
+        .outerjoin(Department, Tag.department_id == Department.id)
+        .order_by(Tag.name)
+    ).all()
+    return departments, [(tag, department) for tag, department in tags]
+
+
+def create_reasoner(compiled=True):
+    if has_app_context():
+        try:
+            departments, tags = graph_rows()
+        except SQLAlchemyError:
+            logger.exception("Could not load the knowledge graph; using the built-in departments.")
+            db.session.rollback()
+            departments, tags = [], []
+        if departments:
+            logger.info(f"Knowledge graph loaded: {len(departments)} departments, {len(tags)} tags")
+            return KnowledgeGraphReasoner(compiled=compiled, departments=departments, tags=tags)
+    return KnowledgeGraphReasoner(compiled=compiled)
+
+
+def sync_reasoner(reasoner):
+    """Adds the departments and tags the reasoner does not know yet; returns how many."""
+    try:
+        rows = graph_rows()
+    except SQLAlchemyError:
+        db.session.rollback()
+        raise
+    added = reasoner.load_graph(*rows)
+    if added:
+        logger.info(f"Knowledge graph: {added} new nodes from the database")
+    return added
+
+
+def _loaded_graph():
+    from services.model_registry import registry
+
+    reasoner = registry.loaded_reasoner
+    return reasoner if hasattr(reasoner, "load_graph") else None
+
+
+def department_created(name):
+    """Call after committing a new department."""
+    reasoner = _loaded_graph()
+    if reasoner is not None:
+        reasoner.add_department(name)
+
+
+def tag_created(name, department=None):
+    """Call after committing a new tag (with its department's name, if any)."""
+    reasoner = _loaded_graph()
+    if reasoner is not None:
+        reasoner.add_tag(name, department)
@@ -0,0 +1,212 @@
+import os
+import time
+import hashlib
+import logging
+import threading
+
+import numpy as np
+from flask import has_app_context
+
+from config import Config
+from model_loader import create_model_loader
+from services.inference_backends import manifest_path_for
+from reasoning.routing_table import RoutingTable
+
+logger = logging.getLogger(__name__)
+
+
+class ModelRegistry:
+    """
+    Process-wide home of the YOLO models and the knowledge-graph reasoner.
+
+    Everything is built once, on first use (or by an explicit warm_up()), and
+    shared by every code path in the process; importing the app loads nothing.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._model_loader = None
+        self._reasoner = None
+        self._graph_synced_at = None
+        self.load_times = {}
+        self._model_version = None
+
+        # Warm-up / readiness state
+        self._warmup_started = False
+        self.ready = False
+        self.warmup_ms = {}
+        self.warmup_error = None
+
+    def get_model_loader(self):
+        if self._model_loader is None:
+            with self._lock:
+                if self._model_loader is None:
+                    start = time.perf_counter()
+                    loader = create_model_loader(Config.WASTE_MODEL_PATH, Config.POTHOLE_MODEL_PATH)
+                    self.load_times["models"] = round(time.perf_counter() - start, 3)
+                    self._model_loader = loader
+                    logger.info(f"Models ready in {self.load_times['models']}s: {self.memory_report()}")
+        return self._model_loader
+
+    def get_reasoner(self):
+        if self._reasoner is not None and self._graph_sync_due():
+            self._sync_graph()
+        if self._reasoner is None:
+            with self._lock:
+                if self._reasoner is None:
+                    start = time.perf_counter()
+                    reasoner = self._create_reasoner()
+                    self.load_times["reasoner"] = round(time.perf_counter() - start, 3)
+                    self._graph_synced_at = time.monotonic() if has_app_context() else None
+                    self._reasoner = reasoner
+        return self._reasoner
+
+    @staticmethod
+    def _create_reasoner():
+        if Config.REASONER_MODE == "table":
+            # Routing-only: a precompiled table, without the GNN (or torch) behind it
+            table = RoutingTable.load(Config.ROUTING_TABLE_PATH)
+            logger.info(f"Routing table {table.fingerprint} loaded from {Config.ROUTING_TABLE_PATH}")
+            return table
+        from services.knowledge_graph import create_reasoner
+        return create_reasoner(compiled=Config.REASONER_MODE == "compiled")
+
+    @property
+    def loaded_reasoner(self):
+        """The reasoner if it has been built, without building it."""
+        return self._reasoner
+
+    def _graph_sync_due(self):
+        if not hasattr(self._reasoner, "load_graph") or not has_app_context():
+            return False
+        if self._graph_synced_at is None:
+            return True
+        interval = Config.KG_SYNC_INTERVAL_S
+        return interval > 0 and time.monotonic() - self._graph_synced_at > interval
+
+    def _sync_graph(self):
+        """Picks up departments and tags created by other processes (see services/knowledge_graph.py)."""
+        from services.knowledge_graph import sync_reasoner
+
+        self._graph_synced_at = time.monotonic()
+        try:
+            sync_reasoner(self._reasoner)
+        except Exception:
+            logger.exception("Knowledge graph sync failed.")
+
+    def warm_up(self, imgsz=None, app=None):
+        """
+        Loads everything and runs one dummy inference per model (and one reasoning
+        pass) at the serving `imgsz`, so lazy kernel setup and first-call allocations
+        happen before traffic arrives. Sets `ready` on success. With `app`, the
+        reasoner's knowledge graph is loaded from the database.
+        """
+        if app is not None:
+            with app.app_context():
+                return self.warm_up(imgsz)
+
+        imgsz = imgsz or Config.MODEL_IMGSZ
+        try:
+            loader = self.get_model_loader()
+            reasoner = self.get_reasoner()
+
+            dummy = np.full((imgsz, imgsz, 3), 114, dtype=np.uint8)
+            for task_type in ("pothole", "waste"):
+                start = time.perf_counter()
+                loader.predict(dummy, task_type, conf=0.5, imgsz=imgsz)
+                self.warmup_ms[task_type] = round((time.perf_counter() - start) * 1000.0, 1)
+
+            start = time.perf_counter()
+            reasoner.reason({"type": "pothole", "params": {"primary": {"area_pct": 0.05, "est_depth_m": 0.1}}})
+            self.warmup_ms["reasoner"] = round((time.perf_counter() - start) * 1000.0, 1)
+
+            if has_app_context():
+                # Department / tag name -> id lookups for the write path
+                from services.name_cache import warm_name_caches
+                warm_name_caches()
+
+            self.ready = True
+            logger.info(f"Warm-up finished: {self.warmup_ms}")
+        except Exception as e:
+            self.warmup_error = repr(e)
+            logger.exception("Model warm-up failed.")
+
+    def start_warm_up(self, background=True, app=None):
+        """Runs warm_up() once per process, in a daemon thread unless `background` is False."""
+        with self._lock:
+            if self._warmup_started:
+                return
+            self._warmup_started = True
+
+        if background:
+            threading.Thread(target=self.warm_up, kwargs={"app": app}, name="model-warmup", daemon=True).start()
+        else:
+            self.warm_up(app=app)
+
+    @property
+    def model_version(self):
+        """
+        Fingerprint of what produces detections: backend, precision and the weights
+        (plus any quantization manifest) on disk. Changes whenever a model is swapped.
+        """
+        if self._model_version is None:
+            parts = [Config.INFERENCE_BACKEND, Config.INFERENCE_PRECISION]
+            for weights_path in (Config.WASTE_MODEL_PATH, Config.POTHOLE_MODEL_PATH):
+                for path in (weights_path, manifest_path_for(weights_path)):
+                    try:
+                        stat = os.stat(path)
+                        parts.append(f"{path}:{stat.st_size}:{int(stat.st_mtime)}")
+                    except OSError:
+                        parts.append(f"{path}:missing")
+            self._model_version = hashlib.sha1("|".join(parts).encode("utf-8")).hexdigest()[:16]
+        return self._model_version
+
+    @property
+    def reasoner_version(self):
+        """
+        Fingerprint of the reasoner's graph and weights (or of the compiled table it
+        routes from). Changes whenever departments, tags or weights do.
+        """
+        fingerprint = self.get_reasoner().fingerprint
+        # KnowledgeGraphReasoner computes it; a loaded RoutingTable stores it
+        return fingerprint() if callable(fingerprint) else fingerprint
+
+    @property
+    def loaded(self):
+        return self._model_loader is not None and self._reasoner is not None
+
+    def memory_report(self):
+        """Bytes held by each loaded model (models in worker processes are not counted here)."""
+        report = {}
+
+        loader = self._model_loader
+        if loader is not None:
+            if hasattr(loader, "waste_model"):
+                for task_type, model in (("waste", loader.waste_model), ("pothole", loader.pothole_model)):
+                    size = model.memory_bytes()
+                    report[task_type] = {
+                        "backend": model.name,
+                        "precision": model.precision,
+                        "bytes": size,
+                        "mb": round(size / (1024 * 1024), 2)
+                    }
+            else:
+                report["inference_pool"] = {"workers": loader.workers}
+
+        if self._reasoner is not None and hasattr(self._reasoner, "model"):
+            model = self._reasoner.model
+            size = sum(p.numel() * p.element_size() for p in model.parameters())
+            report["reasoner"] = {"bytes": size, "mb": round(size / (1024 * 1024), 2)}
+
+        return report
+
+
+registry = ModelRegistry()
+
+
+def get_model_loader():
+    return registry.get_model_loader()
+
+
+def get_reasoner():
+    return registry.get_reasoner()
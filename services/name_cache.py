@@ -0,0 +1,206 @@
+"""
+In-process name -> id caches for the department and tag tables.
+
+Both tables are small and rarely change, so each cache loads the whole table in
+one query (at warm-up or on first use), reloads it every NAME_CACHE_REFRESH_S
+for rows written by other processes, and answers every other lookup from
+memory. get_or_create is a single upsert round-trip.
+
+A row this process creates is only cached once its transaction commits (a
+rolled-back id would otherwise point nowhere); the reasoner's knowledge graph
+learns about it at the same moment.
+"""
+
+import time
+import logging
+import threading
+from abc import ABC, abstractmethod
+
+import uuid6 as uuid
+from flask import has_app_context
+from sqlalchemy import event, select, text
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+from sqlalchemy.orm import Session
+
+from config import Config
+from models import db, Department, Tag
+
+logger = logging.getLogger(__name__)
+
+PENDING_KEY = "name_cache_pending"
+
+
+class NameIdCache(ABC):
+    def __init__(self, model, refresh_s=None):
+        self.model = model
+        self.refresh_s = Config.NAME_CACHE_REFRESH_S if refresh_s is None else refresh_s
+        self._lock = threading.Lock()
+        self._ids = {}
+        self._loaded_at = None
+
+    # ---------------------------
+    # LOADING
+    # ---------------------------
+    def warm(self):
+        # A name on several rows resolves to the smallest id, as in TagIdCache._upsert
+        rows = db.session.execute(
+            select(self.model.name, self.model.id).order_by(self.model.id.desc())
+        ).all()
+        ids = {name: row_id for name, row_id in rows}
+        with self._lock:
+            self._ids = ids
+            self._loaded_at = time.monotonic()
+        logger.info(f"{self.model.__tablename__} cache loaded: {len(ids)} names")
+
+    def invalidate(self, name=None):
+        with self._lock:
+            if name is None:
+                self._loaded_at = None
+            else:
+                self._ids.pop(name, None)
+
+    def _ensure_fresh(self):
+        if self._loaded_at is None or (self.refresh_s > 0 and time.monotonic() - self._loaded_at > self.refresh_s):
+            self.warm()
+
+    # ---------------------------
+    # LOOKUPS
+    # ---------------------------
+    def get_id(self, name):
+        """Id of the row called `name`, or None. Served from memory after the first load."""
+        if not name:
+            return None
+        self._ensure_fresh()
+        with self._lock:
+            if name in self._ids:
+                return self._ids[name]
+        return None
+
+    def get_or_create_id(self, name, **values):
+        """
+        Id of the row called `name`, inserting it (with `values`) if there is none, in
+        one statement. The insert is part of the caller's transaction.
+        """
+        row_id = self.get_id(name)
+        if row_id is not None:
+            return row_id
+
+        new_id = str(uuid.uuid7())
+        row_id = self._upsert(new_id, name, values)
+        if row_id == new_id:
+            _pending(self, name, row_id, self._graph_args(name, values))
+        elif not _is_pending(row_id):
+            with self._lock:
+                self._ids[name] = row_id
+        return row_id
+
+    @abstractmethod
+    def _upsert(self, new_id, name, values):
+        """Inserts the row as `new_id` unless `name` exists; returns the id `name` resolves to."""
+
+    def _graph_args(self, name, values):
+        """What the knowledge graph needs to hear about a new row, read while the transaction is open."""
+        return ()
+
+    def _publish(self, name, row_id, graph_args):
+        with self._lock:
+            self._ids[name] = row_id
+
+
+class DepartmentIdCache(NameIdCache):
+    def __init__(self, refresh_s=None):
+        super().__init__(Department, refresh_s)
+
+    def _upsert(self, new_id, name, values):
+        # department.name is unique: the no-op update makes RETURNING give the existing id
+        insert = pg_insert if db.engine.dialect.name == "postgresql" else sqlite_insert
+        stmt = insert(Department).values(id=new_id, name=name)
+        stmt = stmt.on_conflict_do_update(index_elements=[Department.name], set_={"name": stmt.excluded.name})
+        return db.session.execute(stmt.returning(Department.id)).scalar_one()
+
+    def _publish(self, name, row_id, graph_args):
+        from services.knowledge_graph import department_created
+
+        super()._publish(name, row_id, graph_args)
+        department_created(name)
+
+
+class TagIdCache(NameIdCache):
+    def __init__(self, refresh_s=None):
+        super().__init__(Tag, refresh_s)
+
+    def _upsert(self, new_id, name, values):
+        params = {
+            "id": new_id,
+            "name": name,
+            "department_id": values.get("department_id"),
+            "user_id": values.get("user_id")
+        }
+        # tag.name has no unique constraint, so insert only where the name is missing
+        insert_missing = (
+            "INSERT INTO tag (id, name, department_id, user_id) "
+            "SELECT :id, :name, CAST(:department_id AS VARCHAR(36)), CAST(:user_id AS VARCHAR(36)) "
+            "WHERE NOT EXISTS (SELECT 1 FROM tag WHERE name = :name)"
+        )
+        if db.engine.dialect.name == "postgresql":
+            return db.session.execute(text(
+                f"WITH ins AS ({insert_missing} RETURNING id) "
+                "SELECT id FROM ins UNION ALL (SELECT id FROM tag WHERE name = :name ORDER BY id LIMIT 1) "
+                "LIMIT 1"
+            ), params).scalar_one()
+        # SQLite has no data-modifying CTEs
+        db.session.execute(text(insert_missing), params)
+        return db.session.execute(
+            select(Tag.id).where(Tag.name == name).order_by(Tag.id).limit(1)
+        ).scalar_one()
+
+    def _graph_args(self, name, values):
+        department_id = values.get("department_id")
+        department = db.session.get(Department, department_id) if department_id else None
+        return (department.name if department is not None else None,)
+
+    def _publish(self, name, row_id, graph_args):
+        from services.knowledge_graph import tag_created
+
+        super()._publish(name, row_id, graph_args)
+        tag_created(name, *graph_args)
+
+
+# ---------------------------
+# COMMIT HOOKS
+# ---------------------------
+def _pending(cache, name, row_id, graph_args):
+    db.session.info.setdefault(PENDING_KEY, []).append((cache, name, row_id, graph_args))
+
+
+def _is_pending(row_id):
+    """Whether the row was created by this session's still-open transaction."""
+    return any(pending[2] == row_id for pending in db.session.info.get(PENDING_KEY, []))
+
+
+@event.listens_for(Session, "after_commit")
+def _publish_created(session):
+    # No SQL may run here: everything needed was collected before the commit
+    for cache, name, row_id, graph_args in session.info.pop(PENDING_KEY, []):
+        cache._publish(name, row_id, graph_args)
+
+
+@event.listens_for(Session, "after_rollback")
+def _drop_created(session):
+    session.info.pop(PENDING_KEY, None)
+
+
+DEPARTMENT_IDS = DepartmentIdCache()
+TAG_IDS = TagIdCache()
+
+
+def warm_name_caches():
+    if not has_app_context():
+        return
+    for cache in (DEPARTMENT_IDS, TAG_IDS):
+        try:
+            cache.warm()
+        except Exception:
+            db.session.rollback()
+            logger.exception(f"Could not warm the {cache.model.__tablename__} cache.")
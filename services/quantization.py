@@ -0,0 +1,235 @@
+"""
+Builds and evaluates reduced-precision model variants for ModelLoader.
+
+  int8_dynamic - ONNX Runtime dynamic quantization (INT8 weights, no calibration data)
+  int8_static  - ONNX Runtime static QDQ quantization calibrated on stored uploads
+  bf16         - PyTorch CPU autocast (needs AVX512-BF16 / AMX)
+
+Each variant is compared with its fp32 counterpart on the same images: the fp32
+detections serve as ground truth, so mAP50 of the variant measures the accuracy it
+loses (drift = 1 - mAP50). Results land in <weights>.quant.json, which
+`approved_precision` checks before a variant is ever loaded.
+"""
+
+import os
+import json
+import time
+import logging
+from datetime import datetime
+
+import cv2
+import numpy as np
+
+from config import Config
+from services.inference_backends import (
+    OnnxRuntimeBackend,
+    UltralyticsBackend,
+    export_onnx,
+    load_manifest,
+    manifest_path_for,
+    onnx_path_for,
+    preprocess,
+    quantized_path_for,
+)
+
+logger = logging.getLogger(__name__)
+
+IMAGE_EXT = ('.jpg', '.jpeg', '.png')
+
+
+def load_calibration_frames(folder, limit=100):
+    """Decodes up to `limit` images from `folder`, spread evenly over the sorted file list."""
+    paths = sorted(
+        os.path.join(folder, f) for f in os.listdir(folder) if f.lower().endswith(IMAGE_EXT)
+    )
+    if limit and len(paths) > limit:
+        paths = [paths[int(i)] for i in np.linspace(0, len(paths) - 1, limit)]
+
+    frames = []
+    for path in paths:
+        img = cv2.imread(path)
+        if img is not None:
+            frames.append(img)
+    return frames
+
+
+# ---------------------------
+# QUANTIZATION
+# ---------------------------
+def quantize_onnx(onnx_path, precision, frames=None, imgsz=640):
+    from onnxruntime import InferenceSession
+    from onnxruntime.quantization import (
+        CalibrationDataReader,
+        QuantFormat,
+        QuantType,
+        quantize_dynamic,
+        quantize_static,
+    )
+
+    out_path = quantized_path_for(onnx_path, precision)
+
+    if precision == "int8_dynamic":
+        quantize_dynamic(onnx_path, out_path, weight_type=QuantType.QInt8)
+    elif precision == "int8_static":
+        if not frames:
+            raise ValueError("Static INT8 quantization needs calibration images")
+        input_name = InferenceSession(onnx_path, providers=["CPUExecutionProvider"]).get_inputs()[0].name
+
+        class Reader(CalibrationDataReader):
+            """Feeds letterboxed frames to the calibrator, one image per batch."""
+
+            def __init__(self):
+                self._batches = (preprocess([frame], imgsz)[0] for frame in frames)
+
+            def get_next(self):
+                batch = next(self._batches, None)
+                return None if batch is None else {input_name: batch}
+
+        quantize_static(
+            onnx_path,
+            out_path,
+            Reader(),
+            quant_format=QuantFormat.QDQ,
+            activation_type=QuantType.QUInt8,
+            weight_type=QuantType.QInt8,
+            per_channel=True
+        )
+    else:
+        raise ValueError(f"Not an ONNX quantization mode: {precision}")
+
+    logger.info(f"Wrote {precision} model to {out_path}")
+    return out_path
+
+
+# ---------------------------
+# EVALUATION (mAP50 AGAINST FP32)
+# ---------------------------
+def box_iou(a, b):
+    """IoU between every box of a [n, 4] and b [m, 4] (xyxy) -> [n, m]."""
+    tl = np.maximum(a[:, None, :2], b[None, :, :2])
+    br = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.clip(br - tl, 0, None).prod(axis=2)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+def average_precision(recall, precision):
+    """All-point interpolated area under the precision/recall curve."""
+    mrec = np.concatenate(([0.0], recall, [1.0]))
+    mpre = np.concatenate(([1.0], precision, [0.0]))
+    mpre = np.flip(np.maximum.accumulate(np.flip(mpre)))
+    i = np.where(mrec[1:] != mrec[:-1])[0]
+    return float(np.sum((mrec[i + 1] - mrec[i]) * mpre[i + 1]))
+
+
+def map50(reference, candidate, iou_thres=0.5):
+    """
+    mAP at IoU 0.5 of `candidate` detections scored against `reference` detections.
+    Both are lists (one per image) of [n, 6] arrays: x1, y1, x2, y2, conf, cls.
+    """
+    classes = sorted({int(c) for ref in reference for c in ref[:, 5]})
+    if not classes:
+        # Nothing to find: perfect if the candidate found nothing either
+        return 1.0 if all(len(c) == 0 for c in candidate) else 0.0
+
+    aps = []
+    for cls in classes:
+        scores, hits, n_gt = [], [], 0
+        for ref, cand in zip(reference, candidate):
+            gt = ref[ref[:, 5] == cls]
+            pred = cand[cand[:, 5] == cls]
+            pred = pred[np.argsort(-pred[:, 4])]
+            n_gt += len(gt)
+
+            matched = np.zeros(len(gt), dtype=bool)
+            ious = box_iou(pred[:, :4], gt[:, :4]) if len(gt) and len(pred) else None
+            for k in range(len(pred)):
+                hit = False
+                if ious is not None:
+                    free = np.where(matched, -1.0, ious[k])
+                    j = int(free.argmax())
+                    if free[j] >= iou_thres:
+                        matched[j] = True
+                        hit = True
+                scores.append(pred[k, 4])
+                hits.append(hit)
+
+        if not scores:
+            aps.append(0.0)
+            continue
+        order = np.argsort(-np.array(scores))
+        tp = np.cumsum(np.array(hits)[order])
+        recall = tp / max(n_gt, 1)
+        precision = tp / np.arange(1, len(tp) + 1)
+        aps.append(average_precision(recall, precision))
+
+    return float(np.mean(aps))
+
+
+def _run(backend, frames, conf, imgsz):
+    backend.predict(frames[:1], conf=conf, imgsz=imgsz)  # warm-up, not timed
+    detections, times = [], []
+    for frame in frames:
+        start = time.perf_counter()
+        r = backend.predict([frame], conf=conf, imgsz=imgsz)[0]
+        times.append(time.perf_counter() - start)
+        detections.append(r.boxes.data.cpu().numpy())
+    return detections, float(np.mean(times) * 1000.0)
+
+
+def evaluate(reference_backend, candidate_backend, frames, conf=0.25, imgsz=640):
+    ref_dets, ref_ms = _run(reference_backend, frames, conf, imgsz)
+    cand_dets, cand_ms = _run(candidate_backend, frames, conf, imgsz)
+    score = map50(ref_dets, cand_dets)
+    return {
+        "map50": round(score, 4),
+        "drift": round(1.0 - score, 4),
+        "latency_ms": round(cand_ms, 2),
+        "fp32_latency_ms": round(ref_ms, 2),
+        "speedup": round(ref_ms / cand_ms, 2) if cand_ms else None,
+        "images": len(frames)
+    }
+
+
+# ---------------------------
+# CALIBRATION COMMAND
+# ---------------------------
+def calibrate(weights_path, frames, precisions, imgsz=640, conf=0.25, max_drift=None):
+    """Builds each requested variant, scores it against fp32 and records the result in the manifest."""
+    if max_drift is None:
+        max_drift = Config.QUANT_MAX_MAP_DRIFT
+    if not frames:
+        raise ValueError("No calibration images found")
+
+    onnx_path = onnx_path_for(weights_path)
+    manifest = load_manifest(weights_path)
+
+    for precision in precisions:
+        if precision == "bf16":
+            reference = UltralyticsBackend(weights_path)
+            candidate = UltralyticsBackend(weights_path, precision="bf16")
+            variant_path = weights_path
+        else:
+            if not os.path.exists(onnx_path):
+                export_onnx(weights_path, imgsz=imgsz)
+            variant_path = quantize_onnx(onnx_path, precision, frames, imgsz)
+            reference = OnnxRuntimeBackend(onnx_path)
+            candidate = OnnxRuntimeBackend(onnx_path, precision=precision)
+
+        metrics = evaluate(reference, candidate, frames, conf, imgsz)
+        metrics.update({
+            "path": variant_path,
+            "max_drift": max_drift,
+            "accepted": metrics["drift"] <= max_drift,
+            "conf": conf,
+            "imgsz": imgsz,
+            "calibrated_at": datetime.utcnow().strftime("%Y-%m-%d %H:%M:%S")
+        })
+        manifest[precision] = metrics
+        logger.info(f"{weights_path} [{precision}]: {metrics}")
+
+    with open(manifest_path_for(weights_path), "w", encoding="utf-8") as fh:
+        json.dump(manifest, fh, ensure_ascii=False, indent=2)
+
+    return manifest
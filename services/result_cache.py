@@ -0,0 +1,313 @@
+"""
+Result cache for repeated uploads.
+
+Entries are keyed by the SHA-256 of the uploaded bytes plus a context string
+(task / detection strategy, model version and confidence threshold), so a model
+swap or a threshold change never serves stale analyses. When perceptual hashing
+is enabled, an exact miss falls back to the closest cached dHash within
+RESULT_CACHE_PHASH_DISTANCE bits in the same context (re-encoded or resized
+copies of the same photo).
+
+Two tiers: an in-memory LRU with TTL, backed by one JSON file per entry in
+RESULT_CACHE_DIR that survives restarts. The disk tier keeps at most
+RESULT_CACHE_DISK_MAX_ENTRIES files: expired and surplus files are removed as
+new entries are written, oldest first. On startup the files already in the
+directory are indexed, expired ones removed, and their perceptual hashes
+loaded, so near-duplicate hits keep working after a restart. Identical uploads
+arriving together are single-flighted: one request runs the inference, the
+others wait for it.
+"""
+
+import os
+import json
+import time
+import hashlib
+import logging
+import threading
+from collections import OrderedDict
+from concurrent.futures import Future
+
+import cv2
+
+from config import Config
+
+logger = logging.getLogger(__name__)
+
+
+def content_hash(data):
+    return hashlib.sha256(data).hexdigest()
+
+
+def perceptual_hash(frame):
+    """64-bit difference hash (dHash) of a BGR frame."""
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY) if frame.ndim == 3 else frame
+    small = cv2.resize(gray, (9, 8), interpolation=cv2.INTER_AREA)
+    bits = (small[:, 1:] > small[:, :-1]).flatten()
+    value = 0
+    for bit in bits:
+        value = (value << 1) | int(bit)
+    return value
+
+
+class ResultCache:
+    def __init__(self, max_entries=None, ttl_s=None, cache_dir=None, phash_distance=None, disk_max_entries=None):
+        self.max_entries = max_entries or Config.RESULT_CACHE_MAX_ENTRIES
+        self.disk_max_entries = disk_max_entries or Config.RESULT_CACHE_DISK_MAX_ENTRIES
+        self.ttl_s = Config.RESULT_CACHE_TTL_S if ttl_s is None else ttl_s
+        self.cache_dir = Config.RESULT_CACHE_DIR if cache_dir is None else cache_dir
+        self.phash_distance = Config.RESULT_CACHE_PHASH_DISTANCE if phash_distance is None else phash_distance
+
+        self._lock = threading.Lock()
+        self._entries = OrderedDict()   # key -> (expires_at, value)
+        self._phashes = OrderedDict()   # key -> (context, phash)
+        self._disk = OrderedDict()      # key -> expires_at of this cache's files, oldest first
+        self._inflight = {}             # key -> Future
+        self.stats = {"hits": 0, "near_hits": 0, "misses": 0, "shared": 0}
+
+        if self.cache_dir:
+            os.makedirs(self.cache_dir, exist_ok=True)
+            self._load_disk()
+
+    @staticmethod
+    def make_key(digest, context):
+        return hashlib.sha256(f"{context}|{digest}".encode("utf-8")).hexdigest()
+
+    # ---------------------------
+    # LOOKUP
+    # ---------------------------
+    def get(self, key):
+        now = time.time()
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if entry[0] > now:
+                    self._entries.move_to_end(key)
+                    return entry[1]
+                self._drop(key)
+
+        entry = self._read_disk(key)
+        if entry is None:
+            return None
+        if entry["expires_at"] <= now:
+            self._remove_disk(key)
+            return None
+        with self._lock:
+            self._store(key, entry["expires_at"], entry["value"])
+            if entry.get("phash") is not None:
+                self._phashes[key] = (entry.get("context"), entry["phash"])
+        return entry["value"]
+
+    def get_similar(self, context, phash):
+        """Closest cached entry of the same context within the Hamming distance threshold."""
+        best_key, best_distance = None, self.phash_distance + 1
+        with self._lock:
+            for key, (ctx, other) in self._phashes.items():
+                if ctx != context:
+                    continue
+                distance = bin(phash ^ other).count("1")
+                if distance < best_distance:
+                    best_key, best_distance = key, distance
+        return None if best_key is None else self.get(best_key)
+
+    # ---------------------------
+    # STORE / EVICT
+    # ---------------------------
+    def put(self, key, value, context=None, phash=None):
+        expires_at = time.time() + self.ttl_s
+        with self._lock:
+            self._store(key, expires_at, value)
+            if phash is not None:
+                self._phashes[key] = (context, phash)
+                self._phashes.move_to_end(key)
+        self._write_disk(key, {"expires_at": expires_at, "context": context, "phash": phash, "value": value})
+
+    def invalidate(self, key):
+        with self._lock:
+            self._drop(key)
+        self._remove_disk(key)
+
+    def _store(self, key, expires_at, value):
+        self._entries[key] = (expires_at, value)
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.max_entries:
+            oldest, _ = self._entries.popitem(last=False)
+            # With a disk tier, a hash stays indexed as long as its file exists
+            if not self.cache_dir:
+                self._phashes.pop(oldest, None)
+
+    def _drop(self, key):
+        self._entries.pop(key, None)
+        self._phashes.pop(key, None)
+
+    # ---------------------------
+    # DISK TIER
+    # ---------------------------
+    def _disk_path(self, key):
+        return os.path.join(self.cache_dir, f"{key}.json")
+
+    def _load_disk(self):
+        """Indexes the entries a previous run left on disk and removes the expired or unreadable ones."""
+        now = time.time()
+        found = []
+        for name in os.listdir(self.cache_dir):
+            path = os.path.join(self.cache_dir, name)
+            if name.endswith(".tmp"):
+                # Left by a write that never finished (a crash); give a running one time to finish
+                if _mtime(path) < now - 60:
+                    _unlink(path)
+                continue
+            if not name.endswith(".json"):
+                continue
+            try:
+                with open(path, "r", encoding="utf-8") as fh:
+                    entry = json.load(fh)
+                expires_at = float(entry["expires_at"])
+            except (OSError, ValueError, KeyError, TypeError):
+                _unlink(path)
+                continue
+            if expires_at <= now:
+                _unlink(path)
+                continue
+            found.append((expires_at, name[:-len(".json")], entry.get("context"), entry.get("phash")))
+
+        # Every entry lives ttl_s, so expiry order is write order
+        found.sort(key=lambda item: item[0])
+        for expires_at, key, context, phash in found:
+            self._disk[key] = expires_at
+            if phash is not None:
+                self._phashes[key] = (context, phash)
+        for key in self._trim_disk(now):
+            _unlink(self._disk_path(key))
+        logger.info(f"Result cache: {len(self._disk)} entries on disk in {self.cache_dir}")
+
+    def _trim_disk(self, now):
+        """Unindexes expired files and the oldest beyond disk_max_entries; returns their keys. Needs the lock."""
+        removed = []
+        while self._disk:
+            key, expires_at = next(iter(self._disk.items()))
+            if expires_at > now and len(self._disk) <= self.disk_max_entries:
+                break
+            self._disk.popitem(last=False)
+            self._phashes.pop(key, None)
+            removed.append(key)
+        return removed
+
+    def _read_disk(self, key):
+        if not self.cache_dir:
+            return None
+        try:
+            with open(self._disk_path(key), "r", encoding="utf-8") as fh:
+                return json.load(fh)
+        except (OSError, ValueError):
+            return None
+
+    def _write_disk(self, key, entry):
+        if not self.cache_dir:
+            return
+        path = self._disk_path(key)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        try:
+            with open(tmp_path, "w", encoding="utf-8") as fh:
+                json.dump(entry, fh)
+            os.replace(tmp_path, path)
+        except (OSError, TypeError) as e:
+            logger.warning(f"Could not write cache entry {key}: {e}")
+            _unlink(tmp_path)
+            return
+        with self._lock:
+            self._disk[key] = entry["expires_at"]
+            self._disk.move_to_end(key)
+            removed = self._trim_disk(time.time())
+        for old_key in removed:
+            _unlink(self._disk_path(old_key))
+
+    def _remove_disk(self, key):
+        if not self.cache_dir:
+            return
+        with self._lock:
+            self._disk.pop(key, None)
+            self._phashes.pop(key, None)
+        _unlink(self._disk_path(key))
+
+    # ---------------------------
+    # UPLOADS
+    # ---------------------------
+    def lookup(self, digest, context, phash=None, validate=None):
+        """Cached value for the upload (exact, then near-duplicate), or None."""
+        value = self.get(self.make_key(digest, context))
+        if value is not None and (validate is None or validate(value)):
+            self.stats["hits"] += 1
+            return value
+
+        if phash is not None:
+            value = self.get_similar(context, phash)
+            if value is not None and (validate is None or validate(value)):
+                self.stats["near_hits"] += 1
+                return value
+        return None
+
+    def store(self, digest, context, value, phash=None):
+        self.put(self.make_key(digest, context), value, context, phash)
+
+    # ---------------------------
+    # SINGLE FLIGHT
+    # ---------------------------
+    def get_or_compute(self, digest, context, compute, phash=None, validate=None):
+        """
+        Returns (value, hit). On a miss `compute()` runs once per key, however many
+        identical requests are waiting on it; `validate(value)` can reject an entry
+        whose side effects (e.g. annotated files) are gone, turning it into a miss.
+        """
+        key = self.make_key(digest, context)
+
+        value = self.lookup(digest, context, phash, validate)
+        if value is not None:
+            return value, True
+
+        with self._lock:
+            future = self._inflight.get(key)
+            owner = future is None
+            if owner:
+                future = Future()
+                self._inflight[key] = future
+
+        if not owner:
+            self.stats["shared"] += 1
+            return future.result(), True
+
+        try:
+            # The previous owner may have finished between our lookup and taking the slot
+            value = self.get(key)
+            if value is not None and (validate is None or validate(value)):
+                self.stats["hits"] += 1
+                future.set_result(value)
+                return value, True
+
+            self.stats["misses"] += 1
+            value = compute()
+            self.put(key, value, context, phash)
+            future.set_result(value)
+            return value, False
+        except Exception as e:
+            future.set_exception(e)
+            raise
+        finally:
+            with self._lock:
+                self._inflight.pop(key, None)
+
+
+def _unlink(path):
+    try:
+        os.remove(path)
+    except OSError:
+        pass
+
+
+def _mtime(path):
+    try:
+        return os.path.getmtime(path)
+    except OSError:
+        return 0.0
+
+
+RESULT_CACHE = ResultCache() if Config.RESULT_CACHE_ENABLED else None
@@ -0,0 +1,127 @@
+"""
+Sliced inference for high-resolution photos.
+
+A 4000px dashcam frame squeezed to imgsz=640 loses small potholes and litter.
+With TILING_ENABLED, images whose longer side reaches TILE_MIN_SIZE are cut
+into overlapping TILE_SIZE tiles that go through the model as one batch
+(plus the whole frame at the normal imgsz, for objects larger than a tile).
+The tile boxes are shifted back to full-image coordinates and merged, and a
+single `Results` on the original frame is returned, so processors and the
+annotator consume it exactly like an untiled prediction.
+
+Merging is class-aware and matches boxes on intersection over the smaller
+box, so a box cut off at a tile edge still merges with the complete one:
+
+  nms  - keep the highest-confidence box of each group
+  wbf  - weighted box fusion: confidence-weighted average of the group's boxes
+"""
+
+import numpy as np
+import torch
+from ultralytics.engine.results import Results
+
+from config import Config
+from utils.file_utils import as_bgr_array
+
+
+def should_tile(frame, min_size=None):
+    min_size = min_size or Config.TILE_MIN_SIZE
+    return max(frame.shape[:2]) >= min_size
+
+
+def tile_windows(width, height, tile_size, overlap):
+    """(x1, y1, x2, y2) windows covering the image; the last row/column is aligned to the edge."""
+    step = max(1, int(tile_size * (1.0 - overlap)))
+
+    def starts(length):
+        if length <= tile_size:
+            return [0]
+        positions = list(range(0, length - tile_size, step))
+        positions.append(length - tile_size)
+        return positions
+
+    return [
+        (x, y, min(x + tile_size, width), min(y + tile_size, height))
+        for y in starts(height)
+        for x in starts(width)
+    ]
+
+
+def _intersection_over_smaller(box, boxes):
+    tl = np.maximum(box[:2], boxes[:, :2])
+    br = np.minimum(box[2:], boxes[:, 2:])
+    inter = np.clip(br - tl, 0, None).prod(axis=1)
+    area = (box[2] - box[0]) * (box[3] - box[1])
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    return inter / (np.minimum(area, areas) + 1e-9)
+
+
+def merge_detections(det, method="nms", threshold=0.5, max_det=300):
+    """Merges an [n, 6] array (x1, y1, x2, y2, conf, cls) of overlapping tile detections."""
+    if len(det) == 0:
+        return det
+
+    merged = []
+    for cls in np.unique(det[:, 5]):
+        group = det[det[:, 5] == cls]
+        group = group[np.argsort(-group[:, 4])]
+        used = np.zeros(len(group), dtype=bool)
+
+        for i in range(len(group)):
+            if used[i]:
+                continue
+            members = ~used & (_intersection_over_smaller(group[i, :4], group[:, :4]) >= threshold)
+            members[i] = True
+            used |= members
+
+            if method == "wbf":
+                cluster = group[members]
+                weights = cluster[:, 4:5]
+                box = (cluster[:, :4] * weights).sum(axis=0) / weights.sum()
+                merged.append(np.concatenate([box, [cluster[:, 4].max(), cls]]))
+            else:
+                merged.append(group[i])
+
+    merged = np.stack(merged).astype(np.float32)
+    return merged[np.argsort(-merged[:, 4])][:max_det]
+
+
+def tiled_predict(loader, image, task_type="waste", conf=0.25, imgsz=640,
+                  tile_size=None, overlap=None, include_full=None, method=None, threshold=None):
+    """Runs `loader.predict_batch` over the tiles of `image` and returns one merged Results."""
+    tile_size = tile_size or Config.TILE_SIZE
+    overlap = Config.TILE_OVERLAP if overlap is None else overlap
+    include_full = Config.TILE_INCLUDE_FULL if include_full is None else include_full
+    method = method or Config.TILE_MERGE
+    threshold = threshold or Config.TILE_MERGE_THRESHOLD
+
+    frame = as_bgr_array(image)
+    h, w = frame.shape[:2]
+    windows = tile_windows(w, h, tile_size, overlap)
+    tiles = [frame[y1:y2, x1:x2] for x1, y1, x2, y2 in windows]
+
+    # Tiles run at their native resolution; the full view at the usual imgsz.
+    # When both sizes agree everything goes through in a single batch.
+    if include_full and tile_size == imgsz:
+        outputs = loader.predict_batch(tiles + [frame], task_type, conf, imgsz)
+        tile_outputs, full_outputs = outputs[:-1], outputs[-1:]
+    else:
+        tile_outputs = loader.predict_batch(tiles, task_type, conf, tile_size)
+        full_outputs = loader.predict_batch([frame], task_type, conf, imgsz) if include_full else []
+
+    detections = []
+    for (x1, y1, _, _), result in zip(windows, tile_outputs):
+        det = result.boxes.data.cpu().numpy().copy()
+        det[:, [0, 2]] += x1
+        det[:, [1, 3]] += y1
+        detections.append(det)
+    for result in full_outputs:
+        detections.append(result.boxes.data.cpu().numpy())
+
+    det = np.concatenate(detections) if detections else np.zeros((0, 6), dtype=np.float32)
+    return Results(
+        orig_img=frame,
+        path=image if isinstance(image, str) else "image0.jpg",
+        names=tile_outputs[0].names,
+        boxes=torch.from_numpy(merge_detections(det, method, threshold))
+    )
@@ -0,0 +1,315 @@
+"""
+Dashcam video ingestion.
+
+The video is decoded as a stream with cv2.VideoCapture and only a few frames go
+to the model:
+
+  - with a GPS track (CSV: t, latitude, longitude; t in seconds from the start
+    of the video) a frame is sampled every VIDEO_SAMPLE_DISTANCE_M travelled;
+  - without one, a small grayscale probe every VIDEO_PROBE_INTERVAL_S measures
+    scene change and a frame is sampled once it exceeds VIDEO_MOTION_THRESHOLD;
+  - either way, never closer than VIDEO_MIN_INTERVAL_S and at least every
+    VIDEO_MAX_INTERVAL_S.
+
+Sampled frames run through the model VIDEO_BATCH_SIZE at a time, and an IoU /
+centre-shift tracker follows each object across samples. A track confirmed on
+VIDEO_TRACK_MIN_HITS samples becomes ONE Detection, built from its most
+confident observation. Memory stays bounded: one batch of frames plus the
+best frame of each live track.
+"""
+
+import csv
+import time
+import logging
+
+import cv2
+import numpy as np
+import uuid6 as uuid
+
+from config import Config
+from services.model_registry import get_model_loader
+from services.detection_service import DETECTION_CONF, analyze_hit, build_report
+from services.geo_index import GEO_INDEX
+from services.write_behind import persist
+from utils.geo import haversine_m
+
+logger = logging.getLogger(__name__)
+
+VIDEO_EXT = {"mp4", "mov", "avi", "mkv", "webm"}
+
+
+def allowed_video(filename):
+    return "." in filename and filename.rsplit(".", 1)[1].lower() in VIDEO_EXT
+
+
+def gps_track_path_for(video_path):
+    """Where an uploaded GPS track is stored next to its video."""
+    return f"{video_path}.gps.csv"
+
+
+# ---------------------------
+# GPS TRACK
+# ---------------------------
+class GpsTrack:
+    def __init__(self, times, lats, lons):
+        order = np.argsort(times)
+        self.times = np.asarray(times, dtype=np.float64)[order]
+        self.lats = np.asarray(lats, dtype=np.float64)[order]
+        self.lons = np.asarray(lons, dtype=np.float64)[order]
+
+    @classmethod
+    def from_csv(cls, path):
+        times, lats, lons = [], [], []
+        with open(path, newline="", encoding="utf-8") as fh:
+            for row in csv.DictReader(fh):
+                times.append(float(row["t"]))
+                lats.append(float(row["latitude"]))
+                lons.append(float(row["longitude"]))
+        if not times:
+            raise ValueError("GPS track is empty")
+        return cls(times, lats, lons)
+
+    def position(self, t):
+        return float(np.interp(t, self.times, self.lats)), float(np.interp(t, self.times, self.lons))
+
+
+# ---------------------------
+# SAMPLING
+# ---------------------------
+def iter_sampled_frames(video_path, gps=None, stats=None):
+    """Yields (timestamp_s, frame) for the frames worth running the model on."""
+    cap = cv2.VideoCapture(video_path)
+    if not cap.isOpened():
+        raise ValueError(f"Cannot open video: {video_path}")
+
+    fps = cap.get(cv2.CAP_PROP_FPS) or 30.0
+    probe_every = max(1, int(round(fps * Config.VIDEO_PROBE_INTERVAL_S)))
+    stats = {} if stats is None else stats
+    stats.update(fps=fps, decoded=0, sampled=0)
+
+    last_t, last_probe, last_pos = None, None, None
+    index = -1
+    try:
+        while cap.grab():
+            index += 1
+            stats["decoded"] += 1
+            t = index / fps
+
+            if last_t is None:
+                due = True
+            else:
+                elapsed = t - last_t
+                if elapsed < Config.VIDEO_MIN_INTERVAL_S:
+                    continue
+                due = elapsed >= Config.VIDEO_MAX_INTERVAL_S
+
+            frame, probe = None, None
+            if not due:
+                if gps is not None:
+                    due = haversine_m(*last_pos, *gps.position(t)) >= Config.VIDEO_SAMPLE_DISTANCE_M
+                elif index % probe_every == 0:
+                    # Change since the last sample, measured on a tiny grayscale thumbnail
+                    ok, frame = cap.retrieve()
+                    if not ok:
+                        continue
+                    probe = _probe(frame)
+                    due = float(np.mean(cv2.absdiff(probe, last_probe))) >= Config.VIDEO_MOTION_THRESHOLD
+            if not due:
+                continue
+
+            if frame is None:
+                ok, frame = cap.retrieve()
+                if not ok:
+                    continue
+            last_t = t
+            last_probe = probe if probe is not None else _probe(frame)
+            if gps is not None:
+                last_pos = gps.position(t)
+            stats["sampled"] += 1
+            yield t, frame
+    finally:
+        stats["duration_s"] = (index + 1) / fps
+        cap.release()
+
+
+def _probe(frame):
+    gray = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    return cv2.resize(gray, (64, 36), interpolation=cv2.INTER_AREA)
+
+
+# ---------------------------
+# TRACKING
+# ---------------------------
+def _iou_matrix(a, b):
+    tl = np.maximum(a[:, None, :2], b[None, :, :2])
+    br = np.minimum(a[:, None, 2:], b[None, :, 2:])
+    inter = np.clip(br - tl, 0, None).prod(axis=2)
+    area_a = (a[:, 2] - a[:, 0]) * (a[:, 3] - a[:, 1])
+    area_b = (b[:, 2] - b[:, 0]) * (b[:, 3] - b[:, 1])
+    return inter / (area_a[:, None] + area_b[None, :] - inter + 1e-9)
+
+
+class Track:
+    def __init__(self, track_id, box, conf, observation):
+        self.id = track_id
+        self.box = box
+        self.hits = 1
+        self.misses = 0
+        self.best_conf = conf
+        self.best = observation
+
+    def update(self, box, conf, observation):
+        self.box = box
+        self.hits += 1
+        self.misses = 0
+        if conf > self.best_conf:
+            self.best_conf = conf
+            self.best = observation
+
+
+class IoUTracker:
+    """
+    Greedy frame-to-frame association: a detection continues a track when their
+    boxes overlap by VIDEO_TRACK_IOU or their centres moved less than
+    VIDEO_TRACK_MAX_SHIFT of the frame diagonal (objects slide towards the
+    camera between samples). Tracks unseen for VIDEO_TRACK_MAX_AGE samples end.
+    """
+
+    def __init__(self, iou_threshold=None, max_shift=None, max_age=None, min_hits=None):
+        self.iou_threshold = Config.VIDEO_TRACK_IOU if iou_threshold is None else iou_threshold
+        self.max_shift = Config.VIDEO_TRACK_MAX_SHIFT if max_shift is None else max_shift
+        self.max_age = Config.VIDEO_TRACK_MAX_AGE if max_age is None else max_age
+        self.min_hits = Config.VIDEO_TRACK_MIN_HITS if min_hits is None else min_hits
+        self.tracks = []
+        self._next_id = 1
+
+    def update(self, boxes, confs, frame_shape, observe):
+        """
+        Feeds one sampled frame's detections ([n, 4] xyxy, [n] conf). `observe(i)`
+        builds the observation kept if detection i becomes a track's best.
+        Returns the confirmed tracks that just ended.
+        """
+        matched_tracks, matched_dets = set(), set()
+        existing = len(self.tracks)
+        if self.tracks and len(boxes):
+            track_boxes = np.stack([t.box for t in self.tracks])
+            iou = _iou_matrix(track_boxes, boxes)
+            diag = float(np.hypot(frame_shape[0], frame_shape[1]))
+            centres_t = (track_boxes[:, :2] + track_boxes[:, 2:]) / 2
+            centres_d = (boxes[:, :2] + boxes[:, 2:]) / 2
+            shift = np.linalg.norm(centres_t[:, None] - centres_d[None], axis=2) / diag
+
+            candidate_t, candidate_d = np.nonzero((iou >= self.iou_threshold) | (shift <= self.max_shift))
+            order = np.lexsort((shift[candidate_t, candidate_d], -iou[candidate_t, candidate_d]))
+            for ti, di in zip(candidate_t[order].tolist(), candidate_d[order].tolist()):
+                if ti in matched_tracks or di in matched_dets:
+                    continue
+                matched_tracks.add(ti)
+                matched_dets.add(di)
+                conf = float(confs[di])
+                track = self.tracks[ti]
+                track.update(boxes[di], conf, observe(di) if conf > track.best_conf else track.best)
+
+        for di in range(len(boxes)):
+            if di not in matched_dets:
+                self.tracks.append(Track(self._next_id, boxes[di], float(confs[di]), observe(di)))
+                self._next_id += 1
+
+        for ti in range(existing):
+            if ti not in matched_tracks:
+                self.tracks[ti].misses += 1
+
+        ended, alive = [], []
+        for track in self.tracks:
+            if track.misses > self.max_age:
+                if track.hits >= self.min_hits:
+                    ended.append(track)
+            else:
+                alive.append(track)
+        self.tracks = alive
+        return ended
+
+    def flush(self):
+        ended = [t for t in self.tracks if t.hits >= self.min_hits]
+        self.tracks = []
+        return ended
+
+
+# ---------------------------
+# INGESTION
+# ---------------------------
+def ingest_video(video_path, user_id, latitude=0.0, longitude=0.0, location="",
+                 task_type="pothole", gps_track_path=None):
+    """
+    Runs a video through sampling, batched inference and tracking, and saves one
+    Detection per confirmed track in a single transaction. Needs an app context.
+    Returns a summary with throughput numbers.
+    """
+    started = time.perf_counter()
+    gps = GpsTrack.from_csv(gps_track_path) if gps_track_path else None
+    loader = get_model_loader()
+    tracker = IoUTracker()
+    stats = {}
+    rows, detections = [], []
+    inferences = 0
+
+    stem = f"{uuid.uuid7().hex}_video"
+
+    def report(track):
+        t, frame, results = track.best
+        uid = f"{stem}_{track.id}"
+        analysis = analyze_hit(frame, task_type, results, uid)
+        lat, lon = gps.position(t) if gps is not None else (latitude, longitude)
+        ok, encoded = cv2.imencode(".jpg", frame)
+        result, detection_rows = build_report(
+            analysis, encoded.tobytes(), f"{uid}.jpg", user_id, lat, lon, location
+        )
+        rows.extend(detection_rows)
+        detections.append({
+            "id": detection_rows[0].id,
+            "track_id": track.id,
+            "time_s": round(t, 2),
+            "samples": track.hits,
+            "confidence": round(track.best_conf, 3),
+            "latitude": lat,
+            "longitude": lon,
+            "department": result["department"],
+            "detection_status": result["detection_status"]
+        })
+
+    def run(batch):
+        results = loader.predict_batch([frame for _, frame in batch], task_type, conf=DETECTION_CONF)
+        for (t, frame), result in zip(batch, results):
+            data = result.boxes.data.cpu().numpy()
+            ended = tracker.update(
+                data[:, :4], data[:, 4], frame.shape,
+                lambda i, t=t, frame=frame, result=result: (t, frame, [result[i:i + 1]])
+            )
+            for track in ended:
+                report(track)
+        return len(batch)
+
+    batch = []
+    for t, frame in iter_sampled_frames(video_path, gps, stats):
+        batch.append((t, frame))
+        if len(batch) >= Config.VIDEO_BATCH_SIZE:
+            inferences += run(batch)
+            batch = []
+    if batch:
+        inferences += run(batch)
+    for track in tracker.flush():
+        report(track)
+
+    persist(rows, GEO_INDEX.adder(rows) if GEO_INDEX is not None else None)
+
+    elapsed = time.perf_counter() - started
+    duration = stats.get("duration_s", 0.0)
+    return {
+        "video_duration_s": round(duration, 1),
+        "processing_s": round(elapsed, 1),
+        "realtime_factor": round(elapsed / duration, 3) if duration else None,
+        "frames_decoded": stats.get("decoded", 0),
+        "frames_inferred": inferences,
+        "detections_created": len(detections),
+        "detections": detections
+    }
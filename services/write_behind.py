@@ -0,0 +1,337 @@
+"""
+Write-behind batching of detection inserts.
+
+With WRITE_BEHIND_ENABLED, a detection's rows (Detection, Image and relation
+rows, all with client-side UUIDv7 ids) are handed to a per-process buffer
+instead of being committed by the request. The request returns the new id
+right away; a background thread writes everything collected so far in one
+transaction, every WRITE_BEHIND_MAX_ROWS rows or WRITE_BEHIND_MAX_DELAY_MS,
+with one multi-row INSERT ... ON CONFLICT (id) DO NOTHING per table.
+
+Delivery is at-least-once and idempotent:
+  - rows are appended to a journal segment file before submit() returns, and
+    the segment is deleted only after its rows are committed;
+  - a failed flush keeps its rows and retries with backoff;
+  - a batch the database rejects (constraint or data errors) is retried one
+    submit at a time, and only the submits that still fail are moved to
+    rejected.jsonl in the journal directory;
+  - segments left behind by a process that died are replayed on startup.
+    Segment names carry the pid and a per-start token ({pid}-{token}-{seq}),
+    so a restarted process that gets its crashed predecessor's pid (PID 1 in
+    a container) never appends to, or deletes, the predecessor's segments;
+  - re-inserting a row that made it in is a no-op (ON CONFLICT on the id).
+
+A detection is readable once its batch is flushed, normally within
+WRITE_BEHIND_MAX_DELAY_MS.
+"""
+
+import os
+import glob
+import json
+import time
+import atexit
+import logging
+import threading
+from datetime import datetime
+
+import uuid6 as uuid
+from sqlalchemy import DateTime, inspect
+from sqlalchemy.exc import DataError, IntegrityError
+from sqlalchemy.dialects.postgresql import insert as pg_insert
+from sqlalchemy.dialects.sqlite import insert as sqlite_insert
+
+from config import Config
+from models import db, Detection, Image, DetectionDepartment, DetectionTag
+
+logger = logging.getLogger(__name__)
+
+# Parents before children, so foreign keys hold inside the flush transaction
+TABLE_ORDER = [Detection, Image, DetectionDepartment, DetectionTag]
+MODELS = {model.__tablename__: model for model in TABLE_ORDER}
+
+
+def row_values(obj):
+    """
+    Column values of an unsaved ORM object. Python-side defaults are applied now
+    (and set on the object, so the caller's response shows them); SQL-expression
+    defaults are left to the INSERT.
+    """
+    values = {}
+    for attr in inspect(obj).mapper.column_attrs:
+        column = attr.columns[0]
+        value = getattr(obj, attr.key)
+        default = column.default
+        if value is None and default is not None and (default.is_scalar or default.is_callable):
+            value = default.arg(None) if default.is_callable else default.arg
+            setattr(obj, attr.key, value)
+        if value is not None:
+            values[column.name] = value
+    return values
+
+
+def _encode(value):
+    return value.isoformat() if isinstance(value, datetime) else value
+
+
+def _decode(table, values):
+    columns = MODELS[table].__table__.columns
+    return {
+        name: datetime.fromisoformat(value) if isinstance(columns[name].type, DateTime) and isinstance(value, str) else value
+        for name, value in values.items()
+    }
+
+
+class WriteBehindBuffer:
+    def __init__(self, app, max_rows=None, max_delay_ms=None, journal_dir=None):
+        self.app = app
+        self.max_rows = max_rows or Config.WRITE_BEHIND_MAX_ROWS
+        self.max_delay_s = (max_delay_ms or Config.WRITE_BEHIND_MAX_DELAY_MS) / 1000.0
+        self.journal_dir = journal_dir or Config.WRITE_BEHIND_JOURNAL_DIR
+        os.makedirs(self.journal_dir, exist_ok=True)
+
+        self._lock = threading.Lock()
+        self._wake = threading.Event()
+        self._stop = threading.Event()
+        # Recover before this buffer writes anything: every segment on disk now
+        # belongs to another process start
+        self._backlog = self._recover()  # [(segment path, submits)] awaiting a successful flush
+        self._start_token = uuid.uuid7().hex
+        self._segment_seq = 0
+        # A submit is ([(table, values), ...], after_flush callback or None)
+        self._pending = []      # submits in the active segment
+        self._pending_rows = 0
+        self._first_at = None
+        self._segment = self._open_segment()
+        self.stats = {"submitted": 0, "flushed_rows": 0, "batches": 0, "retries": 0, "rejected": 0}
+
+        self._thread = threading.Thread(target=self._run, name="write-behind", daemon=True)
+        self._thread.start()
+        atexit.register(self.shutdown)
+        logger.info(f"Write-behind buffer started (journal {self.journal_dir})")
+
+    # ---------------------------
+    # JOURNAL
+    # ---------------------------
+    def _open_segment(self):
+        self._segment_seq += 1
+        path = os.path.join(self.journal_dir, f"{os.getpid()}-{self._start_token}-{self._segment_seq:08d}.jsonl")
+        return path, open(path, "x", encoding="utf-8")
+
+    def _recover(self):
+        """
+        Rows of segments whose process is gone (crashed before flushing them). A
+        segment with this process's own pid is a predecessor's: this buffer has not
+        opened one yet.
+        """
+        backlog = []
+        for path in sorted(glob.glob(os.path.join(self.journal_dir, "*-*.jsonl"))):
+            pid = int(os.path.basename(path).split("-", 1)[0])
+            if pid != os.getpid() and _process_alive(pid):
+                continue
+            submits = []
+            with open(path, "r", encoding="utf-8") as fh:
+                for line in fh:
+                    try:
+                        submits.append(([(table, values) for table, values in json.loads(line)], None))
+                    except ValueError:
+                        logger.warning(f"Skipping a torn journal line in {path}")
+            backlog.append((path, submits))
+            logger.info(f"Replaying {len(submits)} journaled detections from {path}")
+        return backlog
+
+    # ---------------------------
+    # SUBMIT
+    # ---------------------------
+    def submit(self, objs, after_flush=None):
+        """
+        Queues unsaved ORM rows (ids already set) for the next flush. Returns once
+        they are journaled; `after_flush` runs after they are committed.
+        """
+        # Kept in journal form (JSON types), exactly as a replay would read them back
+        rows = [(obj.__tablename__, {k: _encode(v) for k, v in row_values(obj).items()}) for obj in objs]
+        line = json.dumps(rows)
+        with self._lock:
+            _, fh = self._segment
+            fh.write(line + "\n")
+            fh.flush()
+            self._pending.append((rows, after_flush))
+            self._pending_rows += len(rows)
+            if self._first_at is None:
+                self._first_at = time.monotonic()
+            self.stats["submitted"] += len(rows)
+            full = self._pending_rows >= self.max_rows
+        if full:
+            self._wake.set()
+
+    # ---------------------------
+    # FLUSH
+    # ---------------------------
+    def _swap(self):
+        """Takes the active segment's rows and starts a new segment."""
+        with self._lock:
+            if not self._pending:
+                return
+            path, fh = self._segment
+            fh.close()
+            self._backlog.append((path, self._pending))
+            self._pending, self._pending_rows, self._first_at = [], 0, None
+            self._segment = self._open_segment()
+
+    def _due(self):
+        with self._lock:
+            if not self._pending:
+                return False
+            return self._pending_rows >= self.max_rows or time.monotonic() - self._first_at >= self.max_delay_s
+
+    def _write(self, submits):
+        """Inserts the submits' rows in one transaction."""
+        by_table = {}
+        for rows, _ in submits:
+            for table, values in rows:
+                by_table.setdefault(table, []).append(_decode(table, values))
+        insert = pg_insert if db.engine.dialect.name == "postgresql" else sqlite_insert
+        for model in TABLE_ORDER:
+            # One executemany per column set, so columns a row leaves out get their defaults
+            batches = {}
+            for values in by_table.get(model.__tablename__, []):
+                batches.setdefault(tuple(sorted(values)), []).append(values)
+            stmt = insert(model.__table__).on_conflict_do_nothing(index_elements=["id"])
+            for batch in batches.values():
+                db.session.execute(stmt, batch)
+        db.session.commit()
+
+    def _write_each(self, submits):
+        """
+        After the database rejected a batch: writes its submits one at a time and
+        sets aside the ones it still rejects. Returns the submits that were written.
+        """
+        written = []
+        for submit in submits:
+            try:
+                self._write([submit])
+                written.append(submit)
+            except (IntegrityError, DataError) as e:
+                db.session.rollback()
+                self._reject(submit, e)
+        return written
+
+    def _reject(self, submit, error):
+        rows, _ = submit
+        with open(os.path.join(self.journal_dir, "rejected.jsonl"), "a", encoding="utf-8") as fh:
+            fh.write(json.dumps({"error": str(error.orig), "rows": rows}) + "\n")
+        self.stats["rejected"] += 1
+        logger.error(f"Write-behind rows rejected by the database ({error.orig}); kept in rejected.jsonl")
+
+    def flush(self):
+        """Writes every queued batch (one transaction per batch). Returns rows written."""
+        self._swap()
+        written = 0
+        while self._backlog:
+            path, submits = self._backlog[0]
+            try:
+                self._write(submits)
+            except (IntegrityError, DataError):
+                db.session.rollback()
+                submits = self._write_each(submits)
+            except Exception:
+                db.session.rollback()
+                raise
+            finally:
+                db.session.remove()
+            self._backlog.pop(0)
+            try:
+                os.remove(path)
+            except OSError:
+                pass
+            rows_written = sum(len(rows) for rows, _ in submits)
+            written += rows_written
+            self.stats["flushed_rows"] += rows_written
+            self.stats["batches"] += 1
+            for rows, callback in submits:
+                if callback is None:
+                    continue
+                try:
+                    callback()
+                except Exception:
+                    logger.exception("Write-behind after_flush callback failed")
+        return written
+
+    def _run(self):
+        first_retry_s = min(0.5, Config.WRITE_BEHIND_RETRY_MAX_S)
+        backoff = first_retry_s
+        with self.app.app_context():
+            while not self._stop.is_set():
+                self._wake.wait(self.max_delay_s)
+                self._wake.clear()
+                if not self._due() and not self._backlog:
+                    continue
+                try:
+                    self.flush()
+                    backoff = first_retry_s
+                except Exception:
+                    self.stats["retries"] += 1
+                    logger.exception(f"Write-behind flush failed; retrying in {backoff:.1f}s")
+                    self._stop.wait(backoff)
+                    backoff = min(backoff * 2, Config.WRITE_BEHIND_RETRY_MAX_S)
+
+    def shutdown(self, timeout=10):
+        """Stops the flusher and writes what is left (anything unwritten stays journaled)."""
+        if self._stop.is_set():
+            return
+        self._stop.set()
+        self._wake.set()
+        self._thread.join(timeout)
+        with self.app.app_context():
+            try:
+                self.flush()
+            except Exception:
+                logger.exception("Final write-behind flush failed; rows stay in the journal")
+        path, fh = self._segment
+        fh.close()
+        if os.path.exists(path) and os.path.getsize(path) == 0:
+            os.remove(path)
+
+
+def _process_alive(pid):
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    return True
+
+
+_buffer = None
+_buffer_lock = threading.Lock()
+
+
+def start_write_behind(app):
+    """Starts the buffer once per process."""
+    global _buffer
+    with _buffer_lock:
+        if _buffer is None:
+            _buffer = WriteBehindBuffer(app)
+    return _buffer
+
+
+def write_behind():
+    """The running buffer, or None when writes go straight to the database."""
+    return _buffer
+
+
+def persist(rows, after_commit=None):
+    """
+    Saves new detection rows: through the write-behind buffer when it is running
+    (after committing whatever else the session holds, e.g. name-cache upserts),
+    otherwise with a plain commit. `after_commit` runs once the rows are stored.
+    """
+    buffer = _buffer
+    if buffer is None:
+        db.session.add_all(rows)
+        db.session.commit()
+        if after_commit is not None:
+            after_commit()
+        return
+    db.session.commit()
+    buffer.submit(rows, after_commit)
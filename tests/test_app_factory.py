@@ -0,0 +1,88 @@
+import os
+import sys
+import json
+import subprocess
+import textwrap
+
+import pytest
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+# Imports the app with every startup side effect on, then serves a frame from an
+# inference pool. Its spawned workers re-run this module and report what
+# create_app started in them.
+SCRIPT = textwrap.dedent("""
+    import os
+    import json
+    import threading
+    import multiprocessing
+
+    import numpy as np
+
+    from config import Config
+
+    Config.SQLALCHEMY_DATABASE_URI = os.environ["TEST_DATABASE_URL"]
+    Config.WASTE_MODEL_PATH = Config.POTHOLE_MODEL_PATH = os.environ["TEST_WEIGHTS"]
+    Config.WRITE_BEHIND_JOURNAL_DIR = os.environ["TEST_JOURNAL_DIR"]
+    Config.RESULT_CACHE_DIR = ""
+    Config.WARMUP_ON_STARTUP = True
+    Config.WRITE_BEHIND_ENABLED = True
+    Config.JOB_WORKERS = 1
+
+    from app import app
+    from services.model_registry import registry
+    from services.inference_pool import InferencePool
+
+    if multiprocessing.current_process().name != "MainProcess":
+        with open(os.path.join(os.environ["TEST_STATE_DIR"], f"{os.getpid()}.json"), "w") as fh:
+            json.dump({
+                "warmup_started": registry._warmup_started,
+                "threads": [t.name for t in threading.enumerate()],
+            }, fh)
+
+    if __name__ == "__main__":
+        pool = InferencePool(Config.WASTE_MODEL_PATH, Config.POTHOLE_MODEL_PATH, workers=1, timeout=120)
+        [result] = pool.predict_batch([np.zeros((64, 64, 3), dtype=np.uint8)], "pothole")
+        print(json.dumps({"boxes": len(result.boxes)}))
+""")
+
+
+@pytest.fixture
+def weights(tmp_path):
+    from ultralytics import YOLO
+
+    path = str(tmp_path / "yolo.pt")
+    YOLO("yolov8n.yaml").save(path)
+    return path
+
+
+def test_inference_workers_do_not_run_the_app_startup(tmp_path, weights):
+    script = tmp_path / "serve.py"
+    script.write_text(SCRIPT, encoding="utf-8")
+    state_dir = tmp_path / "state"
+    state_dir.mkdir()
+
+    env = dict(
+        os.environ,
+        PYTHONPATH=ROOT,
+        INFERENCE_WORKERS="1",
+        TEST_DATABASE_URL=f"sqlite:///{tmp_path / 'test.db'}",
+        TEST_WEIGHTS=weights,
+        TEST_JOURNAL_DIR=str(tmp_path / "journal"),
+        TEST_STATE_DIR=str(state_dir),
+    )
+    proc = subprocess.run(
+        [sys.executable, str(script)], cwd=tmp_path, env=env,
+        capture_output=True, text=True, timeout=300
+    )
+    assert proc.returncode == 0, proc.stderr
+    assert json.loads(proc.stdout.strip().splitlines()[-1]) == {"boxes": 0}
+    assert "daemonic processes are not allowed" not in proc.stderr
+
+    # One worker for the script's pool, one for the pool the parent's warm-up built
+    states = [json.loads(path.read_text()) for path in state_dir.iterdir()]
+    assert states
+    for state in states:
+        assert not state["warmup_started"]
+        assert not [name for name in state["threads"]
+                    if name in ("model-warmup", "write-behind") or name.startswith("detection-job-")]
@@ -0,0 +1,61 @@
+import io
+import zipfile
+from types import SimpleNamespace
+
+import pytest
+
+from config import Config
+from services.bulk_upload import BulkUploadError, iter_items, open_archive
+
+
+def _archive(entries, compression=zipfile.ZIP_DEFLATED):
+    buf = io.BytesIO()
+    with zipfile.ZipFile(buf, "w", compression) as zf:
+        for name, data in entries:
+            zf.writestr(name, data)
+    return buf.getvalue()
+
+
+def _upload(raw):
+    return SimpleNamespace(stream=io.BytesIO(raw))
+
+
+def _corrupt(raw, name, payload):
+    """Flips bytes inside the compressed data of entry `name`."""
+    with zipfile.ZipFile(io.BytesIO(raw)) as zf:
+        info = zf.getinfo(name)
+    start = info.header_offset + 30 + len(info.filename.encode()) + len(info.extra)
+    data = bytearray(raw)
+    data[start:start + len(payload)] = payload
+    return bytes(data)
+
+
+DEFAULTS = {"latitude": "1", "longitude": "2", "location": "Main st"}
+
+
+@pytest.mark.parametrize("compression, payload", [
+    (zipfile.ZIP_DEFLATED, b"\xff" * 8),     # invalid deflate block (zlib.error)
+    (zipfile.ZIP_DEFLATED, b"\x00" * 4),     # invalid stored block lengths (zlib.error)
+    (zipfile.ZIP_STORED, b"\x00" * 4),       # CRC mismatch (BadZipFile)
+])
+def test_corrupt_entry_is_a_per_item_error(compression, payload):
+    raw = _archive([("a.jpg", bytes(range(256)) * 64), ("b.jpg", b"ok" * 100)], compression)
+    raw = _corrupt(raw, "a.jpg", payload)
+    metadata, entries = open_archive(_upload(raw))
+
+    items = list(iter_items(entries, metadata, DEFAULTS))
+    assert "Could not read a.jpg" in items[0]["error"]
+    assert items[1]["data"] == b"ok" * 100
+
+
+def test_oversized_metadata_is_rejected(monkeypatch):
+    monkeypatch.setattr(Config, "BULK_MAX_METADATA_BYTES", 64)
+    raw = _archive([("metadata.json", "[" + ",".join(["{}"] * 100) + "]"), ("a.jpg", b"x")])
+    with pytest.raises(BulkUploadError, match="Metadata file larger than 64 bytes"):
+        open_archive(_upload(raw))
+
+
+def test_metadata_that_is_not_utf8_is_rejected():
+    raw = _archive([("metadata.csv", b"filename,latitude\n\xff\xfe,1\n"), ("a.jpg", b"x")])
+    with pytest.raises(BulkUploadError, match="not UTF-8"):
+        open_archive(_upload(raw))
@@ -0,0 +1,51 @@
+import numpy as np
+import pytest
+from ultralytics.data.augment import LetterBox
+
+from services.inference_backends import OnnxGraphBackend, preprocess
+
+
+def _frame(h, w, seed=0):
+    return (np.random.default_rng(seed).random((h, w, 3)) * 255).astype(np.uint8)
+
+
+def _ultralytics_batch(frames, imgsz=640, stride=32):
+    """What ultralytics' predictor feeds a dynamic-shape model (BasePredictor.pre_transform + preprocess)."""
+    auto = len({frame.shape for frame in frames}) == 1
+    letterbox = LetterBox((imgsz, imgsz), auto=auto, stride=stride)
+    images = np.stack([letterbox(image=frame) for frame in frames])
+    return np.ascontiguousarray(images[..., ::-1].transpose(0, 3, 1, 2), dtype=np.float32) / 255.0
+
+
+@pytest.mark.parametrize("shapes", [
+    [(480, 640)],
+    [(720, 1280), (720, 1280)],
+    [(640, 480)],
+    [(333, 1000)],
+    [(480, 640), (720, 1280)],     # mixed sizes share the square
+    [(1080, 1920), (200, 300)],
+])
+def test_preprocess_matches_ultralytics_letterbox(shapes):
+    frames = [_frame(h, w, seed) for seed, (h, w) in enumerate(shapes)]
+
+    batch, transforms = preprocess(frames, 640)
+
+    expected = _ultralytics_batch(frames)
+    assert batch.shape == expected.shape
+    np.testing.assert_array_equal(batch, expected)
+    assert len(transforms) == len(frames)
+
+
+def test_same_sized_frames_run_on_a_stride_aligned_rectangle():
+    batch, [(ratio, pad_x, pad_y)] = preprocess([_frame(480, 640)], 640)
+    assert batch.shape == (1, 3, 480, 640)
+    assert (ratio, pad_x, pad_y) == (1.0, 0, 0)
+
+
+def test_onnx_backend_requires_the_runtime_hooks():
+    class Incomplete(OnnxGraphBackend):
+        def _load(self):
+            pass
+
+    with pytest.raises(TypeError):
+        Incomplete("missing.onnx")
@@ -0,0 +1,56 @@
+import time
+
+import pytest
+from flask import Flask
+
+from config import Config
+from models import db, DetectionJob
+from services import job_queue
+from services.job_queue import claim_next_job, enqueue_job, process_job, requeue_stale_jobs
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{tmp_path / 'test.db'}"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+        yield app
+
+
+def test_long_job_keeps_its_claim_while_the_heartbeat_runs(app, monkeypatch):
+    monkeypatch.setattr(Config, "JOB_HEARTBEAT_S", 0.05)
+    monkeypatch.setattr(Config, "JOB_STALE_AFTER_S", 0.3)
+
+    def long_video(job):
+        # Runs past JOB_STALE_AFTER_S; another worker checks for stale jobs meanwhile
+        time.sleep(0.8)
+        assert requeue_stale_jobs() == 0
+        return {"detections_created": 0}, 201
+
+    monkeypatch.setitem(job_queue.JOB_HANDLERS, "video", long_video)
+    enqueue_job("video", "drive.mp4", upload_path="drive.mp4")
+
+    job = process_job(claim_next_job())
+    assert (job.status, job.attempts, job.status_code) == ("done", 1, 201)
+    assert job.heartbeat_at > job.started_at
+
+
+def test_outcome_of_a_worker_that_lost_its_claim_is_discarded(app, monkeypatch):
+    monkeypatch.setattr(Config, "JOB_HEARTBEAT_S", 60)
+    monkeypatch.setattr(Config, "JOB_STALE_AFTER_S", 0.1)
+
+    def stalled(job):
+        # No heartbeat in time: the job is re-queued and claimed again
+        time.sleep(0.3)
+        assert requeue_stale_jobs() == 1
+        assert claim_next_job().attempts == 2
+        return {"detections_created": 3}, 201
+
+    monkeypatch.setitem(job_queue.JOB_HANDLERS, "video", stalled)
+    enqueue_job("video", "drive.mp4", upload_path="drive.mp4")
+
+    job = process_job(claim_next_job())
+    assert (job.status, job.attempts, job.result) == ("processing", 2, None)
+    assert db.session.query(DetectionJob).count() == 1
@@ -0,0 +1,29 @@
+import torch
+
+from reasoning.kg_gnn import KnowledgeGraphReasoner
+from services.model_registry import ModelRegistry
+
+
+def _registry(reasoner):
+    registry = ModelRegistry()
+    registry._reasoner = reasoner
+    return registry
+
+
+def test_reasoner_version_follows_the_graph_and_the_weights():
+    reasoner = KnowledgeGraphReasoner(compiled=False)
+    registry = _registry(reasoner)
+    before = registry.reasoner_version
+
+    reasoner.add_department("Parks")
+    after_graph = registry.reasoner_version
+    assert after_graph != before
+
+    reasoner.load_state_dict({name: torch.zeros_like(t) for name, t in reasoner.model.state_dict().items()})
+    assert registry.reasoner_version not in (before, after_graph)
+
+
+def test_reasoner_version_of_a_routing_table_is_its_compiled_fingerprint():
+    reasoner = KnowledgeGraphReasoner()
+    table = reasoner.compile_routing_table()
+    assert _registry(table).reasoner_version == table.fingerprint == _registry(reasoner).reasoner_version
@@ -0,0 +1,43 @@
+import os
+import json
+import time
+
+from services.result_cache import ResultCache
+
+
+def _files(cache_dir):
+    return sorted(name for name in os.listdir(cache_dir) if name.endswith(".json"))
+
+
+def test_near_duplicates_are_found_after_a_restart(tmp_path):
+    cache = ResultCache(max_entries=8, ttl_s=60, cache_dir=str(tmp_path), phash_distance=4)
+    cache.store("digest-a", "ctx", [{"detection_type": "pothole"}], phash=0b1011)
+
+    restarted = ResultCache(max_entries=8, ttl_s=60, cache_dir=str(tmp_path), phash_distance=4)
+    # Another encoding of the same photo: a different digest, a dHash one bit away
+    assert restarted.lookup("digest-b", "ctx", phash=0b1010) == [{"detection_type": "pothole"}]
+    assert restarted.stats["near_hits"] == 1
+    assert restarted.lookup("digest-b", "other-ctx", phash=0b1010) is None
+
+
+def test_expired_and_unreadable_files_are_removed_on_startup(tmp_path):
+    cache = ResultCache(max_entries=8, ttl_s=60, cache_dir=str(tmp_path))
+    cache.store("fresh", "ctx", ["fresh"])
+    with open(tmp_path / "expired.json", "w", encoding="utf-8") as fh:
+        json.dump({"expires_at": time.time() - 1, "context": "ctx", "phash": None, "value": []}, fh)
+    (tmp_path / "torn.json").write_text("{", encoding="utf-8")
+
+    ResultCache(max_entries=8, ttl_s=60, cache_dir=str(tmp_path))
+    assert _files(tmp_path) == [f"{ResultCache.make_key('fresh', 'ctx')}.json"]
+
+
+def test_disk_tier_keeps_at_most_disk_max_entries(tmp_path):
+    cache = ResultCache(max_entries=2, ttl_s=60, cache_dir=str(tmp_path), disk_max_entries=3)
+    for i in range(5):
+        cache.store(f"digest-{i}", "ctx", [i], phash=i)
+
+    newest = {f"{ResultCache.make_key(f'digest-{i}', 'ctx')}.json" for i in (2, 3, 4)}
+    assert set(_files(tmp_path)) == newest
+    assert len(cache._phashes) == 3
+    assert cache.lookup("digest-0", "ctx") is None
+    assert cache.lookup("digest-2", "ctx") == [2]
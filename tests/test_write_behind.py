@@ -0,0 +1,75 @@
+import os
+import json
+
+import pytest
+from flask import Flask
+
+from models import db, Detection
+from services.write_behind import WriteBehindBuffer
+
+
+def _detection_row(detection_id, image_name):
+    return ["detections", {
+        "id": detection_id,
+        "detection_type": "pothole",
+        "image_name": image_name,
+        "image_path": f"storage/{image_name}",
+        "latitude": 12.97,
+        "longitude": 77.59,
+        "location": "",
+        "timestamp": "2026-10-18T10:00:00",
+        "department": "Roads",
+        "detection_status": "Pending",
+        "report_count": 1
+    }]
+
+
+@pytest.fixture
+def app(tmp_path):
+    app = Flask(__name__)
+    app.config["SQLALCHEMY_DATABASE_URI"] = f"sqlite:///{tmp_path / 'test.db'}"
+    db.init_app(app)
+    with app.app_context():
+        db.create_all()
+    return app
+
+
+def test_replays_journal_of_crashed_process_with_same_pid(app, tmp_path):
+    journal_dir = tmp_path / "journal"
+    journal_dir.mkdir()
+    # Segments a crashed predecessor with this very pid left behind (old and current naming)
+    pid = os.getpid()
+    crashed = [
+        journal_dir / f"{pid}-00000001.jsonl",
+        journal_dir / f"{pid}-0192f0c2a5b47c3e8f0d1a2b3c4d5e6f-00000002.jsonl",
+    ]
+    crashed[0].write_text(json.dumps([_detection_row("det-1", "a.jpg")]) + "\n")
+    crashed[1].write_text(json.dumps([_detection_row("det-2", "b.jpg")]) + "\n")
+
+    buffer = WriteBehindBuffer(app, max_rows=100, max_delay_ms=10_000, journal_dir=str(journal_dir))
+    # The new process's own segments never reuse the predecessor's names
+    assert buffer._segment[0] not in {str(path) for path in crashed}
+
+    with app.app_context():
+        new = Detection(id="det-3", detection_type="waste", image_name="c.jpg", image_path="storage/c.jpg",
+                        latitude=12.97, longitude=77.59, location="")
+        buffer.submit([new])
+    buffer.shutdown()
+
+    with app.app_context():
+        ids = sorted(db.session.execute(db.select(Detection.id)).scalars())
+    assert ids == ["det-1", "det-2", "det-3"]
+    assert os.listdir(journal_dir) == []
+
+
+def test_replay_is_idempotent(app, tmp_path):
+    journal_dir = tmp_path / "journal"
+    journal_dir.mkdir()
+    line = json.dumps([_detection_row("det-1", "a.jpg")]) + "\n"
+    # The same rows journaled twice, plus a line torn by the crash
+    (journal_dir / f"{os.getpid()}-00000001.jsonl").write_text(line + line + '[["detections", {"id"')
+
+    WriteBehindBuffer(app, journal_dir=str(journal_dir)).shutdown()
+
+    with app.app_context():
+        assert db.session.execute(db.select(db.func.count(Detection.id))).scalar() == 1
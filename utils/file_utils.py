@@ -5,6 +5,7 @@ from werkzeug.utils import secure_filename
 from datetime import datetime
 from PIL import Image
 import numpy as np
+import cv2
 
 ALLOWED_EXT = {'png', 'jpg', 'jpeg'}
 BASE_STORAGE = os.path.join(os.getcwd(), "storage")
@@ -58,6 +59,25 @@ def load_image_as_bgr_array(path: str):
     arr = np.array(img)[:, :, ::-1].copy()  
     return arr
 
+def decode_image_bytes(data: bytes):
+    """Decodes an uploaded image body straight into a BGR array (no temp file)."""
+    arr = cv2.imdecode(np.frombuffer(data, dtype=np.uint8), cv2.IMREAD_COLOR)
+    if arr is None:
+        raise ValueError("Could not decode image")
+    return arr
+
+def as_bgr_array(image):
+    """Accepts an already-decoded BGR array or a path and returns a BGR array."""
+    if isinstance(image, np.ndarray):
+        return image
+    return load_image_as_bgr_array(image)
+
+def write_bytes(path: str, data: bytes):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, 'wb') as fh:
+        fh.write(data)
+    return path
+
 def ensure_dir(path):    
     os.makedirs(path, exist_ok=True)
     return path
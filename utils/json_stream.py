@@ -0,0 +1,24 @@
+import json
+
+
+def iter_json_array(items, chunk_bytes=64 * 1024):
+    """
+    Encodes an iterable as one JSON array, piece by piece. "[" goes out before the
+    first item is requested (so before a lazy query even runs); after that, items
+    are sent in chunks of about `chunk_bytes`. Only one chunk is held in memory.
+    """
+    yield "["
+    encoder = json.JSONEncoder(ensure_ascii=False, separators=(",", ":"))
+    chunk, size, first = [], 0, True
+    for item in items:
+        piece = encoder.encode(item)
+        if not first:
+            piece = "," + piece
+        first = False
+        chunk.append(piece)
+        size += len(piece)
+        if size >= chunk_bytes:
+            yield "".join(chunk)
+            chunk, size = [], 0
+    chunk.append("]")
+    yield "".join(chunk)
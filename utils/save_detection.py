@@ -1,11 +1,10 @@
 import uuid
 from models import db
 from models.user import User
-from models.department import Department
-from models.tag import Tag
 from models.image import Image
 from models.detection import Detection
 from models.relations import DetectionDepartment, DetectionTag
+from services.name_cache import DEPARTMENT_IDS, TAG_IDS
 
 def create_detection_with_relations(
     det_id,
@@ -37,11 +36,11 @@ def create_detection_with_relations(
 
     assigned_departments = routing.get("departments", [])
     for dept_name in assigned_departments:
-        dept = Department.query.filter_by(name=dept_name).first()
-        if dept:
+        dept_id = DEPARTMENT_IDS.get_id(dept_name)
+        if dept_id:
             link = DetectionDepartment(
                 detection_id=det_id,
-                department_id=dept.id
+                department_id=dept_id
             )
             db.session.add(link)
 
@@ -52,11 +51,11 @@ def create_detection_with_relations(
         auto_tag_names = ["pothole", "road_damage"]
 
     for tag_name in auto_tag_names:
-        tag = Tag.query.filter_by(name=tag_name).first()
-        if tag:
+        tag_id = TAG_IDS.get_id(tag_name)
+        if tag_id:
             link = DetectionTag(
                 detection_id=det_id,
-                tag_id=tag.id
+                tag_id=tag_id
             )
             db.session.add(link)
 
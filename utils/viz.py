@@ -2,8 +2,9 @@ import os
 import cv2
 import numpy as np
 from datetime import datetime
+from utils.file_utils import as_bgr_array
 
-def annotate_and_save_ultralytics(results, image_path, annotated_dir, uid):
+def annotate_and_save_ultralytics(results, image, annotated_dir, uid):
     os.makedirs(annotated_dir, exist_ok=True)
     out_name = f"{uid}_annotated.jpg"
     out_path = os.path.join(annotated_dir, out_name)
@@ -14,8 +15,10 @@ def annotate_and_save_ultralytics(results, image_path, annotated_dir, uid):
         cv2.imwrite(out_path, img_bgr)
         return out_name
     except Exception:
-        img = cv2.imread(image_path)
-        if img is None:
+        # Draw on a copy: the decoded array is shared with the processors
+        try:
+            img = as_bgr_array(image).copy()
+        except Exception:
             return None
         r = results[0]
         boxes = getattr(r, 'boxes', None)
@@ -0,0 +1,39 @@
+# worker.py
+"""
+Standalone worker for async detection jobs (see services/job_queue.py).
+
+Loads the models, then claims queued jobs from the detection_jobs table until
+stopped. Run as many of these as inference capacity needs, on any machine that
+shares the database and storage folder; web processes can keep JOB_WORKERS=0.
+
+Usage: python worker.py [--threads 2]
+"""
+
+import time
+import argparse
+
+from config import Config, setup_logging
+from services.job_queue import start_job_workers
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--threads", type=int, default=Config.JOB_WORKERS or 2)
+    args = parser.parse_args()
+
+    # The app would otherwise start its own JOB_WORKERS threads on import, and
+    # start_job_workers (once per process) would then ignore --threads
+    Config.JOB_WORKERS = 0
+    from app import app
+    pool = start_job_workers(app, args.threads)
+    print(f"Detection job worker running with {len(pool.threads)} thread(s). Ctrl+C to stop.")
+    try:
+        while True:
+            time.sleep(1)
+    except KeyboardInterrupt:
+        pool.shutdown(timeout=30)
+
+
+if __name__ == '__main__':
+    setup_logging()
+    main()